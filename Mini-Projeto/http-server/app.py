@@ -1,4 +1,6 @@
 from server import Server
+from server.cache import ResponseCache
+from server.compression import Compression
 from routes.usuarios import *
 
 app = Server()
@@ -8,15 +10,40 @@ app.route("/usuarios")(listar_usuarios)
 
 app.route("/usuarios/novo")(novo_usuario)
 
+app.route("/usuarios/busca")(buscar_usuarios)
+
+app.route("/usuarios/import", methods=["POST"], max_body_size=IMPORTACAO_MAX_BYTES)(importar_usuarios)
+
+app.route("/usuarios/export")(exportar_usuarios)
+
 app.route("/usuarios", methods=["POST"])(criar_usuario)
 
-app.route("/usuarios/<id>")(detalhar_usuario)
+app.route("/usuarios/<int:id_usuario>")(detalhar_usuario)
+
+app.route("/usuarios/<int:id_usuario>/editar")(editar_usuario)
+
+app.route("/usuarios/<int:id_usuario>/atualizar", methods=["POST"])(atualizar_usuario)
+
+app.route("/usuarios/<int:id_usuario>/excluir", methods=["POST"])(excluir_usuario)
+
+# --- Compressão (antes do cache, que guarda o corpo original) ---
+app.use(Compression(min_size=1024, level=6))
+
+# --- Cache das páginas (descartadas quando uma escrita as altera) ---
+cache = app.use(ResponseCache(max_entries=256, version=store.versao))
+
+cache.invalidate_on("/usuarios", "/usuarios", "/usuarios/busca")
+
+cache.invalidate_on("/usuarios/import", "/usuarios", "/usuarios/busca")
 
-app.route("/usuarios/<id>/editar")(editar_usuario)
+for rota in ("/usuarios/<int:id_usuario>/atualizar", "/usuarios/<int:id_usuario>/excluir"):
+    cache.invalidate_on(rota, "/usuarios", "/usuarios/busca", "/usuarios/{id_usuario}", "/usuarios/{id_usuario}/editar")
 
-app.route("/usuarios/<id>/atualizar", methods=["POST"])(atualizar_usuario)
+# --- Métricas (formato do Prometheus) ---
+app.enable_metrics("/metrics")
 
-app.route("/usuarios/<id>/excluir", methods=["POST"])(excluir_usuario)
+# --- Arquivos Estáticos ---
+app.static("/static", "static")
 
 if __name__ == "__main__":
     app.start()
\ No newline at end of file
@@ -0,0 +1,348 @@
+"""Teste de carga do servidor: sobe o app em cada modo de execução e mede o throughput.
+
+Para cada modo, o script:
+1. gera um usuarios.txt com `--usuarios` registros em um diretório temporário;
+2. sobe o `Server` de app.py nesse diretório, em um processo separado;
+3. dispara `--processos` x `--conexoes` clientes com keep-alive durante
+   `--duracao` segundos, com uma mistura de rotas do CRUD;
+4. grava req/s e as latências p50/p95/p99 (geral e por operação) em JSON.
+
+Uso (a partir de Mini-Projeto/http-server):
+    python3 bench/loadtest.py --modos threads async --usuarios 10000 --duracao 10
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODOS = ("serial", "threads", "async", "prefork")
+
+# Peso de cada operação na mistura (proporção das requisições)
+MISTURA_PADRAO = {
+    "listar": 30,
+    "detalhar": 35,
+    "editar": 10,
+    "criar": 10,
+    "atualizar": 10,
+    "excluir": 5,
+}
+
+FORMULARIO = {"Content-Type": "application/x-www-form-urlencoded"}
+
+# Código que roda no processo do servidor
+SERVIDOR = """
+import os, sys
+sys.path.insert(0, {raiz!r})
+os.chdir({diretorio!r})
+import app
+if not {cache!r}:
+    app.app.router.middleware.remove(app.cache)
+app.app.mode = {modo!r}
+app.app.port = {porta!r}
+app.app.start()
+"""
+
+
+def gerar_usuarios(caminho, total):
+    with open(caminho, "w", encoding="utf-8") as f:
+        for i in range(1, total + 1):
+            f.write(f"{i}|Usuário {i}|usuario{i}@exemplo.com|(88) 9{i % 10000:04d}-{i % 9973:04d}\n")
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def esperar_porta(porta, processo, limite=15):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if processo.poll() is not None:
+            raise RuntimeError(f"O servidor terminou ao iniciar (código {processo.returncode}).")
+        try:
+            socket.create_connection(("localhost", porta), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("O servidor não respondeu a tempo.")
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def _ms(segundos):
+    return round(segundos * 1000, 3) if segundos is not None else None
+
+
+def resumo(latencias, segundos):
+    ordenados = sorted(latencias)
+    return {
+        "requisicoes": len(ordenados),
+        "req_por_segundo": round(len(ordenados) / segundos, 1) if segundos else 0.0,
+        "latencia_ms": {
+            "p50": _ms(percentil(ordenados, 50)),
+            "p95": _ms(percentil(ordenados, 95)),
+            "p99": _ms(percentil(ordenados, 99)),
+            "max": _ms(ordenados[-1] if ordenados else None),
+        },
+    }
+
+
+class Cliente:
+    """Uma conexão keep-alive que executa a mistura de operações."""
+
+
+    def __init__(self, porta, total_usuarios, operacoes, pesos, semente):
+        self.porta = porta
+        self.total_usuarios = total_usuarios
+        self.operacoes = operacoes
+        self.pesos = pesos
+        self.aleatorio = random.Random(semente)
+        self.criacoes = 0
+        # Os e-mails são únicos no store: cada cliente gera os seus, com um
+        # prefixo próprio e um contador, para nenhuma escrita receber 409
+        self.prefixo = f"c{semente}"
+        self.contador = 0
+        self.conexao = None
+        self.x_cache = None  # X-Cache da última resposta (HIT/MISS), se o cache respondeu
+
+
+    def _requisicao(self, metodo, caminho, corpo=None):
+        if self.conexao is None:
+            self.conexao = http.client.HTTPConnection("localhost", self.porta, timeout=30)
+        try:
+            self.conexao.request(metodo, caminho, body=corpo, headers=FORMULARIO if corpo is not None else {})
+            resposta = self.conexao.getresponse()
+            resposta.read()
+            self.x_cache = resposta.getheader("X-Cache")
+        except (OSError, http.client.HTTPException):
+            self.conexao.close()
+            self.conexao = None
+            raise
+        if resposta.will_close:
+            self.conexao.close()
+            self.conexao = None
+        return resposta.status
+
+
+    def executar(self):
+        """Executa uma operação sorteada; retorna (nome, sucesso)."""
+        operacao = self.aleatorio.choices(self.operacoes, self.pesos)[0]
+        id_usuario = self.aleatorio.randint(1, self.total_usuarios)
+        self.contador += 1
+        sufixo = f"{self.prefixo}-{self.contador}"
+
+        if operacao == "excluir" and not self.criacoes:
+            operacao = "criar"
+        if operacao == "listar":
+            status = self._requisicao("GET", "/usuarios")
+            return operacao, status == 200
+        if operacao == "detalhar":
+            status = self._requisicao("GET", f"/usuarios/{id_usuario}")
+            return operacao, status == 200
+        if operacao == "editar":
+            status = self._requisicao("GET", f"/usuarios/{id_usuario}/editar")
+            return operacao, status == 200
+        if operacao == "atualizar":
+            corpo = f"nome=Atualizado+{sufixo}&email=a{sufixo}%40exemplo.com&telefone=1"
+            status = self._requisicao("POST", f"/usuarios/{id_usuario}/atualizar", corpo)
+            return operacao, status == 302
+        if operacao == "criar":
+            corpo = f"nome=Carga+{sufixo}&email=c{sufixo}%40exemplo.com&telefone=2"
+            status = self._requisicao("POST", "/usuarios", corpo)
+            self.criacoes += 1
+            return operacao, status == 302
+        # Só exclui usuários criados durante o teste (ids além dos gerados), para
+        # que detalhar/editar/atualizar sempre encontrem o alvo. O id criado não
+        # volta na resposta, então um id já excluído (404) também vale.
+        id_criado = self.total_usuarios + self.aleatorio.randint(1, self.criacoes)
+        status = self._requisicao("POST", f"/usuarios/{id_criado}/excluir")
+        return operacao, status in (302, 404)
+
+
+def rodar_clientes(parametros):
+    """Roda em um processo de carga: `conexoes` threads até o fim da duração."""
+    porta, conexoes, total_usuarios, mistura, inicio, aquecimento, duracao, semente = parametros
+    operacoes, pesos = list(mistura), list(mistura.values())
+    medir_a_partir = inicio + aquecimento
+    fim = medir_a_partir + duracao
+    latencias = {operacao: [] for operacao in operacoes}
+    erros = {operacao: 0 for operacao in operacoes}
+    cache = {"HIT": 0, "MISS": 0}
+    lock = threading.Lock()
+
+    def thread(indice):
+        cliente = Cliente(porta, total_usuarios, operacoes, pesos, semente * 1000 + indice)
+        locais = {operacao: [] for operacao in operacoes}
+        falhas = {operacao: 0 for operacao in operacoes}
+        consultas = {"HIT": 0, "MISS": 0}
+        while True:
+            agora = time.perf_counter()
+            if agora >= fim:
+                break
+            cliente.x_cache = None
+            try:
+                operacao, sucesso = cliente.executar()
+            except (OSError, http.client.HTTPException):
+                operacao, sucesso = "conexao", False
+            decorrido = time.perf_counter() - agora
+            if agora < medir_a_partir:
+                continue
+            if sucesso:
+                locais[operacao].append(decorrido)
+            else:
+                falhas[operacao] = falhas.get(operacao, 0) + 1
+            if cliente.x_cache in consultas:
+                consultas[cliente.x_cache] += 1
+        with lock:
+            for operacao in operacoes:
+                latencias[operacao].extend(locais[operacao])
+            for operacao, quantidade in falhas.items():
+                erros[operacao] = erros.get(operacao, 0) + quantidade
+            for chave, quantidade in consultas.items():
+                cache[chave] += quantidade
+
+    threads = [threading.Thread(target=thread, args=(i,)) for i in range(conexoes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencias, erros, cache
+
+
+def medir_modo(modo, opcoes, mistura):
+    diretorio = tempfile.mkdtemp(prefix=f"loadtest-{modo}-")
+    porta = porta_livre()
+    try:
+        gerar_usuarios(os.path.join(diretorio, "usuarios.txt"), opcoes.usuarios)
+        codigo = SERVIDOR.format(raiz=RAIZ, diretorio=diretorio, cache=not opcoes.sem_cache, modo=modo, porta=porta)
+        servidor = subprocess.Popen([sys.executable, "-c", codigo],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            esperar_porta(porta, servidor)
+            # Todos os processos de carga começam a medir no mesmo instante
+            inicio = time.perf_counter() + 0.5
+            parametros = [
+                (porta, opcoes.conexoes, opcoes.usuarios, mistura, inicio, opcoes.aquecimento, opcoes.duracao, p + 1)
+                for p in range(opcoes.processos)
+            ]
+            with multiprocessing.get_context("fork").Pool(opcoes.processos) as pool:
+                resultados = pool.map(rodar_clientes, parametros)
+        finally:
+            servidor.send_signal(signal.SIGTERM)
+            try:
+                servidor.wait(10)
+            except subprocess.TimeoutExpired:
+                servidor.kill()
+                servidor.wait()
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    latencias = {operacao: [] for operacao in mistura}
+    erros = {}
+    acertos = consultas = 0
+    for parciais, falhas, cache in resultados:
+        for operacao, valores in parciais.items():
+            latencias[operacao].extend(valores)
+        for operacao, quantidade in falhas.items():
+            erros[operacao] = erros.get(operacao, 0) + quantidade
+        acertos += cache["HIT"]
+        consultas += cache["HIT"] + cache["MISS"]
+
+    todas = [valor for valores in latencias.values() for valor in valores]
+    resultado = resumo(todas, opcoes.duracao)
+    resultado["erros"] = {operacao: quantidade for operacao, quantidade in erros.items() if quantidade}
+    resultado["por_operacao"] = {operacao: resumo(valores, opcoes.duracao) for operacao, valores in latencias.items()}
+    # Em separado, porque os acertos do cache dominam as leituras: no prefork
+    # cada worker tem o seu cache, descartado a cada escrita de qualquer processo
+    resultado["cache"] = {
+        "consultas": consultas,
+        "acertos": acertos,
+        "taxa_acerto": round(acertos / consultas, 3) if consultas else None,
+    } if not opcoes.sem_cache else None
+    return resultado
+
+
+def commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do servidor HTTP em cada modo de execução.")
+    parser.add_argument("--modos", nargs="+", choices=MODOS, default=list(MODOS))
+    parser.add_argument("--usuarios", type=int, default=10000, help="registros no usuarios.txt gerado")
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos de medição por modo")
+    parser.add_argument("--aquecimento", type=float, default=1.0, help="segundos iniciais descartados")
+    parser.add_argument("--conexoes", type=int, default=8, help="conexões (threads) por processo de carga")
+    parser.add_argument("--processos", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="processos geradores de carga")
+    parser.add_argument("--mistura", type=json.loads, default=MISTURA_PADRAO,
+                        help='pesos das operações em JSON, ex.: \'{"listar": 1, "detalhar": 9}\'')
+    parser.add_argument("--sem-cache", action="store_true", help="remove o cache de respostas do app")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: bench/resultados/loadtest-<commit>.json)")
+    opcoes = parser.parse_args()
+
+    desconhecidas = set(opcoes.mistura) - set(MISTURA_PADRAO)
+    if desconhecidas:
+        parser.error(f"operações desconhecidas na mistura: {', '.join(sorted(desconhecidas))}")
+
+    commit = commit_atual()
+    saida = opcoes.saida or os.path.join(RAIZ, "bench", "resultados", f"loadtest-{commit or 'local'}.json")
+    relatorio = {
+        "commit": commit,
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "configuracao": {
+            "usuarios": opcoes.usuarios,
+            "duracao": opcoes.duracao,
+            "aquecimento": opcoes.aquecimento,
+            "conexoes": opcoes.conexoes * opcoes.processos,
+            "processos_de_carga": opcoes.processos,
+            "mistura": opcoes.mistura,
+            "cache": not opcoes.sem_cache,
+        },
+        "modos": {},
+    }
+
+    for modo in opcoes.modos:
+        print(f"{modo}: medindo por {opcoes.duracao:g}s...", flush=True)
+        resultado = medir_modo(modo, opcoes, opcoes.mistura)
+        relatorio["modos"][modo] = resultado
+        latencia = resultado["latencia_ms"]
+        print(f"{modo}: {resultado['req_por_segundo']} req/s, p50 {latencia['p50']} ms, "
+              f"p95 {latencia['p95']} ms, p99 {latencia['p99']} ms, erros {sum(resultado['erros'].values())}")
+        if resultado["cache"] and resultado["cache"]["consultas"]:
+            print(f"{modo}: cache {resultado['cache']['acertos']}/{resultado['cache']['consultas']} acertos "
+                  f"({resultado['cache']['taxa_acerto']:.0%})")
+
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compara a montagem da listagem com f-strings (como era feito nos handlers)
+com o template compilado de templates/usuarios/lista.html.
+
+Uso (a partir de Mini-Projeto/http-server):
+    python3 bench/templates_bench.py [usuarios] [repeticoes]
+"""
+import html
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.templates import Templates  # noqa: E402
+from storage import Usuario  # noqa: E402
+
+
+def _linha_usuario(u):
+    # Montagem antiga, acrescida do escape que o template faz automaticamente
+    nome = html.escape(u.nome)
+    return (
+        f"<tr>"
+        f'<td>{u.id}</td>'
+        f'<td>{nome}</td>'
+        f'<td>'
+        f'<a href="/usuarios/{u.id}">Detalhar</a> | '
+        f'<a href="/usuarios/{u.id}/editar">Editar</a> | '
+        f'<form method="POST" action="/usuarios/{u.id}/excluir" style="display:inline;">'
+        f'<button type="submit">Excluir</button>'
+        f'</form>'
+        f"</td>"
+        f"</tr>"
+    )
+
+
+def fstrings(usuarios):
+    partes = [
+        '<link rel="stylesheet" href="/static/style.css">'
+        "<h1>Lista de Usuários</h1>"
+        '<a href="/usuarios/novo">Novo Usuário</a> | <a href="/usuarios?stream=1">Ver todos</a><br><br>'
+        '<table><tr><th>ID</th><th>Nome</th><th>Ações</th></tr>'
+    ]
+    partes.extend(_linha_usuario(u) for u in usuarios)
+    partes.append("</table>")
+    return "".join(partes)
+
+
+def concatenacao(usuarios):
+    # A forma original, concatenando a string a cada linha
+    corpo = fstrings([])[:-len("</table>")]
+    for u in usuarios:
+        corpo += _linha_usuario(u)
+    return corpo + "</table>"
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    usuarios = [Usuario(i, f"Usuário <{i}>", f"u{i}@exemplo.com", "0000-0000") for i in range(1, total + 1)]
+    templates = Templates(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates"))
+
+    casos = {
+        "concatenacao": lambda: concatenacao(usuarios),
+        "fstrings+join": lambda: fstrings(usuarios),
+        "template.render": lambda: templates.render("usuarios/lista.html", usuarios=usuarios, proximo=None),
+        "template.stream": lambda: sum(1 for _ in templates.stream("usuarios/lista.html", usuarios=usuarios, proximo=None)),
+    }
+    print(f"{total} usuários, {repeticoes} repetições")
+    for nome, caso in casos.items():
+        tempo = min(timeit.repeat(caso, number=repeticoes, repeat=3)) / repeticoes
+        print(f"{nome:>16}: {tempo * 1000:8.3f} ms/página")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Compara um app WSGI (Flask) no servidor de desenvolvimento do Werkzeug e no Server.
+
+Para cada servidor, o script sobe o app em um processo separado e dispara
+`--conexoes` clientes com keep-alive durante `--duracao` segundos, em GETs
+sorteados entre os `--caminhos`. Grava req/s e as latências p50/p95/p99 em JSON.
+
+Uso (a partir de Mini-Projeto/http-server):
+    python3 bench/wsgi_bench.py ../../Cache_E_Sessoes/app_base.py:app --caminhos / /login \\
+        --servidores werkzeug threads async
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from loadtest import RAIZ, commit_atual, esperar_porta, porta_livre, resumo
+
+SERVIDORES = ("werkzeug", "serial", "threads", "async", "prefork")
+
+# Código que roda no processo do servidor
+SERVIDOR = """
+import sys
+sys.path.insert(0, {raiz!r})
+from servir_wsgi import carregar_app
+app = carregar_app({alvo!r})
+if {servidor!r} == "werkzeug":
+    from werkzeug.serving import run_simple
+    run_simple("localhost", {porta!r}, app, threaded=True)
+else:
+    from server import Server
+    server = Server("localhost", {porta!r}, mode={servidor!r}, processes={processos!r})
+    server.wsgi(app)
+    server.start()
+"""
+
+
+def rodar_clientes(porta, caminhos, conexoes, aquecimento, duracao):
+    inicio = time.perf_counter()
+    medir_a_partir = inicio + aquecimento
+    fim = medir_a_partir + duracao
+    latencias = []
+    erros = [0]
+    lock = threading.Lock()
+
+    def thread(indice):
+        aleatorio = random.Random(indice)
+        conexao = None
+        locais = []
+        falhas = 0
+        while True:
+            agora = time.perf_counter()
+            if agora >= fim:
+                break
+            try:
+                if conexao is None:
+                    conexao = http.client.HTTPConnection("localhost", porta, timeout=30)
+                conexao.request("GET", aleatorio.choice(caminhos))
+                resposta = conexao.getresponse()
+                resposta.read()
+                sucesso = resposta.status < 500
+                if resposta.will_close:
+                    conexao.close()
+                    conexao = None
+            except (OSError, http.client.HTTPException):
+                if conexao is not None:
+                    conexao.close()
+                conexao = None
+                sucesso = False
+            decorrido = time.perf_counter() - agora
+            if agora < medir_a_partir:
+                continue
+            if sucesso:
+                locais.append(decorrido)
+            else:
+                falhas += 1
+        with lock:
+            latencias.extend(locais)
+            erros[0] += falhas
+
+    threads = [threading.Thread(target=thread, args=(i,)) for i in range(conexoes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencias, erros[0]
+
+
+def medir_servidor(servidor, opcoes):
+    porta = porta_livre()
+    codigo = SERVIDOR.format(raiz=RAIZ, alvo=os.path.abspath(opcoes.alvo), servidor=servidor, porta=porta,
+                             processos=opcoes.processos)
+    processo = subprocess.Popen([sys.executable, "-c", codigo], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        esperar_porta(porta, processo)
+        latencias, erros = rodar_clientes(porta, opcoes.caminhos, opcoes.conexoes, opcoes.aquecimento, opcoes.duracao)
+    finally:
+        processo.send_signal(signal.SIGTERM)
+        try:
+            processo.wait(10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+            processo.wait()
+
+    resultado = resumo(latencias, opcoes.duracao)
+    resultado["erros"] = erros
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara um app WSGI no Werkzeug e nos modos do Server.")
+    parser.add_argument("alvo", help="arquivo do app e objeto WSGI, ex.: ../../Cache_E_Sessoes/app_base.py:app")
+    parser.add_argument("--caminhos", nargs="+", default=["/"], help="caminhos sorteados nos GETs")
+    parser.add_argument("--servidores", nargs="+", choices=SERVIDORES, default=["werkzeug", "threads", "async"])
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos de medição por servidor")
+    parser.add_argument("--aquecimento", type=float, default=1.0, help="segundos iniciais descartados")
+    parser.add_argument("--conexoes", type=int, default=16, help="clientes (threads) simultâneos")
+    parser.add_argument("--processos", type=int, help="processos no modo prefork (padrão: núcleos)")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: bench/resultados/wsgi-<commit>.json)")
+    opcoes = parser.parse_args()
+
+    commit = commit_atual()
+    saida = opcoes.saida or os.path.join(RAIZ, "bench", "resultados", f"wsgi-{commit or 'local'}.json")
+    relatorio = {
+        "commit": commit,
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "configuracao": {
+            "alvo": opcoes.alvo,
+            "caminhos": opcoes.caminhos,
+            "duracao": opcoes.duracao,
+            "aquecimento": opcoes.aquecimento,
+            "conexoes": opcoes.conexoes,
+        },
+        "servidores": {},
+    }
+
+    for servidor in opcoes.servidores:
+        print(f"{servidor}: medindo por {opcoes.duracao:g}s...", flush=True)
+        resultado = medir_servidor(servidor, opcoes)
+        relatorio["servidores"][servidor] = resultado
+        latencia = resultado["latencia_ms"]
+        print(f"{servidor}: {resultado['req_por_segundo']} req/s, p50 {latencia['p50']} ms, "
+              f"p95 {latencia['p95']} ms, p99 {latencia['p99']} ms, erros {resultado['erros']}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
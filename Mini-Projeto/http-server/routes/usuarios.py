@@ -1,187 +1,256 @@
+import csv
+import io
+import json
 import os
-from urllib.parse import parse_qs
+
+from server.templates import Templates
+from storage import EmailDuplicado, Usuario, abrir_store
 
 # Define o caminho para o arquivo que servirá como banco de dados.
 CAMINHO_ARQUIVO = "usuarios.txt"
 
 
-def carregar_usuarios():
-    """Carrega os usuários do arquivo usuarios.txt."""
-    if not os.path.exists(CAMINHO_ARQUIVO):
-        return []
-    with open(CAMINHO_ARQUIVO, "r", encoding="utf-8") as f:
-        linhas = f.readlines()
-    usuarios = []
-    for linha in linhas:
-        if linha.strip(): # Ignora linhas em branco
-            partes = linha.strip().split("|")
-            usuarios.append({
-                "id": int(partes[0]),
-                "nome": partes[1],
-                "email": partes[2],
-                "telefone": partes[3],
-            })
-    return usuarios
-
-
-def salvar_usuarios(usuarios):
-    """Salva a lista de usuários no arquivo usuarios.txt."""
-    with open(CAMINHO_ARQUIVO, "w", encoding="utf-8") as f:
-        for u in usuarios:
-            linha = f"{u['id']}|{u['nome']}|{u['email']}|{u['telefone']}\n"
-            f.write(linha)
+# Índice do arquivo compartilhado por todos os handlers (em memória ou, para
+# arquivos grandes, via mmap).
+store = abrir_store(CAMINHO_ARQUIVO)
+
+# Tamanho das páginas da listagem (?limit=)
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 1000
+
+# Importação em massa: registros por escrita durável, tamanho máximo do
+# corpo e quantos erros são detalhados na resposta (os demais só contam).
+LOTE_IMPORTACAO = 1000
+IMPORTACAO_MAX_BYTES = 4 * 1024 * 1024 * 1024
+MAX_ERROS_LISTADOS = 20
+
+# Formatos da exportação (?formato=) e seus Content-Types
+FORMATOS_EXPORTACAO = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+# Templates compilados uma vez e recompilados só quando o arquivo muda
+templates = Templates(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates"))
+
 
 # --- Handlers do CRUD ---
 def listar_usuarios(request, response):
-    """Handler para exibir a lista de todos os usuários (Read)."""
-    usuarios = carregar_usuarios()
-    # Cria o corpo HTML dinamicamente com a lista de usuários
-    html_body = "<h1>Lista de Usuários</h1>"
-    html_body += '<a href="/usuarios/novo">Novo Usuário</a><br><br>'
-    html_body += '<table border="1" style="border-collapse: collapse; width: 60%;"><tr><th style="padding: 8px;">ID</th><th style="padding: 8px;">Nome</th><th style="padding: 8px;">Ações</th></tr>'
-    for u in usuarios:
-        html_body += (
-            f"<tr>"
-            f'<td style="padding: 8px;">{u["id"]}</td>'
-            f'<td style="padding: 8px;">{u["nome"]}</td>'
-            f'<td style="padding: 8px;">'
-            f'<a href="/usuarios/{u["id"]}">Detalhar</a> | '
-            f'<a href="/usuarios/{u["id"]}/editar">Editar</a> | '
-            f'<form method="POST" action="/usuarios/{u["id"]}/excluir" style="display:inline;">'
-            f'<button type="submit">Excluir</button>'
-            f'</form>'
-            f"</td>"
-            f"</tr>"
-        )
-    html_body += "</table>"
+    """Handler para exibir a lista de usuários (Read), paginada por id.
+
+    Aceita `?limit=` e `?cursor=` (último id da página anterior). Com
+    `?stream=1` a tabela inteira é enviada em partes, à medida que os
+    usuários são lidos, sem montar a página na memória.
+    """
+    try:
+        limite = int(request.args.get("limit", LIMITE_PADRAO))
+        cursor = int(request.args.get("cursor", 0))
+    except ValueError:
+        return response.send(400, "Parâmetros de paginação inválidos.")
+    if limite <= 0:
+        return response.send(400, "Parâmetros de paginação inválidos.")
+
+    if request.args.get("stream") == "1":
+        pagina = templates.stream("usuarios/lista.html", usuarios=store.iterar(cursor), proximo=None)
+        return response.stream(200, pagina)
+
+    usuarios, proximo = store.pagina(cursor, min(limite, LIMITE_MAXIMO))
+    html_body = templates.render("usuarios/lista.html", usuarios=usuarios, proximo=proximo, limite=limite)
+    response.send(200, html_body)
+
+
+def buscar_usuarios(request, response):
+    """Handler da busca por prefixo do nome ou do e-mail (`?q=`)."""
+    termo = request.args.get("q", "")
+    try:
+        limite = int(request.args.get("limit", LIMITE_PADRAO))
+    except ValueError:
+        return response.send(400, "Parâmetro limit inválido.")
+    if limite <= 0:
+        return response.send(400, "Parâmetro limit inválido.")
+
+    usuarios = store.buscar(termo, min(limite, LIMITE_MAXIMO)) if termo.strip() else []
+    html_body = templates.render("usuarios/busca.html", usuarios=usuarios, termo=termo)
     response.send(200, html_body)
 
 
 def novo_usuario(request, response):
     """Handler para exibir o formulário de criação de um novo usuário."""
-    html_body = """
-    <h1>Novo Usuário</h1>
-    <form method="POST" action="/usuarios">
-        <label for="nome">Nome:</label><br>
-        <input type="text" id="nome" name="nome" required size="30"><br><br>
-        <label for="email">Email:</label><br>
-        <input type="email" id="email" name="email" required size="30"><br><br>
-        <label for="telefone">Telefone:</label><br>
-        <input type="text" id="telefone" name="telefone" size="30"><br><br>
-        <button type="submit">Salvar</button>
-    </form>
-    <a href="/usuarios">Voltar para a lista</a>
-    """
+    html_body = templates.render("usuarios/novo.html")
     response.send(200, html_body)
 
 
 def criar_usuario(request, response):
     """Handler para processar a criação de um novo usuário (Create)."""
-    dados = parse_qs(request.body)
-    nome = dados.get('nome', [''])[0]
-    email = dados.get('email', [''])[0]
-    telefone = dados.get('telefone', [''])[0]
-
-    usuarios = carregar_usuarios()
-    novo_id = max([u['id'] for u in usuarios]) + 1 if usuarios else 1
-
-    novo = {"id": novo_id, "nome": nome, "email": email, "telefone": telefone}
-    usuarios.append(novo)
-    salvar_usuarios(usuarios)
-    
+    nome = request.form.get('nome', '')
+    email = request.form.get('email', '')
+    telefone = request.form.get('telefone', '')
+
+    try:
+        store.inserir(nome, email, telefone)
+    except EmailDuplicado:
+        return response.send(409, "Já existe um usuário com este e-mail.")
+
     response.redirect("/usuarios")
 
 
-def detalhar_usuario(request, response):
+def detalhar_usuario(request, response, id_usuario):
     """Handler para exibir os detalhes de um usuário específico."""
-    try:
-        id_usuario = int(request.path.split('/')[2])
-    except (IndexError, ValueError):
-        return response.send(400, "ID de usuário inválido.")
-
-    usuarios = carregar_usuarios()
-    usuario = next((u for u in usuarios if u['id'] == id_usuario), None)
+    usuario = store.obter(id_usuario)
 
     if usuario:
-        html_body = (
-            f"<h1>Detalhes de {usuario['nome']}</h1>"
-            f"<p><strong>ID:</strong> {usuario['id']}</p>"
-            f"<p><strong>Email:</strong> {usuario['email']}</p>"
-            f"<p><strong>Telefone:</strong> {usuario['telefone']}</p>"
-            f'<br><a href="/usuarios">Voltar para a lista</a> | <a href="/usuarios/{usuario["id"]}/editar">Editar</a>'
-        )
+        html_body = templates.render("usuarios/detalhe.html", usuario=usuario)
         response.send(200, html_body)
     else:
         response.send(404, "Usuário não encontrado.")
 
 
-def editar_usuario(request, response):
+def editar_usuario(request, response, id_usuario):
     """Handler para exibir o formulário de edição de um usuário."""
-    try:
-        id_usuario = int(request.path.split('/')[2])
-    except (IndexError, ValueError):
-        return response.send(400, "ID de usuário inválido.")
-
-    usuarios = carregar_usuarios()
-    usuario = next((u for u in usuarios if u['id'] == id_usuario), None)
+    usuario = store.obter(id_usuario)
 
     if usuario:
-        html_body = f"""
-        <h1>Editar Usuário: {usuario['nome']}</h1>
-        <form method="POST" action="/usuarios/{usuario['id']}/atualizar">
-            <label for="nome">Nome:</label><br>
-            <input type="text" id="nome" name="nome" value="{usuario['nome']}" required size="30"><br><br>
-            <label for="email">Email:</label><br>
-            <input type="email" id="email" name="email" value="{usuario['email']}" required size="30"><br><br>
-            <label for="telefone">Telefone:</label><br>
-            <input type="text" id="telefone" name="telefone" value="{usuario['telefone']}" size="30"><br><br>
-            <button type="submit">Atualizar</button>
-        </form>
-        <a href="/usuarios">Cancelar</a>
-        """
+        html_body = templates.render("usuarios/editar.html", usuario=usuario)
         response.send(200, html_body)
     else:
         response.send(404, "Usuário não encontrado.")
 
 
-def atualizar_usuario(request, response):
+def atualizar_usuario(request, response, id_usuario):
     """Handler para processar a atualização de um usuário (Update)."""
+    campos = {campo: request.form[campo] for campo in ("nome", "email", "telefone") if campo in request.form}
+
     try:
-        id_usuario = int(request.path.split('/')[2])
-    except (IndexError, ValueError):
-        return response.send(400, "ID de usuário inválido.")
-
-    dados = parse_qs(request.body)
-    usuarios = carregar_usuarios()
-    
-    usuario_encontrado = False
-    for u in usuarios:
-        if u['id'] == id_usuario:
-            u['nome'] = dados.get('nome', [u['nome']])[0]
-            u['email'] = dados.get('email', [u['email']])[0]
-            u['telefone'] = dados.get('telefone', [u['telefone']])[0]
-            usuario_encontrado = True
-            break
-    
-    if usuario_encontrado:
-        salvar_usuarios(usuarios)
+        usuario = store.atualizar(id_usuario, **campos)
+    except EmailDuplicado:
+        return response.send(409, "Já existe um usuário com este e-mail.")
+
+    if usuario:
         response.redirect("/usuarios")
     else:
         response.send(404, "Usuário não encontrado para atualizar.")
 
 
-def excluir_usuario(request, response):
+def excluir_usuario(request, response, id_usuario):
     """Handler para processar a exclusão de um usuário (Delete)."""
-    try:
-        id_usuario = int(request.path.split('/')[2])
-    except (IndexError, ValueError):
-        return response.send(400, "ID de usuário inválido.")
-        
-    usuarios = carregar_usuarios()
-    usuarios_restantes = [u for u in usuarios if u['id'] != id_usuario]
-
-    if len(usuarios_restantes) < len(usuarios):
-        salvar_usuarios(usuarios_restantes)
+    if store.excluir(id_usuario):
         response.redirect("/usuarios")
     else:
-        response.send(404, "Usuário não encontrado para excluir.")
\ No newline at end of file
+        response.send(404, "Usuário não encontrado para excluir.")
+
+
+# --- Importação e exportação em massa ---
+def _registros_csv(linhas):
+    """(número da linha, registro) de um CSV com cabeçalho (nome,email,telefone; outras colunas são ignoradas)."""
+    leitor = csv.DictReader(linha.decode("utf-8", "replace") for linha in linhas)
+    if leitor.fieldnames:
+        leitor.fieldnames = [coluna.strip().lower() for coluna in leitor.fieldnames]
+    for registro in leitor:
+        yield leitor.line_num, registro
+
+
+def _registros_ndjson(linhas):
+    """(número da linha, registro) de um NDJSON: um objeto por linha; linhas inválidas viram None."""
+    for numero, linha in enumerate(linhas, 1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            registro = None
+        yield numero, registro
+
+
+LEITORES_IMPORTACAO = {
+    "text/csv": _registros_csv,
+    "application/x-ndjson": _registros_ndjson,
+    "application/jsonl": _registros_ndjson,
+}
+
+
+def _validar(registro):
+    """Converte o registro em (nome, email, telefone); None se faltar nome ou e-mail."""
+    if not isinstance(registro, dict):
+        return None
+    nome, email, telefone = (str(registro.get(campo) or "").strip() for campo in ("nome", "email", "telefone"))
+    if not nome or not email:
+        return None
+    return nome, email, telefone
+
+
+def _anotar_erro(resumo, numero, erro):
+    if len(resumo["erros"]) < MAX_ERROS_LISTADOS:
+        resumo["erros"].append({"linha": numero, "erro": erro})
+
+
+def _gravar_lote(lote, numeros, resumo):
+    inseridos, duplicados = store.inserir_lote(lote)
+    resumo["importados"] += len(inseridos)
+    resumo["duplicados"] += len(duplicados)
+    for posicao in duplicados:
+        _anotar_erro(resumo, numeros[posicao], "e-mail já cadastrado")
+
+
+def importar_usuarios(request, response):
+    """Handler da importação em massa: corpo CSV ou NDJSON, lido em streaming.
+
+    Os registros são inseridos em lotes de LOTE_IMPORTACAO, cada lote com
+    uma única escrita durável, então a memória usada não depende do tamanho
+    do arquivo. Registros inválidos ou com e-mail repetido são pulados.
+    Responde com um resumo em JSON.
+    """
+    content_type = request.header("Content-Type", "").split(";", 1)[0].strip().lower()
+    leitor = LEITORES_IMPORTACAO.get(content_type)
+    if leitor is None:
+        return response.send(415, "Envie o arquivo como text/csv ou application/x-ndjson.")
+
+    resumo = {"importados": 0, "duplicados": 0, "invalidos": 0, "erros": []}
+    lote, numeros = [], []
+    for numero, registro in leitor(request.stream.lines()):
+        campos = _validar(registro)
+        if campos is None:
+            resumo["invalidos"] += 1
+            _anotar_erro(resumo, numero, "registro inválido: nome e email são obrigatórios")
+            continue
+        lote.append(campos)
+        numeros.append(numero)
+        if len(lote) >= LOTE_IMPORTACAO:
+            _gravar_lote(lote, numeros, resumo)
+            lote, numeros = [], []
+    if lote:
+        _gravar_lote(lote, numeros, resumo)
+    # Duplicados só são descobertos ao gravar o lote; a lista sai em ordem de linha
+    resumo["erros"].sort(key=lambda erro: erro["linha"])
+
+    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    response.send(200, json.dumps(resumo, ensure_ascii=False))
+
+
+def _linhas_csv(usuarios):
+    saida = io.StringIO()
+    escritor = csv.writer(saida, lineterminator="\n")
+    escritor.writerow(Usuario._fields)
+    yield saida.getvalue()
+    for usuario in usuarios:
+        saida.seek(0)
+        saida.truncate()
+        escritor.writerow(usuario)
+        yield saida.getvalue()
+
+
+def _linhas_ndjson(usuarios):
+    for usuario in usuarios:
+        yield json.dumps(usuario._asdict(), ensure_ascii=False) + "\n"
+
+
+def exportar_usuarios(request, response):
+    """Handler da exportação: todos os usuários em CSV (padrão) ou NDJSON (`?formato=ndjson`).
+
+    Os usuários são lidos em lotes (`store.iterar`) e enviados em streaming,
+    à medida que são formatados.
+    """
+    formato = request.args.get("formato", "csv")
+    if formato not in FORMATOS_EXPORTACAO:
+        return response.send(400, "Formato inválido: use csv ou ndjson.")
+
+    response.headers["Content-Type"] = FORMATOS_EXPORTACAO[formato]
+    response.headers["Content-Disposition"] = f'attachment; filename="usuarios.{formato}"'
+    linhas = _linhas_csv if formato == "csv" else _linhas_ndjson
+    response.stream(200, linhas(store.iterar()))
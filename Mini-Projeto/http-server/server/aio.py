@@ -0,0 +1,324 @@
+import asyncio
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .plumbing import (BodyStream, ConnectionClosed, HTTPError, MAX_BODY_SIZE, Request, SocketReader,
+                       decode_head, parse_chunk_size, parse_framing)
+
+# Corpos com Content-Length até este tamanho são lidos inteiros no loop, antes
+# do handler; os maiores (e os chunked) são lidos sob demanda pelo handler.
+BUFFERED_BODY_SIZE = 64 * 1024
+
+
+class StreamConnection:
+    """Adapta um StreamWriter à interface de socket usada por Response."""
+
+
+    def __init__(self, writer, loop, timeout=None):
+        self.writer = writer
+        self.loop = loop
+        self.timeout = timeout  # inatividade máxima esperando o cliente consumir a resposta
+        self._loop_thread = threading.get_ident()
+
+
+    def sendall(self, data):
+        if threading.get_ident() == self._loop_thread:
+            self.writer.write(data)
+        else:
+            # Handler síncrono rodando no executor: escreve pelo loop e
+            # espera o drain, respeitando o backpressure do cliente.
+            self._write_from_thread(data)
+
+
+    def sendmsg(self, buffers):
+        # Uma única ida ao loop para todos os buffers (cabeçalho + corpo, chunks)
+        if threading.get_ident() == self._loop_thread:
+            self.writer.writelines(buffers)
+        else:
+            self._write_from_thread(*buffers)
+        return sum(len(data) for data in buffers)
+
+
+    def _write_from_thread(self, *buffers):
+        if self.loop.is_closed():
+            # Handler que passou do prazo de encerramento: o loop já terminou
+            raise ConnectionResetError("Servidor encerrado.")
+        asyncio.run_coroutine_threadsafe(self._write(*buffers), self.loop).result()
+
+
+    async def _write(self, *buffers):
+        self.writer.writelines(buffers)
+        await self.drain()
+
+
+    async def drain(self):
+        # Cliente que não lê a resposta: libera a conexão em vez de segurar o buffer
+        await asyncio.wait_for(self.writer.drain(), self.timeout)
+
+
+class LoopBodyStream(BodyStream):
+    """BodyStream de uma conexão do loop, lido por um handler síncrono no executor.
+
+    Cada `read_some` pede ao loop um bloco de até `size` bytes do corpo e
+    espera por ele, com o prazo de inatividade do corpo. A decodificação do
+    chunked também roda no loop: uma ida por bloco, não por chunk. Só o
+    corpo é consumido do StreamReader; o que vem depois (pipelining) fica
+    para a próxima requisição.
+    """
+
+
+    def __init__(self, reader, loop, length=0, chunked=False, limit=MAX_BODY_SIZE, timeout=None):
+        super().__init__(reader, length, chunked, limit)
+        self.loop = loop
+        self.timeout = timeout
+
+
+    def read_some(self, size=None):
+        if self.finished:
+            return b""
+        future = asyncio.run_coroutine_threadsafe(
+            asyncio.wait_for(self._read(size or self.chunk_size), self.timeout), self.loop)
+        try:
+            return future.result()
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "Tempo esgotado ao receber a requisição.")
+        except asyncio.IncompleteReadError:
+            raise ConnectionClosed()
+        except asyncio.LimitOverrunError:
+            raise HTTPError(400, "Chunk malformado.")
+
+
+    async def _read(self, size):
+        parts = []
+        total = 0
+        while total < size and not self.finished:
+            if self.chunked and self.remaining == 0:
+                size_line = await self.reader.readuntil(b"\r\n")
+                self.remaining = parse_chunk_size(size_line)
+                if self.remaining == 0:
+                    # Trailers (ignorados) terminam com uma linha vazia
+                    while await self.reader.readuntil(b"\r\n") != b"\r\n":
+                        pass
+                    self.finished = True
+                    break
+
+            data = await self.reader.read(min(size - total, self.remaining))
+            if not data:
+                raise ConnectionClosed()
+            self.remaining -= len(data)
+            self.consumed += len(data)
+            if self.consumed > self.limit:
+                raise HTTPError(413, "Corpo da requisição muito grande.")
+            parts.append(data)
+            total += len(data)
+
+            if self.remaining == 0:
+                if self.chunked:
+                    await self.reader.readexactly(2)  # CRLF que fecha o chunk
+                else:
+                    self.finished = True
+        return b"".join(parts)
+
+
+class AsyncEngine:
+
+
+    def __init__(self, router, workers=16):
+        self.router = router
+        # Handlers síncronos (que fazem I/O de arquivo) rodam fora do loop
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http-async")
+        self._idle = set()  # writers de conexões esperando a próxima requisição
+        self._loop = None
+        self._stopped = None
+
+
+    async def serve(self, server_socket, backlog=128, shutdown_timeout=30, signals=None):
+        """Atende até `stop()`; depois para de aceitar e drena as conexões (até `shutdown_timeout`)."""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        for signum, callback in (signals or {}).items():
+            self._loop.add_signal_handler(signum, callback)
+
+        server = await asyncio.start_server(self.handle_stream, sock=server_socket, backlog=backlog,
+                                            limit=self.router.max_header_size)
+        await self._stopped.wait()
+        server.close()
+        await self.drain(shutdown_timeout)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+    def stop(self):
+        """Pede o encerramento; seguro de chamar de outra thread, e mais de uma vez."""
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._stopped.set)
+            except RuntimeError:
+                pass  # o loop já terminou e foi fechado
+
+
+    async def drain(self, timeout):
+        self.router.drain()
+        start = self._loop.time()
+        deadline = start + timeout
+        grace = start + min(self.router.DRAIN_IDLE_GRACE, timeout)
+        while self.router.active_connections and self._loop.time() < grace:
+            await asyncio.sleep(0.05)
+        for writer in list(self._idle):
+            # O leitor esperando a próxima requisição recebe EOF e a conexão fecha
+            writer.close()
+        while self.router.active_connections and self._loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        if self.router.active_connections:
+            print(f"Prazo de encerramento esgotado: {self.router.active_connections} conexões interrompidas.")
+
+
+    async def handle_stream(self, reader, writer):
+        if not self.router.admit():
+            self.router.reject(StreamConnection(writer, asyncio.get_running_loop()))
+            writer.close()
+            return
+        try:
+            await self._handle_stream(reader, writer)
+        finally:
+            self.router.release()
+
+
+    async def _handle_stream(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        conn = StreamConnection(writer, loop, self.router.body_timeout)
+        served = 0
+        response = None
+        if self.router.metrics:
+            self.router.metrics.connection_opened()
+        try:
+            while True:
+                response = None
+                if served and self.router.idle_closed:
+                    break
+                request = await self.read_request(reader, idle=writer if served else None)
+                if request is None:
+                    break
+                served += 1
+                response = self.router.new_response(conn, request, served)
+
+                match = self.router.match_request(request)
+                if inspect.iscoroutinefunction(match.handler):
+                    # Handlers async não podem bloquear lendo o stream: o corpo vem inteiro
+                    await self.read_body(reader, request)
+                    # Um middleware que responde sozinho (ex.: HIT do cache)
+                    # não chama o handler, e o dispatch devolve None
+                    result = self.router.dispatch(request, response, match)
+                    if inspect.isawaitable(result):
+                        await result
+                else:
+                    if not request.stream.chunked and request.stream.remaining <= BUFFERED_BODY_SIZE:
+                        await self.read_body(reader, request)
+                    await loop.run_in_executor(self.executor, self._dispatch_sync, request, response, match)
+                await conn.drain()
+
+                if not response.keep_alive:
+                    break
+        except HTTPError as e:
+            if response is None or not response.sent:
+                self.router.send_error(conn, None, e)
+                await conn.drain()
+                await self._linger(reader, writer)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            self.router.report_exception(e)
+        finally:
+            if self.router.metrics:
+                self.router.metrics.connection_closed()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+    def _dispatch_sync(self, request, response, match):
+        self.router.dispatch(request, response, match)
+        # O que o handler não leu do corpo é descartado aqui, fora do loop,
+        # antes da próxima requisição da conexão
+        if response.keep_alive:
+            request.finish()
+
+
+    async def _linger(self, reader, writer, timeout=1, max_bytes=1024 * 1024):
+        # Mesmo motivo de Router._linger: evita RST antes do cliente ler o erro
+        writer.write_eof()
+        discarded = 0
+        try:
+            while discarded < max_bytes:
+                data = await asyncio.wait_for(reader.read(65536), timeout)
+                if not data:
+                    break
+                discarded += len(data)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+
+
+    async def _timed(self, awaitable, timeout):
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "Tempo esgotado ao receber a requisição.")
+
+
+    async def read_request(self, reader, idle=None):
+        # Ocioso entre requisições: fecha em silêncio após o keep-alive (ou
+        # no encerramento, por `drain`). Do primeiro byte em diante valem os
+        # prazos do cabeçalho e do corpo.
+        if idle is not None:
+            self._idle.add(idle)
+        try:
+            first = await asyncio.wait_for(reader.readexactly(1), self.router.keep_alive_timeout)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return None
+        finally:
+            self._idle.discard(idle)
+        try:
+            head = first + await self._timed(reader.readuntil(b"\r\n\r\n"), self.router.header_timeout)
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "Cabeçalhos da requisição muito grandes.")
+
+        # O corpo ainda não foi lido: o stream o lê sob demanda, de dentro do
+        # executor, com o limite da rota (`max_body_size` do `route`).
+        request = Request(decode_head(head))
+        max_body_size = self.router.body_limit(request) if self.router.body_limits else self.router.max_body_size
+        content_length, chunked = parse_framing(head, max_body_size)
+        request.stream = LoopBodyStream(reader, asyncio.get_running_loop(), content_length, chunked,
+                                        limit=max_body_size, timeout=self.router.body_timeout)
+        request._body = None
+        request.head_size = len(head)
+        return request
+
+
+    async def read_body(self, reader, request):
+        """Lê no loop, sem bloquear as demais conexões, o corpo inteiro (até o limite do stream)."""
+        stream = request.stream
+        if stream.chunked:
+            body = await self.read_chunked(reader, stream.limit)
+        elif stream.remaining:
+            body = await self._timed(reader.readexactly(stream.remaining), self.router.body_timeout)
+        else:
+            body = b""
+        request.stream = BodyStream(SocketReader(None, initial=body), len(body))
+
+
+    async def read_chunked(self, reader, max_body_size):
+        parts = []
+        total = 0
+        timeout = self.router.body_timeout
+        while True:
+            size = parse_chunk_size(await self._timed(reader.readuntil(b"\r\n"), timeout))
+            if size == 0:
+                while await self._timed(reader.readuntil(b"\r\n"), timeout) != b"\r\n":
+                    pass
+                return b"".join(parts)
+            total += size
+            if total > max_body_size:
+                raise HTTPError(413, "Corpo da requisição muito grande.")
+            parts.append(await self._timed(reader.readexactly(size), timeout))
+            await self._timed(reader.readexactly(2), timeout)
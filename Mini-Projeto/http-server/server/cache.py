@@ -0,0 +1,143 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+from .router import split_path
+
+
+CachedResponse = namedtuple("CachedResponse", "status_code headers body")
+
+# Cabeçalhos que dependem da conexão ou da requisição, não do conteúdo
+SKIP_HEADERS = {"connection", "keep-alive", "content-length", "transfer-encoding", "x-cache", "content-encoding"}
+
+
+def _normalize(path):
+    return "/" + "/".join(split_path(path))
+
+
+class ResponseCache:
+    """Middleware que guarda respostas GET já renderizadas em um LRU limitado.
+
+    A chave é o caminho com a query string (`/usuarios?cursor=50`). Só entram
+    respostas 200 enviadas com `response.send` (streaming não é guardado).
+    Quando uma requisição que não é GET termina sem erro do cliente, as
+    entradas afetadas são descartadas, conforme as regras de `invalidate_on`.
+    O cache é do processo: no modo prefork cada worker tem o seu e não vê as
+    escritas dos outros. Para esse caso, `version` é uma função que devolve
+    uma assinatura dos dados (ex.: `store.versao`); quando ela muda, por uma
+    escrita de qualquer processo, o cache inteiro é descartado.
+    """
+
+
+    def __init__(self, max_entries=256, version=None):
+        self.max_entries = max_entries
+        self.version = version
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # url -> CachedResponse, do menos ao mais recente
+        self._by_path = {}  # caminho normalizado -> urls (com query) em cache
+        self._rules = {}
+        # Muda a cada invalidação; respostas geradas antes dela não são guardadas
+        self._generation = 0
+        self._lock = threading.Lock()
+
+
+    def invalidate_on(self, route, *paths):
+        """Ao concluir uma escrita na rota `route`, descarta `paths`.
+
+        Os caminhos são formatados com os parâmetros da rota, por exemplo
+        `"/usuarios/{id_usuario}"`, e valem para qualquer query string. Para
+        rotas sem regra, uma escrita limpa o cache inteiro.
+        """
+        self._rules[route] = paths
+
+
+    def before(self, request, response):
+        if request.method != "GET":
+            return False
+        version = self.version() if self.version is not None else None
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+            entry = self._entries.get(request.target)
+            if entry is not None:
+                self._entries.move_to_end(request.target)
+                self.hits += 1
+            else:
+                self.misses += 1
+                request.context["cache_generation"] = (self._generation, version)
+
+        if entry is None:
+            response.headers["X-Cache"] = "MISS"
+            return False
+        response.headers.update(entry.headers)
+        response.headers["X-Cache"] = "HIT"
+        response.send(entry.status_code, entry.body)
+        return True
+
+
+    def after(self, request, response):
+        if request.method == "GET":
+            generation = request.context.get("cache_generation")
+            if generation is not None and self._cacheable(response):
+                self._store(request.target, generation, response)
+            return
+        # Erro do cliente (404 de um id inexistente, 400...) não altera nada;
+        # qualquer outro desfecho, inclusive uma exceção, pode ter alterado.
+        if response.status_code is None or not 400 <= response.status_code < 500:
+            self.invalidate_request(request)
+
+
+    def _cacheable(self, response):
+        return (response.status_code == 200 and response.body is not None
+                and "no-store" not in response.headers.get("Cache-Control", "")
+                and not any(name.lower() == "set-cookie" for name in response.headers))
+
+
+    def _store(self, url, generation, response):
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in SKIP_HEADERS}
+        with self._lock:
+            if generation != (self._generation, self._version):
+                return
+            self._entries[url] = CachedResponse(response.status_code, headers, response.body)
+            self._entries.move_to_end(url)
+            self._by_path.setdefault(_normalize(url), set()).add(url)
+            while len(self._entries) > self.max_entries:
+                old, _ = self._entries.popitem(last=False)
+                self._forget(old)
+
+
+    def _forget(self, url):
+        urls = self._by_path.get(_normalize(url))
+        if urls is not None:
+            urls.discard(url)
+            if not urls:
+                del self._by_path[_normalize(url)]
+
+
+    def invalidate_request(self, request):
+        paths = self._rules.get(request.route)
+        if paths is None:
+            self.clear()
+        else:
+            self.invalidate(*(path.format(**request.params) for path in paths))
+
+
+    def invalidate(self, *paths):
+        with self._lock:
+            self._generation += 1
+            for path in paths:
+                for url in self._by_path.pop(_normalize(path), ()):
+                    del self._entries[url]
+
+
+    def clear(self):
+        with self._lock:
+            self._reset(self._version)
+
+
+    def _reset(self, version):
+        self._version = version
+        self._generation += 1
+        self._entries.clear()
+        self._by_path.clear()
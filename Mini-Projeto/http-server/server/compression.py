@@ -0,0 +1,142 @@
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+
+# wbits do zlib para cada Content-Encoding (gzip: cabeçalho gzip; deflate: formato zlib)
+ENCODINGS = {"gzip": 31, "deflate": 15}
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "image/svg+xml")
+
+
+def negotiate(accept_encoding, available=tuple(ENCODINGS)):
+    """Escolhe a codificação pelo `Accept-Encoding` (maior q; empate fica com a ordem de `available`)."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compressible(content_type):
+    content_type = content_type.split(";", 1)[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class Compression:
+    """Middleware que comprime as respostas com gzip ou deflate, conforme o `Accept-Encoding`.
+
+    Só são comprimidos corpos de tipos textuais com pelo menos `min_size`
+    bytes. Corpos enviados com `response.send` são guardados já comprimidos,
+    em um LRU indexado pelo hash do conteúdo (até `max_bytes`): a mesma
+    página servida de novo, inclusive pelo cache de respostas, não é
+    comprimida outra vez. Respostas em streaming são comprimidas à medida que
+    são enviadas. Deve ser registrado antes do `ResponseCache`, para que o
+    cache guarde o corpo original e cada cliente receba a sua codificação.
+    """
+
+
+    def __init__(self, min_size=1024, level=6, max_bytes=32 * 1024 * 1024):
+        self.min_size = min_size
+        self.level = level
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (hash, codificação) -> corpo comprimido
+        self._size = 0
+        self._lock = threading.Lock()
+
+
+    def before(self, request, response):
+        response.compressor = Encoder(self, negotiate(request.header("Accept-Encoding")))
+        return False
+
+
+    def _applies(self, response, status_code):
+        if status_code < 200 or status_code in (204, 206, 304):
+            return False
+        if "Content-Encoding" in response.headers:
+            return False
+        if not compressible(response.headers.get("Content-Type", "")):
+            return False
+        # A resposta muda conforme o Accept-Encoding, mesmo quando não é comprimida
+        response.headers["Vary"] = "Accept-Encoding"
+        return True
+
+
+    def compress(self, body, encoding):
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compressed
+            self.misses += 1
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, ENCODINGS[encoding])
+        compressed = compressor.compress(body) + compressor.flush()
+
+        with self._lock:
+            if key not in self._entries and len(compressed) <= self.max_bytes:
+                self._entries[key] = compressed
+                self._size += len(compressed)
+                while self._size > self.max_bytes:
+                    _, old = self._entries.popitem(last=False)
+                    self._size -= len(old)
+        return compressed
+
+
+class Encoder:
+    """Codificação escolhida para uma resposta; usado por `Response.send` e `Response.stream`."""
+
+    __slots__ = ("compression", "encoding")
+
+
+    def __init__(self, compression, encoding):
+        self.compression = compression
+        self.encoding = encoding
+
+
+    def body(self, response, status_code, body):
+        compression = self.compression
+        if len(body) < compression.min_size or not compression._applies(response, status_code):
+            return body
+        if self.encoding is None:
+            return body
+        compressed = compression.compress(body, self.encoding)
+        if len(compressed) >= len(body):
+            return body
+        response.headers["Content-Encoding"] = self.encoding
+        return compressed
+
+
+    def stream(self, response, status_code, chunks):
+        if not self.compression._applies(response, status_code) or self.encoding is None:
+            return chunks
+        response.headers["Content-Encoding"] = self.encoding
+        return self._compress_stream(chunks)
+
+
+    def _compress_stream(self, chunks):
+        compressor = zlib.compressobj(self.compression.level, zlib.DEFLATED, ENCODINGS[self.encoding])
+        for chunk in chunks:
+            yield compressor.compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        yield compressor.flush()
@@ -0,0 +1,85 @@
+import selectors
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+
+class IdleConnections:
+    """Conexões keep-alive esperando a próxima requisição, fora dos workers.
+
+    No modo threads, uma conexão ociosa bloqueada no `recv` ocupa um worker
+    até o cliente mandar algo ou o keep-alive expirar: com tantos clientes
+    ociosos quanto workers, as conexões novas ficam paradas na fila. Aqui uma
+    única thread espera por todas com `selectors`. Quando chega dado (ou o
+    cliente fecha), a conexão volta aos workers por `resume(conn, state)`;
+    quando passa `timeout` sem nada chegar, ela é entregue a `expire(conn)`.
+    """
+
+
+    def __init__(self, resume, expire, timeout):
+        self.resume = resume
+        self.expire = expire
+        self.timeout = timeout
+        self._selector = selectors.DefaultSelector()
+        # conn -> (state, prazo); o prazo é fixo, então a ordem de chegada é a de expiração
+        self._waiting = OrderedDict()
+        # O seletor só é alterado pela própria thread: quem estaciona uma
+        # conexão a deixa em `_incoming` e acorda o select pelo socketpair.
+        self._incoming = []
+        self._lock = threading.Lock()
+        self._wakeup, self._notify = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._notify.setblocking(False)
+        self._selector.register(self._wakeup, selectors.EVENT_READ)
+        threading.Thread(target=self._run, name="http-idle", daemon=True).start()
+
+
+    def park(self, conn, state):
+        """Passa a esperar pela próxima requisição de `conn`; `state` volta junto no `resume`."""
+        with self._lock:
+            self._incoming.append((conn, state, time.monotonic() + self.timeout))
+        try:
+            self._notify.send(b"\0")
+        except BlockingIOError:
+            pass  # buffer cheio: o select já tem um aviso pendente
+
+
+    def _register_incoming(self):
+        try:
+            while self._wakeup.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            incoming, self._incoming = self._incoming, []
+            for conn, state, deadline in incoming:
+                self._selector.register(conn, selectors.EVENT_READ)
+                self._waiting[conn] = (state, deadline)
+
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self._waiting:
+                _, deadline = next(iter(self._waiting.values()))
+                timeout = max(0, deadline - time.monotonic())
+            for key, _ in self._selector.select(timeout):
+                if key.fileobj is self._wakeup:
+                    self._register_incoming()
+                    continue
+                conn = key.fileobj
+                self._selector.unregister(conn)
+                with self._lock:
+                    state, _ = self._waiting.pop(conn)
+                self.resume(conn, state)
+
+            now = time.monotonic()
+            while self._waiting:
+                conn, (state, deadline) = next(iter(self._waiting.items()))
+                if deadline > now:
+                    break
+                self._selector.unregister(conn)
+                with self._lock:
+                    del self._waiting[conn]
+                self.expire(conn)
@@ -0,0 +1,179 @@
+import threading
+import time
+from bisect import bisect_left
+
+
+# Limites (em segundos) dos buckets do histograma de latência
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    # Formato de rótulos do Prometheus: {nome="valor",...}
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class RouteStats:
+    """Contadores de uma combinação método + rota."""
+
+    __slots__ = ("buckets", "count", "total_time", "request_bytes", "response_bytes", "statuses")
+
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # o último é o +Inf
+        self.count = 0
+        self.total_time = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses = {}
+
+
+    def copy(self):
+        other = RouteStats()
+        other.buckets = self.buckets[:]
+        other.count = self.count
+        other.total_time = self.total_time
+        other.request_bytes = self.request_bytes
+        other.response_bytes = self.response_bytes
+        other.statuses = dict(self.statuses)
+        return other
+
+
+class Metrics:
+    """Middleware que mede as requisições e as expõe no formato texto do Prometheus.
+
+    Por rota: histograma de latência, contagem por status e bytes recebidos e
+    enviados. Pelo servidor: conexões abertas, requisições em andamento e
+    erros (de protocolo e exceções). Registrado com `Server.enable_metrics`,
+    que também cria a rota `/metrics`. Os números são do processo; no modo
+    prefork cada worker responde com os seus.
+    """
+
+
+    def __init__(self):
+        self._routes = {}  # (método, rota) -> RouteStats
+        self._errors = {}  # (tipo, status) -> quantidade
+        self._lock = threading.Lock()
+        self.connections_open = 0
+        self.connections_total = 0
+        self.requests_in_flight = 0
+
+
+    # --- Middleware ---
+
+    def before(self, request, response):
+        request.context["metrics_start"] = time.perf_counter()
+        with self._lock:
+            self.requests_in_flight += 1
+        return False
+
+
+    def after(self, request, response):
+        elapsed = time.perf_counter() - request.context.get("metrics_start", time.perf_counter())
+        received = request.head_size + (request.stream.consumed if request.stream is not None else 0)
+        status = str(response.status_code) if response.status_code is not None else "error"
+        key = (request.method, request.route or "unmatched")
+
+        with self._lock:
+            self.requests_in_flight -= 1
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = RouteStats()
+            stats.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            stats.count += 1
+            stats.total_time += elapsed
+            stats.request_bytes += received
+            stats.response_bytes += response.bytes_sent
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+
+    # --- Eventos da conexão (chamados pelo Router / AsyncEngine) ---
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections_open += 1
+            self.connections_total += 1
+
+
+    def connection_closed(self):
+        with self._lock:
+            self.connections_open -= 1
+
+
+    def error(self, kind, status=""):
+        with self._lock:
+            self._errors[kind, status] = self._errors.get((kind, status), 0) + 1
+
+
+    # --- Exposição ---
+
+    def __call__(self, request, response):
+        """Handler da rota /metrics."""
+        response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+        response.headers["Cache-Control"] = "no-store"
+        response.send(200, self.render())
+
+
+    def render(self):
+        # Copia sob o lock e formata fora dele, sem atrasar as requisições
+        with self._lock:
+            routes = sorted((key, stats.copy()) for key, stats in self._routes.items())
+            errors = sorted(self._errors.items())
+            gauges = (self.connections_open, self.connections_total, self.requests_in_flight)
+
+        lines = [
+            "# HELP http_requests_total Requisições atendidas, por rota e status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route), stats in routes:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+        lines += [
+            "# HELP http_request_duration_seconds Tempo de atendimento das requisições, por rota.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), stats in routes:
+            cumulative = 0
+            for bound, hits in zip(LATENCY_BUCKETS + ("+Inf",), stats.buckets):
+                cumulative += hits
+                lines.append(f"http_request_duration_seconds_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+            labels = _labels(method=method, route=route)
+            lines.append(f"http_request_duration_seconds_sum{labels} {stats.total_time:.6f}")
+            lines.append(f"http_request_duration_seconds_count{labels} {stats.count}")
+
+        lines += [
+            "# HELP http_request_bytes_total Bytes recebidos (cabeçalhos e corpo lido), por rota.",
+            "# TYPE http_request_bytes_total counter",
+        ]
+        for (method, route), stats in routes:
+            lines.append(f"http_request_bytes_total{_labels(method=method, route=route)} {stats.request_bytes}")
+        lines += [
+            "# HELP http_response_bytes_total Bytes enviados (cabeçalhos e corpo), por rota.",
+            "# TYPE http_response_bytes_total counter",
+        ]
+        for (method, route), stats in routes:
+            lines.append(f"http_response_bytes_total{_labels(method=method, route=route)} {stats.response_bytes}")
+
+        lines += [
+            "# HELP http_errors_total Erros de protocolo (por status) e exceções não tratadas.",
+            "# TYPE http_errors_total counter",
+        ]
+        for (kind, status), count in errors:
+            lines.append(f"http_errors_total{_labels(kind=kind, status=status)} {count}")
+
+        lines += [
+            "# HELP http_connections_in_flight Conexões abertas no momento.",
+            "# TYPE http_connections_in_flight gauge",
+            f"http_connections_in_flight {gauges[0]}",
+            "# HELP http_connections_total Conexões aceitas.",
+            "# TYPE http_connections_total counter",
+            f"http_connections_total {gauges[1]}",
+            "# HELP http_requests_in_flight Requisições em atendimento no momento.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {gauges[2]}",
+        ]
+        return "\n".join(lines) + "\n"
@@ -1,69 +1,638 @@
+import re
+import socket
+import time
+from itertools import chain
+from urllib.parse import parse_qsl
+
+
+class ConnectionClosed(Exception):
+    pass
+
+
+class HTTPError(Exception):
+    """Erro de protocolo que vira uma resposta de erro (e encerra a conexão)."""
+
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+MAX_HEADER_SIZE = 64 * 1024
+MAX_BODY_SIZE = 10 * 1024 * 1024
+
+# Tempo máximo (s) para receber os cabeçalhos inteiros, contado a partir do
+# primeiro byte da requisição, e tempo máximo sem atividade ao ler o corpo
+# ou enviar a resposta.
+HEADER_TIMEOUT = 10
+BODY_TIMEOUT = 30
+
+
+# Só dígitos: int() também aceitaria sinal, "0x", "_" e espaços no meio, e um
+# proxy que leia o número de outro jeito enxergaria outro corpo (smuggling)
+DIGITS = re.compile(rb"[0-9]+")
+HEX_DIGITS = re.compile(rb"[0-9A-Fa-f]+")
+
+
+def parse_framing(head, max_body_size=MAX_BODY_SIZE):
+    """Retorna (content_length, chunked) a partir do bloco de cabeçalhos.
+
+    Enquadramentos ambíguos resultam em 400: Content-Length junto com
+    Transfer-Encoding, ou Content-Length repetido com valores diferentes.
+    Um proxy na frente poderia escolher o outro e enxergar outra
+    requisição no mesmo fluxo (request smuggling).
+    """
+    content_length = None
+    chunked = False
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name == b"content-length":
+            value = value.strip()
+            if not DIGITS.fullmatch(value):
+                raise HTTPError(400, "Content-Length inválido.")
+            length = int(value)
+            if content_length is not None and length != content_length:
+                raise HTTPError(400, "Content-Length repetido com valores diferentes.")
+            content_length = length
+        elif name == b"transfer-encoding":
+            if value.strip().lower() != b"chunked":
+                raise HTTPError(501, "Transfer-Encoding não suportado.")
+            chunked = True
+
+    if content_length is None:
+        return 0, chunked
+    if chunked:
+        raise HTTPError(400, "Content-Length e Transfer-Encoding na mesma requisição.")
+    if content_length < 0:
+        raise HTTPError(400, "Content-Length inválido.")
+    if content_length > max_body_size:
+        raise HTTPError(413, "Corpo da requisição muito grande.")
+    return content_length, chunked
+
+
+def decode_head(head):
+    """Decodifica a linha de requisição e os cabeçalhos; bytes que não são UTF-8 resultam em 400."""
+    try:
+        return head.decode('utf-8')
+    except UnicodeDecodeError:
+        raise HTTPError(400, "Cabeçalhos da requisição não estão em UTF-8.")
+
+
+def parse_chunk_size(line):
+    size = line.split(b";", 1)[0].strip()
+    if not HEX_DIGITS.fullmatch(size):
+        raise HTTPError(400, "Chunk malformado.")
+    return int(size, 16)
+
+
+class SocketReader:
+    """Leitura bufferizada de um socket; bytes excedentes (pipelining) ficam para a próxima requisição."""
+
+
+    def __init__(self, conn, chunk_size=65536, initial=b""):
+        self.conn = conn
+        self.chunk_size = chunk_size
+        self.buffer = bytearray(initial)
+
+
+    def _fill(self):
+        data = self.conn.recv(self.chunk_size) if self.conn is not None else b""
+        if not data:
+            raise ConnectionClosed()
+        self.buffer += data
+
+
+    def read_until(self, terminator, limit=None, timeout=None):
+        """Lê até `terminator` (inclusive).
+
+        Com `timeout`, a leitura inteira precisa terminar em até `timeout`
+        segundos a partir do primeiro byte recebido (senão 408). A espera pelo
+        primeiro byte segue o timeout atual do socket (ociosidade).
+        """
+        start = 0
+        deadline = None
+        while True:
+            index = self.buffer.find(terminator, start)
+            if index != -1:
+                end = index + len(terminator)
+                if limit is not None and end > limit:
+                    raise HTTPError(431, "Cabeçalhos da requisição muito grandes.")
+                data = bytes(self.buffer[:end])
+                del self.buffer[:end]
+                return data
+            if limit is not None and len(self.buffer) > limit:
+                raise HTTPError(431, "Cabeçalhos da requisição muito grandes.")
+            start = max(0, len(self.buffer) - len(terminator) + 1)
+            if timeout is not None and self.buffer:
+                # Cliente lento (slowloris): o prazo vale para o cabeçalho todo, não para cada recv
+                if deadline is None:
+                    deadline = time.monotonic() + timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise HTTPError(408, "Tempo esgotado ao receber a requisição.")
+                self.conn.settimeout(remaining)
+            try:
+                self._fill()
+            except socket.timeout:
+                if deadline is not None:
+                    raise HTTPError(408, "Tempo esgotado ao receber a requisição.")
+                raise
+
+
+    def read_exact(self, size):
+        while len(self.buffer) < size:
+            self._fill()
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+    def read_some(self, size):
+        if not self.buffer:
+            self._fill()
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+class BodyStream:
+    """Corpo da requisição lido sob demanda, com Content-Length ou chunked."""
+
+
+    def __init__(self, reader, length=0, chunked=False, limit=MAX_BODY_SIZE, chunk_size=65536):
+        self.reader = reader
+        self.chunked = chunked
+        self.limit = limit
+        self.chunk_size = chunk_size
+        self.remaining = 0 if chunked else length
+        self.consumed = 0
+        self.finished = not chunked and length == 0
+
+
+    def _next_chunk(self):
+        size = parse_chunk_size(self.reader.read_until(b"\r\n", limit=1024))
+        if size == 0:
+            # Trailers (ignorados) terminam com uma linha vazia
+            while self.reader.read_until(b"\r\n", limit=MAX_HEADER_SIZE) != b"\r\n":
+                pass
+            self.finished = True
+        self.remaining = size
+
+
+    def read_some(self, size=None):
+        """Lê até `size` bytes do corpo; b"" indica o fim."""
+        size = size or self.chunk_size
+        if self.finished:
+            return b""
+        if self.chunked and self.remaining == 0:
+            self._next_chunk()
+            if self.finished:
+                return b""
+
+        data = self.reader.read_some(min(size, self.remaining))
+        self.remaining -= len(data)
+        self.consumed += len(data)
+        if self.consumed > self.limit:
+            raise HTTPError(413, "Corpo da requisição muito grande.")
+
+        if self.remaining == 0:
+            if self.chunked:
+                self.reader.read_exact(2)  # CRLF que fecha o chunk
+            else:
+                self.finished = True
+        return data
+
+
+    def read(self, size=-1):
+        if size is not None and size >= 0:
+            parts = []
+            while size > 0:
+                data = self.read_some(size)
+                if not data:
+                    break
+                parts.append(data)
+                size -= len(data)
+            return b"".join(parts)
+        return b"".join(iter(self))
+
+
+    def __iter__(self):
+        while True:
+            data = self.read_some()
+            if not data:
+                return
+            yield data
+
+
+    def lines(self, limit=MAX_HEADER_SIZE):
+        """Itera o corpo linha a linha (bytes, com o `\n`), sem lê-lo inteiro.
+
+        Uma linha maior que `limit` bytes resulta em 400.
+        """
+        buffer = b""
+        while True:
+            end = buffer.find(b"\n") + 1
+            if end:
+                yield buffer[:end]
+                buffer = buffer[end:]
+                continue
+            if len(buffer) > limit:
+                raise HTTPError(400, "Linha muito longa no corpo da requisição.")
+            data = self.read_some()
+            if not data:
+                break
+            buffer += data
+        if buffer:
+            yield buffer
+
+
+    def drain(self):
+        for _ in self:
+            pass
+
+
+class MultiDict:
+    """Dicionário com vários valores por chave (query string, formulário, cabeçalhos).
+
+    `d[chave]` e `d.get(chave)` devolvem o primeiro valor; `d.get_all(chave)`
+    devolve todos, na ordem em que chegaram.
+    """
+
+    __slots__ = ("_data",)
+
+
+    def __init__(self, pairs=()):
+        self._data = {}
+        for key, value in pairs:
+            self._data.setdefault(self._key(key), []).append(value)
+
+
+    @staticmethod
+    def _key(key):
+        return key
+
+
+    def __getitem__(self, key):
+        return self._data[self._key(key)][0]
+
+
+    def get(self, key, default=None):
+        values = self._data.get(self._key(key))
+        return values[0] if values else default
+
+
+    def get_all(self, key):
+        return list(self._data.get(self._key(key), ()))
+
+
+    def __contains__(self, key):
+        return self._key(key) in self._data
+
+
+    def __iter__(self):
+        return iter(self._data)
+
+
+    def __len__(self):
+        return len(self._data)
+
+
+    def items(self):
+        """Pares (chave, primeiro valor)."""
+        return [(key, values[0]) for key, values in self._data.items()]
+
+
+    def __repr__(self):
+        return f"{type(self).__name__}({[(k, v) for k, vs in self._data.items() for v in vs]!r})"
+
+
+class Headers(MultiDict):
+    """Cabeçalhos da requisição: nomes sem diferença entre maiúsculas e minúsculas."""
+
+    __slots__ = ()
+
+
+    @staticmethod
+    def _key(key):
+        return key.lower()
+
+
+    @classmethod
+    def parse(cls, lines):
+        pairs = []
+        for line in lines:
+            name, sep, value = line.partition(":")
+            if not sep or not name or name != name.strip():
+                raise HTTPError(400, "Cabeçalho malformado.")
+            pairs.append((name, value.strip()))
+        return cls(pairs)
+
+
+FORM_CONTENT_TYPE = "application/x-www-form-urlencoded"
+
+
 class Request:
-    
-    
-    def __init__(self, raw_request):
+    """Requisição HTTP.
+
+    Só a linha de requisição é interpretada na criação. Cabeçalhos
+    (`headers`), query string (`args`), corpo (`body`) e formulário (`form`)
+    são interpretados no primeiro acesso e guardados: um handler que não
+    olha o corpo não paga por ele.
+    """
+
+
+    def __init__(self, raw_request, stream=None):
         self.method = ""
+        self.target = ""  # como veio na linha de requisição, com a query string
         self.path = ""
-        self.headers = {}
-        self.body = ""
+        self.query_string = ""
+        self.version = "HTTP/1.0"
+        self.params = {}
+        self.route = None
+        self.stream = stream
+        self.context = {}  # dados livres para middlewares
+        self.head_size = 0  # bytes da linha de requisição + cabeçalhos
+        self._head = ""
+        self._headers = None
+        self._args = None
+        self._form = None
+        self._body = None
         self._parse(raw_request)
 
 
     def _parse(self, raw_request):
-        lines = raw_request.split("\r\n")
-        if not lines: return
-
-        request_line = lines[0]
-        self.method, self.path, _ = request_line.split(" ")
-
-        header_lines = lines[1:]
-        empty_line_index = header_lines.index("") if "" in header_lines else -1
-        
-        if empty_line_index != -1:
-            for line in header_lines[:empty_line_index]:
-                key, value = line.split(": ", 1)
-                self.headers[key] = value
-     
-            self.body = "\r\n".join(header_lines[empty_line_index+1:])
-    
+        request_line, _, rest = raw_request.partition("\r\n")
+        try:
+            self.method, self.target, self.version = request_line.split(" ")
+        except ValueError:
+            raise HTTPError(400, "Linha de requisição malformada.")
+        self.path, _, self.query_string = self.target.partition("?")
+
+        if rest.startswith("\r\n"):
+            self._head, body = "", rest[2:]  # nenhum cabeçalho
+        else:
+            self._head, _, body = rest.partition("\r\n\r\n")
+        if self.stream is None:
+            self._body = body
+
+
+    @property
+    def headers(self):
+        if self._headers is None:
+            self._headers = Headers.parse(self._head.split("\r\n") if self._head else ())
+        return self._headers
+
+
+    @property
+    def args(self):
+        """Parâmetros da query string (`?limit=10&cursor=0`)."""
+        if self._args is None:
+            self._args = MultiDict(parse_qsl(self.query_string, keep_blank_values=True))
+        return self._args
+
+
+    @property
+    def form(self):
+        """Campos de um formulário enviado como `application/x-www-form-urlencoded`."""
+        if self._form is None:
+            content_type = self.header("Content-Type", FORM_CONTENT_TYPE)
+            if content_type.split(";", 1)[0].strip().lower() == FORM_CONTENT_TYPE:
+                self._form = MultiDict(parse_qsl(self.body, keep_blank_values=True))
+            else:
+                self._form = MultiDict()
+        return self._form
+
+
+    @property
+    def body(self):
+        # O corpo só é lido do socket (e decodificado) quando o handler pede
+        if self._body is None:
+            data = self.stream.read() if self.stream else b""
+            try:
+                self._body = data.decode('utf-8')
+            except UnicodeDecodeError:
+                raise HTTPError(400, "Corpo da requisição não está em UTF-8.")
+        return self._body
+
+
+    def header(self, name, default=None):
+        return self.headers.get(name, default)
+
+
+    @property
+    def keep_alive(self):
+        connection = self.header("Connection", "").lower()
+        if self.version == "HTTP/1.1":
+            return connection != "close"
+        return connection == "keep-alive"
+
+
+    def finish(self):
+        """Descarta o que sobrou do corpo para que a próxima requisição da conexão possa ser lida."""
+        if self.stream is not None:
+            self.stream.drain()
+
 
     @classmethod
-    def from_socket(cls, conn):
-        raw_data = conn.recv(2048).decode('utf-8')
-        return cls(raw_data)
+    def from_socket(cls, conn, reader=None, max_header_size=MAX_HEADER_SIZE, max_body_size=MAX_BODY_SIZE,
+                    header_timeout=None, body_limit=None):
+        """Lê o cabeçalho de uma requisição; retorna None se o cliente fechou a conexão entre requisições.
+
+        O corpo não é lido aqui: fica disponível em `request.stream` (leitura
+        incremental) ou, inteiro, em `request.body`. `body_limit`, se
+        informado, recebe a requisição e devolve o tamanho máximo do corpo
+        para ela, no lugar de `max_body_size`.
+        """
+        reader = reader or SocketReader(conn)
+        try:
+            head = reader.read_until(b"\r\n\r\n", limit=max_header_size, timeout=header_timeout)
+        except ConnectionClosed:
+            if reader.buffer:
+                raise
+            return None
+
+        request = cls(decode_head(head))
+        if body_limit is not None:
+            max_body_size = body_limit(request)
+        content_length, chunked = parse_framing(head, max_body_size)
+        request.stream = BodyStream(reader, content_length, chunked, limit=max_body_size)
+        request._body = None  # lido sob demanda, do stream
+        request.head_size = len(head)
+        return request
 
 
 class Response:
 
 
-    def __init__(self, conn):
+    # Pedaços pequenos vindos de um gerador são agrupados até esse tamanho
+    # antes de virar um chunk, para não gastar uma syscall por pedaço.
+    STREAM_FLUSH_SIZE = 16 * 1024
+    STREAM_MAX_BUFFERS = 512
+
+
+    def __init__(self, conn, keep_alive=False, keep_alive_timeout=5, keep_alive_max=None, chunked=True):
         self.conn = conn
+        self.chunked = chunked
+        self.keep_alive = keep_alive
+        self.keep_alive_timeout = keep_alive_timeout
+        self.keep_alive_max = keep_alive_max
+        self.sent = False
+        # Preenchidos no envio, para middlewares (o corpo só em send())
+        self.status_code = None
+        self.body = None
+        self.bytes_sent = 0
+        self.reason = None  # texto do status, quando não é o padrão (gateway WSGI)
+        self.extra_headers = []  # cabeçalhos repetidos, como vários Set-Cookie
+        self.compressor = None  # server.compression.Encoder, definido pelo middleware Compression
         self.headers = {
             "Content-Type": "text/html; charset=utf-8",
             "Server": "MeuServidorPython"
         }
 
 
-    def _build_response(self, status_code, body=""):
-        status_messages = {200: "OK", 302: "Found", 404: "Not Found", 400: "Bad Request"}
-        status_text = status_messages.get(status_code, "Internal Server Error")
+    def _build_head(self, status_code, content_length):
+        status_messages = {
+            200: "OK", 206: "Partial Content", 302: "Found", 304: "Not Modified",
+            400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout", 409: "Conflict",
+            413: "Payload Too Large", 415: "Unsupported Media Type", 416: "Range Not Satisfiable", 431: "Request Header Fields Too Large",
+            501: "Not Implemented", 503: "Service Unavailable",
+        }
+        status_text = self.reason or status_messages.get(status_code, "Internal Server Error")
+        self.status_code = status_code
 
         response_line = f"HTTP/1.1 {status_code} {status_text}\r\n"
-        
-        if body:
-            self.headers["Content-Length"] = str(len(body.encode('utf-8')))
-        
-        headers = "".join([f"{k}: {v}\r\n" for k, v in self.headers.items()])
-        
-        return (response_line + headers + "\r\n" + body).encode('utf-8')
+
+        # Content-Length é o que delimita a resposta numa conexão persistente
+        # (respostas 304 não têm corpo e não o enviam)
+        if content_length is not None:
+            self.headers["Content-Length"] = str(content_length)
+        if self.keep_alive:
+            self.headers["Connection"] = "keep-alive"
+            keep_alive = f"timeout={self.keep_alive_timeout}"
+            if self.keep_alive_max is not None:
+                keep_alive += f", max={self.keep_alive_max}"
+            self.headers["Keep-Alive"] = keep_alive
+        else:
+            self.headers["Connection"] = "close"
+
+        headers = "".join([f"{k}: {v}\r\n" for k, v in chain(self.headers.items(), self.extra_headers)])
+
+        return (response_line + headers + "\r\n").encode('utf-8')
+
+
+    def _encode(self, body):
+        if isinstance(body, str):
+            return body.encode('utf-8')
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            return bytes(body)
+        # bytes(n) de um int, por exemplo, viraria n bytes nulos
+        raise TypeError(f"Corpo deve ser str ou bytes, não {type(body).__name__}.")
+
+
+    def _sendmsg(self, buffers):
+        """Envia vários buffers de uma vez (scatter-gather), sem concatená-los."""
+        self.bytes_sent += sum(len(data) for data in buffers)
+        if not hasattr(self.conn, "sendmsg"):
+            for data in buffers:
+                self.conn.sendall(data)
+            return
+
+        buffers = [memoryview(data) for data in buffers if data]
+        while buffers:
+            sent = self.conn.sendmsg(buffers)
+            # Envio parcial: descarta o que já foi e continua do ponto em que parou
+            while buffers and sent >= len(buffers[0]):
+                sent -= len(buffers[0])
+                buffers.pop(0)
+            if buffers and sent:
+                buffers[0] = buffers[0][sent:]
 
 
     def send(self, status_code, body):
-        response_data = self._build_response(status_code, body)
-        self.conn.sendall(response_data)
+        body = self._encode(body)
+        # `body` guarda o corpo original (é o que o cache de respostas reaproveita)
+        self.body = body
+        self.sent = True
+        if self.compressor is not None:
+            body = self.compressor.body(self, status_code, body)
+        self._sendmsg([self._build_head(status_code, len(body)), body])
 
 
     def redirect(self, location):
         self.headers["Location"] = location
-        response_data = self._build_response(302) 
-        self.conn.sendall(response_data)
\ No newline at end of file
+        self.send(302, b"")
+
+
+    def stream(self, status_code, chunks, content_length=None):
+        """Envia o corpo à medida que `chunks` (partes str/bytes, em lista ou gerador) é produzido.
+
+        Com `content_length` conhecido a resposta é delimitada por ele; sem
+        ele usa `Transfer-Encoding: chunked` (ou fecha a conexão, em HTTP/1.0).
+        Um str ou bytes sozinho é enviado como uma única parte.
+        """
+        if isinstance(chunks, (str, bytes, bytearray, memoryview)):
+            # Iterar um bytes daria ints, e um str, um caractere por vez
+            chunks = (chunks,)
+        if content_length is None:
+            if self.compressor is not None:
+                chunks = self.compressor.stream(self, status_code, chunks)
+            if self.chunked:
+                self.headers["Transfer-Encoding"] = "chunked"
+            else:
+                self.keep_alive = False
+        head = [self._build_head(status_code, content_length)]
+        self.sent = True
+        framed = content_length is None and self.chunked
+
+        pending = []
+        pending_size = 0
+        for chunk in chunks:
+            data = self._encode(chunk)
+            if not data:
+                continue
+            pending.append(data)
+            pending_size += len(data)
+            if pending_size >= self.STREAM_FLUSH_SIZE or len(pending) >= self.STREAM_MAX_BUFFERS:
+                self._flush(head, pending, pending_size, framed)
+                head, pending, pending_size = [], [], 0
+
+        self._flush(head, pending, pending_size, framed, last=True)
+
+
+    def _flush(self, head, pending, size, framed, last=False):
+        buffers = list(head)
+        if framed and size:
+            buffers += [b"%x\r\n" % size, *pending, b"\r\n"]
+        else:
+            buffers += pending
+        if framed and last:
+            buffers.append(b"0\r\n\r\n")
+        self._sendmsg(buffers)
+
+
+    def send_head(self, status_code, content_length=None):
+        """Envia só a linha de status e os cabeçalhos; o corpo fica por conta de quem chamou."""
+        self.sent = True
+        self._sendmsg([self._build_head(status_code, content_length)])
+
+
+    def send_file(self, status_code, file, offset, count, head_only=False):
+        self.send_head(status_code, count)
+        if head_only or count == 0:
+            return
+        if isinstance(self.conn, socket.socket):
+            # socket.sendfile usa os.sendfile: o kernel copia do arquivo
+            # para o socket sem passar o conteúdo pelo processo Python.
+            self.bytes_sent += self.conn.sendfile(file, offset, count)
+            return
+
+        file.seek(offset)
+        while count > 0:
+            data = file.read(min(count, 65536))
+            if not data:
+                break
+            self.conn.sendall(data)
+            self.bytes_sent += len(data)
+            count -= len(data)
@@ -0,0 +1,111 @@
+import os
+import signal
+import time
+
+
+class PreforkSupervisor:
+    """Mantém N processos worker vivos, todos atendendo a mesma porta.
+
+    SIGTERM/SIGINT repassam SIGTERM aos workers, que drenam as conexões e
+    saem; quem passar de `stop_timeout` segundos recebe SIGKILL. SIGHUP
+    chama `on_restart` (restart a quente). `on_ready` é chamado quando os
+    workers iniciais já foram criados.
+    """
+
+    # Se um worker morre logo após nascer, espera antes de recriá-lo
+    # para não entrar em loop de fork quando há erro de inicialização.
+    MIN_UPTIME = 1.0
+    RESPAWN_DELAY = 1.0
+    POLL_INTERVAL = 0.1
+
+
+    def __init__(self, processes, serve_worker, stop_timeout=35, on_restart=None, on_ready=None):
+        self.processes = processes
+        self.serve_worker = serve_worker
+        self.stop_timeout = stop_timeout
+        self.on_restart = on_restart
+        self.on_ready = on_ready
+        self.children = {}
+        self.running = True
+        self.deadline = None
+
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGHUP, self._restart)
+
+        for slot in range(self.processes):
+            self._spawn(slot)
+        if self.on_ready is not None:
+            self.on_ready()
+
+        while self.running or self.children:
+            pid, status = self._reap()
+            if pid is None:
+                break
+
+            slot, started = self.children.pop(pid, (None, 0))
+            if slot is None or not self.running:
+                continue
+
+            print(f"Worker {pid} terminou (status {status}); reiniciando.")
+            if time.monotonic() - started < self.MIN_UPTIME:
+                time.sleep(self.RESPAWN_DELAY)
+            self._spawn(slot)
+
+
+    def _reap(self):
+        """Espera um worker terminar; no encerramento, mata quem passou do prazo."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return None, None
+            if pid:
+                return pid, status
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.deadline = None
+                for pid in list(self.children):
+                    print(f"Worker {pid} não terminou no prazo; encerrando à força.")
+                    self._kill(pid, signal.SIGKILL)
+            time.sleep(self.POLL_INTERVAL)
+
+
+    def _spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            # O worker instala os próprios handlers de encerramento ao começar a atender
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            code = 0
+            try:
+                self.serve_worker(slot)
+            except BaseException as e:
+                print(f"Worker {os.getpid()} falhou: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = (slot, time.monotonic())
+
+
+    def _kill(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+    def _stop(self, signum, frame):
+        if not self.running:
+            return
+        self.running = False
+        self.deadline = time.monotonic() + self.stop_timeout
+        for pid in list(self.children):
+            self._kill(pid, signal.SIGTERM)
+
+
+    def _restart(self, signum, frame):
+        if self.running and self.on_restart is not None:
+            self.on_restart()
@@ -1,64 +1,433 @@
-from .plumbing import Request, Response
+import asyncio
+import inspect
+import re
+import socket
+import threading
+from collections import namedtuple
+from urllib.parse import unquote
+from .plumbing import (BODY_TIMEOUT, HEADER_TIMEOUT, HTTPError, MAX_BODY_SIZE, MAX_HEADER_SIZE,
+                       Request, Response, SocketReader)
 
-class Router:
+
+def _convert_int(segment):
+    if not segment.isdigit():
+        raise ValueError(segment)
+    return int(segment)
+
+
+def _convert_str(segment):
+    if not segment:
+        raise ValueError(segment)
+    return segment
+
+
+def _convert_path(segment):
+    # Consome o restante do caminho (tratado em RouteNode.lookup)
+    if not segment:
+        raise ValueError(segment)
+    return segment
+
+
+CONVERTERS = {"int": _convert_int, "str": _convert_str, "path": _convert_path}
+
+PARAM_PATTERN = re.compile(r"^<(?:(\w+):)?(\w+)>$")
+
+RouteMatch = namedtuple("RouteMatch", "handler params route allowed")
+
+NO_MATCH = RouteMatch(None, {}, None, ())
+
+
+class RouteNode:
+    """Nó da árvore de rotas: um segmento do caminho."""
+
+    __slots__ = ("static", "params", "handlers", "route")
 
 
     def __init__(self):
-        self.routes = []
+        self.static = {}
+        self.params = []  # [(nome, conversor, nome_conversor, nó)]
+        self.handlers = {}
+        self.route = None
+
+
+    def child(self, segment):
+        param = PARAM_PATTERN.match(segment)
+        if not param:
+            return self.static.setdefault(segment, RouteNode())
+
+        converter_name = param.group(1) or "str"
+        name = param.group(2)
+        if converter_name not in CONVERTERS:
+            raise ValueError(f"Conversor desconhecido na rota: {segment}")
+        for param_name, _, existing_converter, node in self.params:
+            if param_name == name and existing_converter == converter_name:
+                return node
+        node = RouteNode()
+        self.params.append((name, CONVERTERS[converter_name], converter_name, node))
+        return node
+
+
+    def lookup(self, segments, index, params):
+        if index == len(segments):
+            return self if self.handlers else None
+
+        segment = segments[index]
+        # Segmentos fixos têm prioridade sobre parâmetros (/usuarios/novo x /usuarios/<id>)
+        node = self.static.get(segment)
+        if node is not None:
+            found = node.lookup(segments, index + 1, params)
+            if found is not None:
+                return found
+
+        for name, converter, converter_name, node in self.params:
+            if converter_name == "path":
+                if node.handlers:
+                    params[name] = converter("/".join(segments[index:]))
+                    return node
+                continue
+            try:
+                value = converter(segment)
+            except ValueError:
+                continue
+            params[name] = value
+            found = node.lookup(segments, index + 1, params)
+            if found is not None:
+                return found
+            del params[name]
+        return None
+
 
+def split_path(path):
+    path = path.split("?", 1)[0].strip("/")
+    return [unquote(segment) for segment in path.split("/")] if path else []
+
+
+class Router:
 
-    def add_route(self, path, methods):
+    # No encerramento, tempo dado às conexões keep-alive para mandarem a
+    # próxima requisição (respondida com "Connection: close") antes de serem
+    # fechadas: fechar na hora derrubaria requisições já a caminho.
+    DRAIN_IDLE_GRACE = 1.0
+
+
+    def __init__(self, keep_alive_timeout=5, max_keep_alive_requests=100,
+                 max_header_size=MAX_HEADER_SIZE, max_body_size=MAX_BODY_SIZE,
+                 header_timeout=HEADER_TIMEOUT, body_timeout=BODY_TIMEOUT, max_connections=1024):
+        self.tree = RouteNode()
+        self.body_limits = {}  # (rota, método) -> max_body_size próprio da rota
+        self.middleware = []
+        self.metrics = None  # server.metrics.Metrics, quando habilitado
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_keep_alive_requests = max_keep_alive_requests
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.header_timeout = header_timeout
+        self.body_timeout = body_timeout
+        self.max_connections = max_connections
+        self.active_connections = 0
+        self._connections_lock = threading.Lock()
+        # Encerrando: nada de keep-alive, e conexões ociosas são fechadas
+        self.draining = False
+        self.idle_closed = False
+        self._idle = set()
+
+
+    def add_route(self, path, methods, max_body_size=None):
         methods = methods or ["GET"]
 
         def decorator(handler_func):
-            self.routes.append({
-                "path": path,
-                "handler": handler_func,
-                "methods": methods
-            })
+            # A rota é compilada uma única vez, no registro
+            node = self.tree
+            for segment in path.strip("/").split("/") if path.strip("/") else []:
+                node = node.child(segment)
+            node.route = path
+            for method in methods:
+                node.handlers[method] = handler_func
+                if max_body_size is not None:
+                    self.body_limits[(path, method)] = max_body_size
             return handler_func
         return decorator
 
 
-    def handle_connection(self, conn):
+    def use(self, middleware):
+        """Acrescenta um middleware à cadeia, executada em ordem de registro.
+
+        `middleware.before(request, response)` roda antes do handler; se
+        retornar verdadeiro, a resposta já foi enviada e o handler (e os
+        middlewares seguintes) não rodam. `middleware.after(request, response)`
+        roda no fim, em ordem inversa, para todo middleware cujo `before` rodou,
+        mesmo se o handler falhar. Os dois métodos são opcionais.
+        """
+        self.middleware.append(middleware)
+        return middleware
+
+
+    def admit(self):
+        """Reserva uma vaga de conexão; False se o limite `max_connections` foi atingido."""
+        with self._connections_lock:
+            if self.max_connections and self.active_connections >= self.max_connections:
+                return False
+            self.active_connections += 1
+            return True
+
+
+    def release(self):
+        with self._connections_lock:
+            self.active_connections -= 1
+
+
+    def reject(self, conn):
+        """Recusa uma conexão excedente com 503, sem ler a requisição.
+
+        A resposta é curta e o socket não bloqueia: em sobrecarga a recusa
+        precisa custar quase nada, senão ela mesma vira a fila. Sockets são
+        fechados aqui; no modo async quem chama fecha o stream.
+        """
+        if self.metrics:
+            self.metrics.error("overload", 503)
+        is_socket = isinstance(conn, socket.socket)
         try:
-            request = Request.from_socket(conn)
-            response = Response(conn)
-            
-            handler = self.find_handler(request)
-            
-            if handler:
-                handler(request, response)
+            if is_socket:
+                conn.settimeout(0.5)
+            response = Response(conn, keep_alive=False)
+            response.headers["Retry-After"] = "1"
+            response.send(503, "Servidor sobrecarregado, tente novamente.")
+            if is_socket:
+                # Descarta o que já chegou da requisição, para o close não virar RST
+                conn.shutdown(socket.SHUT_WR)
+                conn.setblocking(False)
+                conn.recv(65536)
+        except OSError:
+            pass
+        finally:
+            if is_socket:
+                conn.close()
+
+
+    def drain(self):
+        """Começa o encerramento: cada conexão fecha ao fim da requisição em andamento."""
+        self.draining = True
+
+
+    def close_idle(self):
+        """Fecha as conexões que continuam esperando a próxima requisição."""
+        self.idle_closed = True
+        with self._connections_lock:
+            idle = list(self._idle)
+        for conn in idle:
+            try:
+                # O recv bloqueado no keep-alive retorna vazio, como um cliente que fechou
+                conn.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+
+
+    def _set_idle(self, conn, idle):
+        with self._connections_lock:
+            if idle:
+                self._idle.add(conn)
             else:
-                response.send(404, "Página não encontrada.")
+                self._idle.discard(conn)
+
+
+    def handle_connection(self, conn, keep_alive=True, park=None, state=None):
+        """Atende as requisições de `conn` até a conexão fechar.
+
+        Com `park`, a espera entre requisições não prende a thread: a conexão
+        ociosa é entregue a `park(conn, state)` e o método retorna True, sem
+        fechá-la. Quando chegar dado, `handle_connection(conn, state=state)`
+        continua de onde parou.
+        """
+        if state is None:
+            reader, served = SocketReader(conn), 0
+            if self.metrics:
+                self.metrics.connection_opened()
+        else:
+            reader, served = state
+        # Retomada: o dado já chegou, então a primeira leitura não estaciona de novo
+        ready = state is not None
+        parked = False
+        request = response = None
+        try:
+            # Requisições em pipeline já lidas ficam no buffer do reader e
+            # são respondidas em ordem, uma por iteração.
+            while True:
+                request = response = None
+                # Entre requisições vale o keep-alive; depois do primeiro byte,
+                # o prazo do cabeçalho; depois do cabeçalho, o de inatividade
+                # na leitura do corpo e no envio da resposta.
+                conn.settimeout(self.keep_alive_timeout)
+                # Só a espera entre requisições conta como ociosa; a primeira
+                # requisição de uma conexão nova é sempre atendida.
+                idle = served > 0 and not reader.buffer
+                if idle:
+                    self._set_idle(conn, True)
+                try:
+                    if idle and self.idle_closed:
+                        break
+                    if idle and park is not None and not ready:
+                        # Continua em `_idle` enquanto estacionada: close_idle também a alcança
+                        parked = True
+                        park(conn, (reader, served))
+                        return True
+                    ready = False
+                    request = Request.from_socket(conn, reader, self.max_header_size, self.max_body_size,
+                                                  self.header_timeout, self.body_limit if self.body_limits else None)
+                finally:
+                    if idle and not parked:
+                        self._set_idle(conn, False)
+                if request is None:
+                    break
+                conn.settimeout(self.body_timeout)
+                served += 1
+                response = self.new_response(conn, request, served, keep_alive)
+
+                result = self.dispatch(request, response)
+                # Handlers assíncronos também funcionam nos modos bloqueantes
+                if inspect.isawaitable(result):
+                    asyncio.run(result)
+
+                if not response.keep_alive:
+                    break
+                request.finish()
+        except socket.timeout:
+            # Ocioso entre requisições: só fecha. No meio de uma, avisa o cliente.
+            if request is not None:
+                self.send_error(conn, response, HTTPError(408, "Tempo esgotado ao receber a requisição."))
+        except HTTPError as e:
+            self.send_error(conn, response, e)
         except Exception as e:
-            print(f"Erro ao processar requisição: {e}")
+            self.report_exception(e)
         finally:
-            conn.close()
+            if not parked:
+                conn.close()
+                if self.metrics:
+                    self.metrics.connection_closed()
+        return False
+
+
+    def close_parked(self, conn):
+        """Fecha uma conexão estacionada por `handle_connection` que não voltou a tempo."""
+        self._set_idle(conn, False)
+        conn.close()
+        if self.metrics:
+            self.metrics.connection_closed()
     
     
-    def find_handler(self, request):
-        request_parts = request.path.strip('/').split('/')
-        
-        for route in self.routes:
-            if request.method not in route["methods"]:
-                continue
+    def body_limit(self, request):
+        """Tamanho máximo do corpo da requisição: o da rota, se ela definiu um, ou `max_body_size`."""
+        match = self.match(request.method, request.path)
+        return self.body_limits.get((match.route, request.method), self.max_body_size)
 
-            route_parts = route["path"].strip('/').split('/')
 
-            if len(request_parts) != len(route_parts):
-                continue
+    def report_exception(self, error):
+        if self.metrics:
+            self.metrics.error("exception")
+        print(f"Erro ao processar requisição: {error}")
 
-            match = True
 
-            for i in range(len(route_parts)):
-                if route_parts[i] == "<id>":
-                    continue
-                if route_parts[i] != request_parts[i]:
-                    match = False
-                    break
-            
-            if match:
-                return route["handler"]
+    def send_error(self, conn, response, error):
+        if self.metrics:
+            self.metrics.error("protocol", error.status_code)
+        # Se o handler já começou a responder, só resta fechar a conexão
+        if response is not None and response.sent:
+            return
+        try:
+            Response(conn).send(error.status_code, error.message)
+            if isinstance(conn, socket.socket):
+                self._linger(conn)
+        except OSError:
+            pass
+
+
+    def _linger(self, conn, timeout=1, max_bytes=1024 * 1024):
+        # Fechar com dados não lidos no buffer faz o kernel enviar RST, e o
+        # cliente pode perder a resposta de erro. Descarta um pouco antes.
+        conn.shutdown(socket.SHUT_WR)
+        conn.settimeout(timeout)
+        discarded = 0
+        while discarded < max_bytes:
+            data = conn.recv(65536)
+            if not data:
+                break
+            discarded += len(data)
 
-        return None
\ No newline at end of file
+
+    def new_response(self, conn, request, served, keep_alive=True):
+        remaining = self.max_keep_alive_requests - served
+        return Response(
+            conn,
+            keep_alive=keep_alive and request.keep_alive and remaining > 0 and not self.draining,
+            keep_alive_timeout=self.keep_alive_timeout,
+            keep_alive_max=remaining,
+            chunked=request.version == "HTTP/1.1",
+        )
+
+
+    def dispatch(self, request, response, match=None):
+        match = match or self.match_request(request)
+        if not self.middleware:
+            return self.call_handler(request, response, match)
+
+        started = []
+        is_async = False
+        try:
+            for middleware in self.middleware:
+                started.append(middleware)
+                before = getattr(middleware, "before", None)
+                if before is not None and before(request, response):
+                    return None
+            result = self.call_handler(request, response, match)
+            if inspect.isawaitable(result):
+                # Handler assíncrono: os "after" esperam ele terminar
+                is_async = True
+                return self._finish_async(result, started, request, response)
+            return result
+        finally:
+            if not is_async:
+                self._run_after(started, request, response)
+
+
+    async def _finish_async(self, result, started, request, response):
+        try:
+            return await result
+        finally:
+            self._run_after(started, request, response)
+
+
+    def _run_after(self, started, request, response):
+        for middleware in reversed(started):
+            after = getattr(middleware, "after", None)
+            if after is not None:
+                after(request, response)
+
+
+    def call_handler(self, request, response, match):
+        if match.handler:
+            return match.handler(request, response, **match.params)
+        if match.allowed:
+            response.headers["Allow"] = ", ".join(match.allowed)
+            return response.send(405, "Método não permitido.")
+        response.send(404, "Página não encontrada.")
+
+
+    def match(self, method, path):
+        params = {}
+        node = self.tree.lookup(split_path(path), 0, params)
+        if node is None:
+            return NO_MATCH
+        handler = node.handlers.get(method)
+        if handler is None:
+            return RouteMatch(None, {}, node.route, tuple(sorted(node.handlers)))
+        return RouteMatch(handler, params, node.route, ())
+
+
+    def match_request(self, request):
+        match = self.match(request.method, request.path)
+        request.params = match.params
+        request.route = match.route
+        return match
+
+
+    def find_handler(self, request):
+        return self.match_request(request).handler
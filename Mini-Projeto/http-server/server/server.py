@@ -1,26 +1,393 @@
+import asyncio
+import os
+import queue
+import signal
 import socket
+import stat
+import sys
+import threading
+import time
+from .aio import AsyncEngine
+from .keepalive import IdleConnections
+from .metrics import Metrics
+from .plumbing import BODY_TIMEOUT, HEADER_TIMEOUT, MAX_BODY_SIZE, MAX_HEADER_SIZE
+from .prefork import PreforkSupervisor
 from .router import Router
+from .static import StaticFiles
+from .wsgi import WSGIHandler
+
+# Primeiro descritor passado pelo protocolo de ativação por socket do systemd
+LISTEN_FDS_START = 3
+
+# Intervalo (s) em que o accept bloqueado confere se o servidor está encerrando
+ACCEPT_POLL_INTERVAL = 0.5
+
+
+def inherited_fd():
+    """Descritor de escuta herdado pelas variáveis LISTEN_FDS/LISTEN_PID, ou None.
+
+    É o protocolo do systemd (ativação por socket) e de supervisores
+    compatíveis: o processo recebe o socket já aberto, sem precisar de bind.
+    """
+    try:
+        pid, count = int(os.environ.get("LISTEN_PID", "")), int(os.environ.get("LISTEN_FDS", ""))
+    except ValueError:
+        return None
+    if pid != os.getpid() or count < 1:
+        return None
+    # Processos filhos não devem tentar adotar o mesmo descritor
+    for name in ("LISTEN_PID", "LISTEN_FDS", "LISTEN_FDNAMES"):
+        os.environ.pop(name, None)
+    return LISTEN_FDS_START
+
+
+# Pid do processo substituído num restart a quente, avisado quando o novo está pronto
+RESTART_ENV = "SERVER_RESTART_FROM_PID"
+
+# O restart repete o comando a partir do diretório em que ele foi executado
+# (o app pode ter mudado de diretório depois, como faz o servir_wsgi.py)
+INITIAL_CWD = os.getcwd()
+
 
 class Server:
 
+    MODES = ("serial", "threads", "async", "prefork")
+
 
-    def __init__(self, host='localhost', port=8080):
+    def __init__(self, host='localhost', port=8080, mode="threads", workers=16, backlog=128,
+                 processes=None, worker_mode="threads", reuse_port=False,
+                 keep_alive_timeout=5, max_keep_alive_requests=100,
+                 max_header_size=MAX_HEADER_SIZE, max_body_size=MAX_BODY_SIZE,
+                 header_timeout=HEADER_TIMEOUT, body_timeout=BODY_TIMEOUT,
+                 max_connections=1024, queue_size=None,
+                 unix_socket=None, unix_socket_mode=0o660, listen_fd=None, shutdown_timeout=30):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de execução inválido: {mode!r} (use um de {self.MODES})")
+        if worker_mode not in ("serial", "threads", "async"):
+            raise ValueError(f"Modo de worker inválido: {worker_mode!r}")
         self.host = host
         self.port = port
-        self.router = Router()
+        self.mode = mode
+        self.workers = workers
+        self.backlog = backlog
+        self.processes = processes or os.cpu_count() or 1
+        self.worker_mode = worker_mode
+        self.reuse_port = reuse_port
+        self.queue_size = queue_size or workers * 2
+        # Onde escutar: descritor herdado, socket Unix ou TCP em host/porta, nessa ordem
+        self.listen_fd = listen_fd if listen_fd is not None else inherited_fd()
+        self.unix_socket = unix_socket
+        self.unix_socket_mode = unix_socket_mode
+        self._bound_path = None  # (caminho, pid) do socket Unix criado, removido ao sair
+        self.shutdown_timeout = shutdown_timeout
+        self._stopping = threading.Event()
+        self._listener = None
+        self._engine = None
+        self.router = Router(keep_alive_timeout, max_keep_alive_requests, max_header_size, max_body_size,
+                             header_timeout, body_timeout, max_connections)
 
 
     def start(self):
+        """Atende até receber SIGTERM/SIGINT (ou `stop()`); SIGHUP reinicia a quente.
+
+        No encerramento o servidor para de aceitar conexões, fecha as ociosas
+        e espera as requisições em andamento por até `shutdown_timeout`
+        segundos. No restart, um novo processo (mesmo comando) herda o socket
+        de escuta e, quando está pronto, pede o encerramento deste.
+        """
+        predecessor = os.environ.pop(RESTART_ENV, None)
+        try:
+            if self.mode == "prefork":
+                self._serve_prefork(predecessor)
+                return
+
+            server_socket = self._listen()
+            print(f"Servidor iniciado em {self._describe(server_socket)} (modo {self.mode})")
+            self._notify_predecessor(predecessor)
+            self._serve(self.mode, server_socket)
+        finally:
+            self._remove_socket_file()
+
+
+    def stop(self):
+        """Encerra com drenagem; pode ser chamado de qualquer thread (ou de um handler de sinal)."""
+        self._stopping.set()
+        if self._engine is not None:
+            self._engine.stop()
+        elif self._listener is not None:
+            # Fechar o socket não acorda um accept bloqueado em outra thread;
+            # o loop de accept confere `_stopping` a cada ACCEPT_POLL_INTERVAL.
+            self._listener.close()
+
+
+    def restart(self):
+        """Inicia um novo processo com o mesmo comando, que herda o socket de escuta.
+
+        Este processo continua atendendo até o novo avisar que está pronto
+        (com SIGTERM); então drena e sai. Se o novo falhar ao iniciar, este
+        segue atendendo.
+        """
+        listener = self._listener
+        env = dict(os.environ, **{RESTART_ENV: str(os.getpid())})
+        argv = list(sys.orig_argv)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                if listener is not None:
+                    os.dup2(listener.fileno(), LISTEN_FDS_START)
+                    os.set_inheritable(LISTEN_FDS_START, True)
+                    env.update(LISTEN_FDS="1", LISTEN_PID=str(os.getpid()))
+                os.chdir(INITIAL_CWD)
+                os.execve(sys.executable, argv, env)
+            finally:
+                os._exit(1)
+        # O arquivo do socket Unix passa a ser do novo processo
+        self._bound_path = None
+        print(f"Reiniciando: novo processo {pid}.")
+        return pid
+
+
+    def _notify_predecessor(self, predecessor):
+        if predecessor is None:
+            return
+        try:
+            os.kill(int(predecessor), signal.SIGTERM)
+        except (ProcessLookupError, ValueError):
+            pass
+
+
+    def _install_signals(self, restartable=True):
+        # Handlers de sinal só podem ser instalados na thread principal
+        if threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: self.stop())
+        if restartable:
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.restart())
+        else:
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+
+    def _drain(self):
+        """Encerra o keep-alive, fecha as conexões ociosas e espera as ativas terminarem, até o prazo."""
+        self.router.drain()
+        start = time.monotonic()
+        deadline = start + self.shutdown_timeout
+        grace = start + min(self.router.DRAIN_IDLE_GRACE, self.shutdown_timeout)
+        while self.router.active_connections and time.monotonic() < grace:
+            time.sleep(0.05)
+        self.router.close_idle()
+        while self.router.active_connections and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if self.router.active_connections:
+            print(f"Prazo de encerramento esgotado: {self.router.active_connections} conexões interrompidas.")
+
+
+    def _describe(self, server_socket):
+        if server_socket.family == socket.AF_UNIX:
+            return f"unix:{server_socket.getsockname()}"
+        host, port = server_socket.getsockname()[:2]
+        return f"http://{host}:{port}/usuarios"
+
+
+    def _listen(self, reuse_port=False):
+        if self.listen_fd is not None:
+            # Socket já aberto e em escuta, passado pelo supervisor
+            server_socket = socket.socket(fileno=self.listen_fd)
+            if server_socket.family == socket.AF_UNIX and server_socket.getsockname() == self.unix_socket:
+                self._bound_path = (self.unix_socket, os.getpid())  # herdado num restart a quente
+            return server_socket
+        if self.unix_socket is not None:
+            return self._listen_unix()
+
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         server_socket.bind((self.host, self.port))
-        server_socket.listen(5)
-        print(f"Servidor iniciado em http://{self.host}:{self.port}/usuarios")
+        server_socket.listen(self.backlog)
+        return server_socket
+
+
+    def _listen_unix(self):
+        path = self.unix_socket
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                # Sobra de uma execução anterior: só remove se ninguém mais atende
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    if probe.connect_ex(path) == 0:
+                        raise OSError(f"Já existe um servidor atendendo em {path}")
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server_socket.bind(path)
+        os.chmod(path, self.unix_socket_mode)
+        server_socket.listen(self.backlog)
+        self._bound_path = (path, os.getpid())
+        return server_socket
+
+
+    def _remove_socket_file(self):
+        # Workers do prefork herdam o atributo, mas só o processo que criou o arquivo o remove
+        if self._bound_path is not None and self._bound_path[1] == os.getpid():
+            try:
+                os.unlink(self._bound_path[0])
+            except FileNotFoundError:
+                pass
+            self._bound_path = None
+
+
+    def _serve(self, mode, server_socket, restartable=True):
+        self._listener = server_socket
+        if mode == "async":
+            self._serve_async(server_socket, restartable)
+            return
+        self._install_signals(restartable)
+        # O modo bloqueante (O_NONBLOCK) é do socket, não do descritor: fica
+        # compartilhado com outro processo que use o mesmo socket (restart a
+        # quente, workers async). Com timeout o accept espera com poll e
+        # funciona nos dois modos.
+        server_socket.settimeout(ACCEPT_POLL_INTERVAL)
+        if mode == "serial":
+            self._serve_serial(server_socket)
+        else:
+            self._serve_threads(server_socket)
+        self._drain()
+
+
+    def _accept(self, server_socket):
+        """Aceita uma conexão; None quando o servidor está encerrando."""
+        while True:
+            try:
+                return server_socket.accept()[0]
+            except socket.timeout:
+                if self._stopping.is_set():
+                    return None
+                continue
+            except OSError:
+                if self._stopping.is_set():
+                    return None
+                raise
+
+
+    def _serve_serial(self, server_socket):
+        while True:
+            conn = self._accept(server_socket)
+            if conn is None:
+                return
+            # Sem keep-alive: um cliente ocioso bloquearia todos os outros
+            self.router.handle_connection(conn, keep_alive=False)
+
+
+    def _serve_threads(self, server_socket):
+        # Fila limitada: quando todos os workers estão ocupados e a fila enche,
+        # a conexão é recusada na hora com 503, em vez de esperar sem prazo
+        # (o cliente pode tentar de novo; a espera só aumentaria a latência).
+        # O limite vale só para conexões novas: as que voltam do keep-alive
+        # já foram admitidas e sempre entram.
+        pending = queue.Queue()
+
+        def expire(conn):
+            self.router.close_parked(conn)
+            self.router.release()
+
+        # Conexões ociosas entre requisições esperam aqui, sem ocupar um worker
+        idle = IdleConnections(lambda conn, state: pending.put((conn, state)), expire,
+                               self.router.keep_alive_timeout)
+
+        def worker():
+            while True:
+                conn, state = pending.get()
+                parked = False
+                try:
+                    parked = self.router.handle_connection(conn, park=idle.park, state=state)
+                finally:
+                    if not parked:
+                        self.router.release()
+                    pending.task_done()
+
+        for i in range(self.workers):
+            threading.Thread(target=worker, name=f"http-worker-{i}", daemon=True).start()
 
         while True:
-            conn, addr = server_socket.accept()
-            self.router.handle_connection(conn)
+            conn = self._accept(server_socket)
+            if conn is None:
+                return
+            if not self.router.admit():
+                self.router.reject(conn)
+                continue
+            if pending.qsize() >= self.queue_size:
+                self.router.release()
+                self.router.reject(conn)
+            else:
+                pending.put((conn, None))
+
+
+    def _serve_async(self, server_socket, restartable=True):
+        self._engine = AsyncEngine(self.router, workers=self.workers)
+        signals = {}
+        if threading.current_thread() is threading.main_thread():
+            signals = {signal.SIGTERM: self.stop, signal.SIGINT: self.stop,
+                       signal.SIGHUP: self.restart if restartable else lambda: None}
+        asyncio.run(self._engine.serve(server_socket, backlog=self.backlog,
+                                       shutdown_timeout=self.shutdown_timeout, signals=signals))
+
+
+    def _serve_prefork(self, predecessor=None):
+        # Com SO_REUSEPORT cada worker abre o próprio socket TCP e o kernel
+        # distribui as conexões; sem ele (ou com socket Unix ou herdado),
+        # todos herdam o socket do pai.
+        per_worker = self.reuse_port and self.listen_fd is None and self.unix_socket is None
+        shared_socket = None if per_worker else self._listen()
+        self._listener = shared_socket
+
+        def serve_worker(slot):
+            server_socket = shared_socket or self._listen(reuse_port=True)
+            # Restart e encerramento são coordenados pelo supervisor
+            self._serve(self.worker_mode, server_socket, restartable=False)
+
+        address = self._describe(shared_socket) if shared_socket else f"http://{self.host}:{self.port}/usuarios"
+        print(f"Servidor iniciado em {address} (modo prefork: {self.processes} processos x {self.worker_mode})")
+        supervisor = PreforkSupervisor(self.processes, serve_worker, stop_timeout=self.shutdown_timeout + 5,
+                                       on_restart=self.restart,
+                                       on_ready=lambda: self._notify_predecessor(predecessor))
+        supervisor.run()
+
+
+    def route(self, path, methods=None, max_body_size=None):
+        """Registra um handler. `max_body_size` substitui o limite do corpo só nessa rota."""
+        return self.router.add_route(path, methods, max_body_size)
+
+
+    def use(self, middleware):
+        return self.router.use(middleware)
+
+
+    def enable_metrics(self, path="/metrics"):
+        """Mede todas as requisições e expõe os números em `path` (texto do Prometheus)."""
+        metrics = Metrics()
+        # Primeiro da cadeia, para medir também o que outros middlewares respondem
+        self.router.middleware.insert(0, metrics)
+        self.router.metrics = metrics
+        self.router.add_route(path, ["GET"])(metrics)
+        return metrics
+
+
+    def wsgi(self, app, prefix="/"):
+        """Repassa as requisições sob `prefix` a uma aplicação WSGI (Flask, por exemplo).
+
+        Rotas registradas no Server continuam com prioridade sobre o app.
+        """
+        prefix = prefix.rstrip("/")
+        handler = WSGIHandler(app, self.host, self.port, prefix, multiprocess=self.mode == "prefork")
+        methods = list(WSGIHandler.METHODS)
+        self.router.add_route(prefix or "/", methods)(handler)
+        self.router.add_route(prefix + "/<path:wsgi_path>", methods)(handler)
+        return handler
 
 
-    def route(self, path, methods=None):
-        return self.router.add_route(path, methods)
\ No newline at end of file
+    def static(self, prefix, directory, **options):
+        handler = StaticFiles(directory, **options)
+        return self.router.add_route(prefix.rstrip("/") + "/<path:filename>", ["GET", "HEAD"])(handler)
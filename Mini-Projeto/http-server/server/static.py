@@ -0,0 +1,185 @@
+import hashlib
+import mimetypes
+import os
+import stat
+import threading
+import time
+from collections import namedtuple
+from email.utils import formatdate, parsedate_to_datetime
+
+from .compression import negotiate
+
+
+FileInfo = namedtuple("FileInfo", "mtime_ns size inode etag last_modified content_type checked_at")
+
+# Arquivo que não existia na última consulta (guardado só para os .gz)
+Missing = namedtuple("Missing", "checked_at")
+
+
+class StaticFiles:
+    """Handler que serve arquivos de um diretório (rota /prefixo/<path:filename>).
+
+    Com `precompressed`, se existir `arquivo.gz` ao lado do arquivo (e não
+    mais antigo que ele), clientes que aceitam gzip recebem o `.gz` com
+    `Content-Encoding: gzip`, sem compressão a cada requisição.
+    """
+
+
+    def __init__(self, directory, max_age=3600, revalidate_after=1.0, precompressed=True):
+        self.directory = os.path.realpath(directory)
+        self.max_age = max_age
+        self.precompressed = precompressed
+        # Dentro dessa janela os metadados em cache são usados sem novo stat
+        self.revalidate_after = revalidate_after
+        self._cache = {}
+        self._lock = threading.Lock()
+
+
+    def __call__(self, request, response, filename):
+        path = self.resolve(filename)
+        info = self.file_info(path) if path else None
+        if info is None:
+            return response.send(404, "Arquivo não encontrado.")
+
+        if self.precompressed:
+            path, info = self.select_encoding(request, response, path, info)
+
+        response.headers["Content-Type"] = info.content_type
+        response.headers["ETag"] = info.etag
+        response.headers["Last-Modified"] = info.last_modified
+        response.headers["Cache-Control"] = f"public, max-age={self.max_age}"
+        response.headers["Accept-Ranges"] = "bytes"
+
+        if self.not_modified(request, info):
+            return response.send_head(304)
+
+        status, offset, count = 200, 0, info.size
+        byte_range = self.parse_range(request, info)
+        if byte_range == "invalid":
+            response.headers["Content-Range"] = f"bytes */{info.size}"
+            return response.send(416, "")
+        if byte_range:
+            offset, end = byte_range
+            status, count = 206, end - offset + 1
+            response.headers["Content-Range"] = f"bytes {offset}-{end}/{info.size}"
+
+        with open(path, "rb") as f:
+            response.send_file(status, f, offset, count, head_only=request.method == "HEAD")
+
+
+    def select_encoding(self, request, response, path, info):
+        # A ausência do .gz também fica em cache: senão cada acerto custaria um stat
+        gzipped = self.file_info(path + ".gz", remember_missing=True)
+        if gzipped is None or gzipped.mtime_ns < info.mtime_ns:
+            return path, info
+        response.headers["Vary"] = "Accept-Encoding"
+        if negotiate(request.header("Accept-Encoding"), ("gzip",)) != "gzip":
+            return path, info
+        # O .gz tem ETag próprio (é outra representação) e o tipo do original
+        response.headers["Content-Encoding"] = "gzip"
+        return path + ".gz", gzipped._replace(content_type=info.content_type)
+
+
+    def resolve(self, filename):
+        # realpath resolve "..", links e afins; o resultado precisa continuar dentro do diretório
+        path = os.path.realpath(os.path.join(self.directory, filename))
+        if not path.startswith(self.directory + os.sep):
+            return None
+        return path
+
+
+    def file_info(self, path, remember_missing=False):
+        """Metadados de `path`, ou None se ele não é um arquivo.
+
+        Com `remember_missing`, a ausência também fica em cache pelo mesmo
+        `revalidate_after`. Só vale para caminhos derivados de arquivos que
+        existem (os `.gz`): os pedidos pelo cliente poderiam encher o cache.
+        """
+        now = time.monotonic()
+        cached = self._cache.get(path)
+        if cached is not None and now - cached.checked_at < self.revalidate_after:
+            return cached if isinstance(cached, FileInfo) else None
+
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
+            if remember_missing:
+                with self._lock:
+                    self._cache[path] = Missing(now)
+            return None
+
+        if isinstance(cached, FileInfo) and (cached.mtime_ns, cached.size, cached.inode) == (st.st_mtime_ns, st.st_size, st.st_ino):
+            info = cached._replace(checked_at=now)
+        else:
+            # Arquivo novo ou alterado: só aqui o conteúdo é lido para gerar o ETag
+            info = FileInfo(
+                mtime_ns=st.st_mtime_ns,
+                size=st.st_size,
+                inode=st.st_ino,
+                etag=f'"{self._hash(path)}"',
+                last_modified=formatdate(st.st_mtime, usegmt=True),
+                content_type=self._content_type(path),
+                checked_at=now,
+            )
+        with self._lock:
+            self._cache[path] = info
+        return info
+
+
+    def _hash(self, path):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(65536), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+    def _content_type(self, path):
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+            content_type += "; charset=utf-8"
+        return content_type
+
+
+    def not_modified(self, request, info):
+        if_none_match = request.header("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or info.etag in tags or f"W/{info.etag}" in tags
+
+        if_modified_since = request.header("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(info.mtime_ns // 1_000_000_000) <= since
+        return False
+
+
+    def parse_range(self, request, info):
+        """Retorna (início, fim) inclusivo, None para o arquivo inteiro ou "invalid"."""
+        header = request.header("Range")
+        if not header or not header.startswith("bytes=") or "," in header:
+            return None
+        if_range = request.header("If-Range")
+        if if_range and if_range != info.etag:
+            return None
+
+        start, _, end = header[len("bytes="):].strip().partition("-")
+        try:
+            if start:
+                start = int(start)
+                end = int(end) if end else info.size - 1
+            else:
+                # bytes=-N: os últimos N bytes
+                start = max(0, info.size - int(end))
+                end = info.size - 1
+        except ValueError:
+            return None
+
+        if start >= info.size or start > end:
+            return "invalid"
+        return start, min(end, info.size - 1)
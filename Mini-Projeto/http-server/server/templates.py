@@ -0,0 +1,221 @@
+import ast
+import builtins
+import html
+import os
+import re
+import threading
+
+
+TOKEN = re.compile(r"(\{\{.*?\}\}|\{%.*?%\})", re.DOTALL)
+INCLUDE = re.compile(r"""^include\s+["'](.+?)["']$""")
+
+# Dentro de laços o buffer é entregue (modo stream) quando passa desse número de partes
+FLUSH_PARTES = 64
+
+
+class TemplateError(Exception):
+    pass
+
+
+def _escape(valor, _str=str, _int=int, _html=html.escape):
+    if valor.__class__ is _int:
+        return _str(valor)  # caso comum (ids): nada a escapar
+    return "" if valor is None else _html(_str(valor), quote=True)
+
+
+def _raw(valor):
+    return "" if valor is None else str(valor)
+
+
+class Template:
+    """Template compilado para uma função Python geradora.
+
+    Sintaxe: `{{ expr }}` (escapado), `{{ expr|safe }}` (sem escape),
+    `{% for x in expr %}...{% endfor %}`, `{% if %}/{% elif %}/{% else %}/{% endif %}`
+    e `{% include "outro.html" %}`.
+    """
+
+
+    def __init__(self, source, nome="<template>", carregar=None):
+        self.nome = nome
+        self.dependencias = []
+        codigo = self._gerar(source, carregar)
+        namespace = {}
+        exec(compile(codigo, nome, "exec"), {"_e": _escape, "_s": _raw, "_b": builtins.__dict__}, namespace)
+        self._render = namespace["_render"]
+
+
+    def render(self, **contexto):
+        return "".join(self._render(contexto))
+
+
+    def stream(self, **contexto):
+        """Gera o resultado em partes (para Response.stream)."""
+        return self._render(contexto)
+
+
+    def _tokens(self, source, carregar, pilha=()):
+        for parte in TOKEN.split(source):
+            if parte.startswith("{%"):
+                instrucao = parte[2:-2].strip()
+                incluido = INCLUDE.match(instrucao)
+                if incluido:
+                    nome = incluido.group(1)
+                    if carregar is None or nome in pilha:
+                        raise TemplateError(f"include inválido em {self.nome}: {nome}")
+                    # Includes são embutidos na compilação; o arquivo vira dependência do cache
+                    caminho, conteudo = carregar(nome)
+                    self.dependencias.append(caminho)
+                    yield from self._tokens(conteudo, carregar, pilha + (nome,))
+                    continue
+            yield parte
+
+
+    def _gerar(self, source, carregar):
+        linhas = []
+        nomes = set()
+        nivel = 1
+        blocos = []
+
+        saida = []  # (texto ou expressão, é_expressão) entre duas instruções
+
+        def emitir(linha):
+            linhas.append("    " * nivel + linha)
+
+        def descarregar():
+            """Escreve o trecho pendente com um único `formato % (valores)`."""
+            if not saida:
+                return
+            formato = "".join("%s" if e else t.replace("%", "%%") for t, e in saida)
+            valores = [t for t, e in saida if e]
+            saida.clear()
+            if not valores:
+                emitir(f"_w({formato.replace('%%', '%')!r})")
+                return
+            # Expressões repetidas no trecho (ex.: u.id em vários links) são avaliadas uma vez
+            for i, valor in enumerate(sorted({v for v in valores if valores.count(v) > 1})):
+                emitir(f"_v{i} = {valor}")
+                valores = [f"_v{i}" if v == valor else v for v in valores]
+            emitir(f"_w({formato!r} % ({', '.join(valores)},))")
+
+        def usar(expressao):
+            try:
+                arvore = ast.parse(expressao, mode="eval")
+            except SyntaxError as e:
+                raise TemplateError(f"Expressão inválida em {self.nome}: {expressao!r}") from e
+            nomes.update(n.id for n in ast.walk(arvore) if isinstance(n, ast.Name))
+            return expressao
+
+        for parte in self._tokens(source, carregar):
+            if not parte:
+                continue
+            if parte.startswith("{{"):
+                expressao = parte[2:-2].strip()
+                if expressao.endswith("|safe"):
+                    saida.append((f"_s({usar(expressao[:-5].strip())})", True))
+                else:
+                    saida.append((f"_e({usar(expressao)})", True))
+            elif parte.startswith("{%"):
+                descarregar()
+                instrucao = parte[2:-2].strip()
+                palavra = instrucao.split(None, 1)[0] if instrucao else ""
+                if palavra == "for":
+                    alvo, _, iteravel = instrucao[3:].partition(" in ")
+                    usar(iteravel)
+                    emitir(f"for {alvo.strip()} in {iteravel.strip()}:")
+                    blocos.append("for")
+                    nivel += 1
+                    emitir("pass")
+                elif palavra == "endfor":
+                    if not blocos or blocos.pop() != "for":
+                        raise TemplateError(f"endfor sem for em {self.nome}")
+                    # Ao fim de cada volta o que já foi gerado pode seguir para o cliente
+                    emitir(f"if len(_buf) > {FLUSH_PARTES}:")
+                    emitir("    yield ''.join(_buf)")
+                    emitir("    _buf.clear()")
+                    nivel -= 1
+                elif palavra == "if":
+                    emitir(f"if {usar(instrucao[2:].strip())}:")
+                    blocos.append("if")
+                    nivel += 1
+                    emitir("pass")
+                elif palavra in ("elif", "else"):
+                    if not blocos or blocos[-1] != "if":
+                        raise TemplateError(f"{palavra} sem if em {self.nome}")
+                    nivel -= 1
+                    emitir(f"elif {usar(instrucao[4:].strip())}:" if palavra == "elif" else "else:")
+                    nivel += 1
+                    emitir("pass")
+                elif palavra == "endif":
+                    if not blocos or blocos.pop() != "if":
+                        raise TemplateError(f"endif sem if em {self.nome}")
+                    nivel -= 1
+                else:
+                    raise TemplateError(f"Instrução desconhecida em {self.nome}: {instrucao!r}")
+            else:
+                saida.append((parte, False))
+
+        if blocos:
+            raise TemplateError(f"Bloco {blocos[-1]} sem fim em {self.nome}")
+        descarregar()
+        emitir("yield ''.join(_buf)")
+
+        # Variáveis do contexto viram locais da função (acesso rápido);
+        # nomes fora do contexto caem nos builtins (len, range...).
+        cabecalho = ["def _render(_ctx):", "    _buf = []", "    _w = _buf.append"]
+        for nome in sorted(nomes):
+            cabecalho.append(f"    {nome} = _ctx[{nome!r}] if {nome!r} in _ctx else _b.get({nome!r})")
+        return "\n".join(cabecalho + linhas) + "\n"
+
+
+class Templates:
+    """Carrega templates de um diretório, compilando cada um uma única vez.
+
+    O cache é invalidado quando o mtime do arquivo (ou de algum include) muda.
+    """
+
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self._cache = {}
+        self._lock = threading.Lock()
+
+
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+
+    def _ler(self, nome):
+        caminho = self._caminho(nome)
+        with open(caminho, "r", encoding="utf-8") as f:
+            return caminho, f.read()
+
+
+    def _mtimes(self, caminhos):
+        try:
+            return tuple(os.stat(c).st_mtime_ns for c in caminhos)
+        except FileNotFoundError:
+            return None
+
+
+    def get(self, nome):
+        em_cache = self._cache.get(nome)
+        if em_cache is not None:
+            template, caminhos, mtimes = em_cache
+            if self._mtimes(caminhos) == mtimes:
+                return template
+
+        with self._lock:
+            caminho, source = self._ler(nome)
+            template = Template(source, caminho, self._ler)
+            caminhos = [caminho] + template.dependencias
+            self._cache[nome] = (template, caminhos, self._mtimes(caminhos))
+            return template
+
+
+    def render(self, nome, **contexto):
+        return self.get(nome).render(**contexto)
+
+
+    def stream(self, nome, **contexto):
+        return self.get(nome).stream(**contexto)
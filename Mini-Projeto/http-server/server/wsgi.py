@@ -0,0 +1,190 @@
+import socket
+import sys
+from itertools import chain
+from urllib.parse import unquote_to_bytes
+
+# Cabeçalhos da conexão, definidos pelo servidor e proibidos para o app (PEP 3333)
+HOP_BY_HOP = {"connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade",
+              "proxy-authenticate", "proxy-authorization"}
+
+
+class WSGIInput:
+    """`wsgi.input`: o corpo da requisição como arquivo (read, readline, iteração)."""
+
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = b""
+
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data, self.buffer = self.buffer + (self.stream.read() if self.stream else b""), b""
+            return data
+        if len(self.buffer) < size and self.stream:
+            self.buffer += self.stream.read(size - len(self.buffer))
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+    def readline(self, size=-1):
+        while b"\n" not in self.buffer and (size is None or size < 0 or len(self.buffer) < size):
+            data = self.stream.read_some() if self.stream else b""
+            if not data:
+                break
+            self.buffer += data
+        end = self.buffer.find(b"\n") + 1 or len(self.buffer)
+        if size is not None and size >= 0:
+            end = min(end, size)
+        data, self.buffer = self.buffer[:end], self.buffer[end:]
+        return data
+
+
+    def readlines(self, hint=-1):
+        return list(self)
+
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+
+def _peer(conn):
+    try:
+        if isinstance(conn, socket.socket):
+            peer = conn.getpeername()
+        else:
+            peer = conn.writer.get_extra_info("peername")
+    except (AttributeError, OSError):
+        return "", 0
+    # Em socket Unix o par é um caminho (ou vazio), não (endereço, porta)
+    return peer[:2] if isinstance(peer, tuple) else ("", 0)
+
+
+class WSGIHandler:
+    """Handler que repassa a requisição a uma aplicação WSGI.
+
+    Registrado com `Server.wsgi(app, prefix)`; o `prefix` vira o
+    `SCRIPT_NAME` e o restante do caminho o `PATH_INFO`. Respostas de uma
+    parte só saem com `Content-Length` (e podem entrar no cache de
+    respostas); as demais são enviadas à medida que o app as produz.
+    """
+
+    METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+
+
+    def __init__(self, app, server_name="localhost", server_port=80, script_name="", multiprocess=False):
+        self.app = app
+        self.server_name = server_name
+        self.server_port = str(server_port)
+        self.script_name = script_name.rstrip("/")
+        self.multiprocess = multiprocess
+
+
+    def environ(self, request, response):
+        path = unquote_to_bytes(request.path).decode("latin-1")
+        if self.script_name and path.startswith(self.script_name):
+            path = path[len(self.script_name):]
+        remote_addr, remote_port = _peer(response.conn)
+        environ = {
+            "REQUEST_METHOD": request.method,
+            "SCRIPT_NAME": self.script_name,
+            "PATH_INFO": path,
+            "QUERY_STRING": request.query_string,
+            "SERVER_NAME": self.server_name,
+            "SERVER_PORT": self.server_port,
+            "SERVER_PROTOCOL": request.version,
+            "REMOTE_ADDR": remote_addr,
+            "REMOTE_PORT": str(remote_port),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": WSGIInput(request.stream),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": self.multiprocess,
+            "wsgi.run_once": False,
+            # O servidor já delimita o corpo: ler além do fim devolve b""
+            "wsgi.input_terminated": True,
+        }
+        for name in request.headers:
+            # Cabeçalhos repetidos viram um só valor, separados por vírgula
+            values = request.headers.get_all(name)
+            if name == "content-type":
+                environ["CONTENT_TYPE"] = values[0]
+            elif name == "content-length":
+                environ["CONTENT_LENGTH"] = values[0]
+            else:
+                key = "HTTP_" + name.upper().replace("-", "_")
+                environ[key] = ("; " if name == "cookie" else ", ").join(values)
+        return environ
+
+
+    def __call__(self, request, response, **params):
+        state = {}
+        written = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None:
+                try:
+                    if response.sent:
+                        raise exc_info[1].with_traceback(exc_info[2])
+                finally:
+                    exc_info = None
+            elif "status" in state:
+                raise AssertionError("start_response chamado duas vezes sem exc_info.")
+            state["status"] = status
+            state["headers"] = headers
+            # Escritas pelo callable legado `write` são enviadas antes do iterável
+            return written.append
+
+        result = self.app(self.environ(request, response), start_response)
+        try:
+            chunks = iter(result)
+            # O primeiro pedaço pode ser o único: aí a resposta sai com Content-Length
+            first = next(chunks, None)
+            if "status" not in state:
+                raise RuntimeError("A aplicação WSGI não chamou start_response.")
+            content_length = self._apply_headers(response, state["status"], state["headers"])
+            parts = written + ([first] if first is not None else [])
+
+            if content_length is not None:
+                response.stream(response.status_code, chain(parts, chunks), content_length)
+                return
+            rest = next(chunks, None)
+            if rest is None:
+                response.send(response.status_code, b"".join(parts))
+            else:
+                response.stream(response.status_code, chain(parts, [rest], chunks))
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                close()
+
+
+    def _apply_headers(self, response, status, headers):
+        """Copia status e cabeçalhos do app para a resposta; devolve o Content-Length, se houver."""
+        code, _, reason = status.partition(" ")
+        response.status_code = int(code)
+        response.reason = reason or None
+        # O Content-Type padrão do Server é para HTML; o do app prevalece
+        response.headers.pop("Content-Type", None)
+        content_length = None
+        defaults = {name.lower(): name for name in response.headers}
+        seen = set()
+        for name, value in headers:
+            lower = name.lower()
+            if lower in HOP_BY_HOP:
+                continue
+            if lower == "content-length":
+                content_length = int(value)
+            elif lower in seen:
+                response.extra_headers.append((name, value))  # Set-Cookie repetido, por exemplo
+            else:
+                if lower in defaults:
+                    del response.headers[defaults[lower]]
+                response.headers[name] = value
+                seen.add(lower)
+        return content_length
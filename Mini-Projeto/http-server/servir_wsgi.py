@@ -0,0 +1,50 @@
+"""Serve uma aplicação WSGI (Flask) com o Server, em qualquer modo de execução.
+
+Uso (a partir de Mini-Projeto/http-server):
+    python3 servir_wsgi.py ../../Cache_E_Sessoes/app_without_cache.py:app --modo threads --porta 5000
+
+O diretório do app vira o diretório de trabalho e entra no sys.path, como
+quando ele é executado diretamente com `python3 app.py`.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+
+from server import Server
+
+
+def carregar_app(alvo):
+    """Importa `caminho/arquivo.py:objeto` (objeto padrão: `app`)."""
+    caminho, _, nome = alvo.partition(":")
+    caminho = os.path.abspath(caminho)
+    diretorio = os.path.dirname(caminho)
+    os.chdir(diretorio)
+    sys.path.insert(0, diretorio)
+    spec = importlib.util.spec_from_file_location("wsgi_app", caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules["wsgi_app"] = modulo
+    spec.loader.exec_module(modulo)
+    return getattr(modulo, nome or "app")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve uma aplicação WSGI (Flask) com o Server.")
+    parser.add_argument("alvo", help="arquivo do app e objeto WSGI, ex.: ../../Atividade_BD/app.py:app")
+    parser.add_argument("--modo", choices=Server.MODES, default="threads")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--porta", type=int, default=5000)
+    parser.add_argument("--unix", help="caminho de um socket Unix (no lugar de host/porta)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--processos", type=int, help="processos no modo prefork (padrão: núcleos)")
+    opcoes = parser.parse_args()
+
+    app = carregar_app(opcoes.alvo)
+    server = Server(opcoes.host, opcoes.porta, mode=opcoes.modo, workers=opcoes.workers,
+                    processes=opcoes.processos, unix_socket=opcoes.unix)
+    server.wsgi(app)
+    server.start()
+
+
+if __name__ == "__main__":
+    main()
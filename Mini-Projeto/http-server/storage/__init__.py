@@ -0,0 +1,2 @@
+from .mmap_usuarios import MmapUsuarioStore, abrir_store
+from .usuarios import EmailDuplicado, Usuario, UsuarioStore
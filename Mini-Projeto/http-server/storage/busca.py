@@ -0,0 +1,142 @@
+import unicodedata
+from bisect import bisect_left, insort
+from heapq import merge
+
+
+def normalizar_email(email):
+    return email.strip().casefold()
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sem acentos e com espaços simples: "  João  Silva" -> "joao silva"."""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acentos.casefold().split())
+
+
+def termos(usuario):
+    """Termos de busca do usuário: o e-mail, o nome completo e cada palavra do nome."""
+    nome = normalizar_texto(usuario.nome)
+    resultado = set(nome.split())
+    resultado.add(nome)
+    resultado.add(normalizar_email(usuario.email))
+    resultado.discard("")
+    return resultado
+
+
+class IndiceBusca:
+    """Índices secundários dos usuários: hash por e-mail e lista ordenada de termos.
+
+    `emails` (e-mail normalizado -> id) responde em O(1) se um e-mail já
+    está em uso. `termos` guarda pares (termo, id) ordenados; a busca por
+    prefixo é binária até o primeiro termo que começa com o texto e segue
+    em ordem só enquanto os termos casam, sem percorrer os demais usuários.
+
+    Alterações não mexem em `termos`, que pode ter milhões de pares: os
+    pares novos vão para `_pendentes` (pequena, mantida ordenada) e os
+    removidos para o conjunto `_removidos`, filtrado na busca. Só quando as
+    alterações acumuladas passam de LIMITE_PENDENTES, ou de 1/16 de
+    `termos`, a lista é refeita de uma vez; o custo dessa junção, linear, se
+    dilui entre as alterações que a provocaram.
+
+    `trocar` roda sob o lock de escrita do store e `buscar` sob o de
+    leitura, então uma busca nunca vê os índices no meio de uma alteração.
+    """
+
+    # Mínimo de alterações acumuladas antes de refazer `termos`
+    LIMITE_PENDENTES = 1024
+
+
+    def __init__(self, usuarios=()):
+        self.emails = {}
+        pares = []
+        for usuario in usuarios:
+            self._guardar_email(usuario)
+            pares.extend((termo, usuario.id) for termo in termos(usuario))
+        pares.sort()
+        self.termos = pares
+        self._pendentes = []
+        self._removidos = set()
+
+
+    def _guardar_email(self, usuario):
+        email = normalizar_email(usuario.email)
+        if email:
+            self.emails[email] = usuario.id
+
+
+    def dono(self, email):
+        """Id do usuário que usa `email`, ou None."""
+        return self.emails.get(normalizar_email(email))
+
+
+    def trocar(self, antigo, novo):
+        """Substitui `antigo` por `novo` nos índices; qualquer um dos dois pode ser None."""
+        removidos = termos(antigo) if antigo is not None else set()
+        incluidos = termos(novo) if novo is not None else set()
+
+        if antigo is not None:
+            email = normalizar_email(antigo.email)
+            if self.emails.get(email) == antigo.id:
+                del self.emails[email]
+            for termo in removidos - incluidos:
+                self._remover_par((termo, antigo.id))
+        if novo is not None:
+            self._guardar_email(novo)
+            for termo in incluidos - removidos:
+                self._incluir_par((termo, novo.id))
+
+        if len(self._pendentes) + len(self._removidos) > max(self.LIMITE_PENDENTES, len(self.termos) // 16):
+            self._juntar()
+
+
+    def _incluir_par(self, par):
+        if par in self._removidos:
+            # O par ainda está em `termos`: basta deixar de filtrá-lo
+            self._removidos.discard(par)
+        else:
+            insort(self._pendentes, par)
+
+
+    def _remover_par(self, par):
+        i = bisect_left(self._pendentes, par)
+        if i < len(self._pendentes) and self._pendentes[i] == par:
+            del self._pendentes[i]
+        else:
+            self._removidos.add(par)
+
+
+    def _juntar(self):
+        """Refaz `termos` com as alterações acumuladas (duas sequências ordenadas: a ordenação é linear)."""
+        removidos = self._removidos
+        juntos = [par for par in self.termos if par not in removidos] if removidos else self.termos[:]
+        juntos += self._pendentes
+        juntos.sort()
+        self.termos = juntos
+        self._pendentes = []
+        self._removidos = set()
+
+
+    def buscar(self, texto, limite):
+        """Ids (sem repetição) dos usuários com algum termo começando por `texto`, em ordem de termo."""
+        prefixo = normalizar_texto(texto)
+        if not prefixo:
+            return []
+        ids = {}
+        removidos = self._removidos
+        for par in merge(_casando(self.termos, prefixo), _casando(self._pendentes, prefixo)):
+            if par in removidos:
+                continue
+            ids[par[1]] = None
+            if len(ids) >= limite:
+                break
+        return list(ids)
+
+
+def _casando(lista, prefixo):
+    """Pares de `lista` (ordenada) cujo termo começa com `prefixo`, em ordem."""
+    for i in range(bisect_left(lista, (prefixo,)), len(lista)):
+        par = lista[i]
+        if not par[0].startswith(prefixo):
+            return
+        yield par
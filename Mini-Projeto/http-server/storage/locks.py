@@ -0,0 +1,119 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem flock, vale só o lock entre threads
+    fcntl = None
+
+
+class _Lado:
+    """Um dos lados (leitura ou escrita) de um LockLeituraEscrita, usável com `with`."""
+
+
+    def __init__(self, adquirir, liberar):
+        self.acquire = adquirir
+        self.release = liberar
+
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class LockLeituraEscrita:
+    """Vários leitores ao mesmo tempo ou um único escritor.
+
+    Escritores esperando têm preferência: novos leitores aguardam, para que
+    um fluxo contínuo de leituras não impeça as escritas.
+    """
+
+
+    def __init__(self):
+        self._condicao = threading.Condition(threading.Lock())
+        self._leitores = 0
+        self._escrevendo = False
+        self._escritores_esperando = 0
+        self.leitura = _Lado(self._adquirir_leitura, self._liberar_leitura)
+        self.escrita = _Lado(self._adquirir_escrita, self._liberar_escrita)
+
+
+    def _adquirir_leitura(self):
+        with self._condicao:
+            while self._escrevendo or self._escritores_esperando:
+                self._condicao.wait()
+            self._leitores += 1
+
+
+    def _liberar_leitura(self):
+        with self._condicao:
+            self._leitores -= 1
+            if self._leitores == 0:
+                self._condicao.notify_all()
+
+
+    def _adquirir_escrita(self):
+        with self._condicao:
+            self._escritores_esperando += 1
+            try:
+                while self._escrevendo or self._leitores:
+                    self._condicao.wait()
+            finally:
+                self._escritores_esperando -= 1
+            self._escrevendo = True
+
+
+    def _liberar_escrita(self):
+        with self._condicao:
+            self._escrevendo = False
+            self._condicao.notify_all()
+
+
+class LockArquivo:
+    """Lock consultivo entre processos (flock) em um arquivo `.lock`.
+
+    Protege o log quando vários processos (modo prefork) usam o mesmo
+    arquivo. Deve ser usado por uma thread de cada vez (sob o lock de
+    escrita do store): o flock pertence ao descritor, não à thread.
+    """
+
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._fd = None
+        self._pid = None
+
+
+    def _descritor(self):
+        # Depois de um fork o descritor herdado é o mesmo do processo pai, e o
+        # flock não separaria os dois: cada processo abre o seu.
+        if self._fd is None or self._pid != os.getpid():
+            self._fd = os.open(self.caminho, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+
+    @contextmanager
+    def _travado(self, modo):
+        if fcntl is None:
+            yield
+            return
+        fd = self._descritor()
+        fcntl.flock(fd, modo)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+    def compartilhado(self):
+        return self._travado(fcntl.LOCK_SH if fcntl else None)
+
+
+    def exclusivo(self):
+        return self._travado(fcntl.LOCK_EX if fcntl else None)
@@ -0,0 +1,331 @@
+import mmap
+import os
+import struct
+from array import array
+
+from .usuarios import UsuarioStore, parse_linha, parse_meta
+
+# Cabeçalho do índice lateral: assinatura, inode e bytes do log cobertos,
+# quantidade de pares, linhas obsoletas e maior id.
+CABECALHO = struct.Struct("<8sQQQQQ")
+ASSINATURA_INDICE = b"USRIDX01"
+
+
+class IndiceLateral:
+    """Índice id -> offset gravado ao lado do log (`usuarios.txt.idx`) e lido via mmap.
+
+    Os pares (id, offset) ficam ordenados por id em int64, então a busca é
+    binária direto no arquivo mapeado, sem carregar o índice na memória.
+    """
+
+
+    def __init__(self, caminho):
+        with open(caminho, "rb") as f:
+            self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        assinatura, self.inode, self.coberto, self.total, self.obsoletas, self.max_id = \
+            CABECALHO.unpack_from(self._mapa)
+        if assinatura != ASSINATURA_INDICE or len(self._mapa) != CABECALHO.size + self.total * 16:
+            self.fechar()
+            raise ValueError("Índice lateral inválido.")
+        self._pares = memoryview(self._mapa)[CABECALHO.size:].cast("q")
+
+
+    @classmethod
+    def abrir(cls, caminho, inode, tamanho_log):
+        """Abre o índice se ele corresponder ao log atual; senão retorna None."""
+        try:
+            indice = cls(caminho)
+        except (OSError, ValueError, struct.error):
+            return None
+        if indice.inode != inode or indice.coberto > tamanho_log:
+            indice.fechar()
+            return None
+        return indice
+
+
+    @staticmethod
+    def gravar(caminho, pares, inode, coberto, obsoletas, max_id):
+        """Grava `pares` (iterável ordenado de (id, offset)) em um temporário e troca via rename."""
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        total = 0
+        with open(temporario, "wb") as f:
+            f.write(b"\0" * CABECALHO.size)
+            bloco = array("q")
+            for id_usuario, offset in pares:
+                bloco.append(id_usuario)
+                bloco.append(offset)
+                total += 1
+                if len(bloco) >= 65536:
+                    bloco.tofile(f)
+                    bloco = array("q")
+            bloco.tofile(f)
+            f.seek(0)
+            f.write(CABECALHO.pack(ASSINATURA_INDICE, inode, coberto, total, obsoletas, max_id))
+        os.replace(temporario, caminho)
+
+
+    def buscar(self, id_usuario):
+        baixo, alto = 0, self.total
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            atual = self._pares[2 * meio]
+            if atual < id_usuario:
+                baixo = meio + 1
+            elif atual > id_usuario:
+                alto = meio
+            else:
+                return self._pares[2 * meio + 1]
+        return None
+
+
+    def _posicao(self, id_usuario):
+        """Índice do primeiro par com id maior que `id_usuario`."""
+        baixo, alto = 0, self.total
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if self._pares[2 * meio] <= id_usuario:
+                baixo = meio + 1
+            else:
+                alto = meio
+        return baixo
+
+
+    def iterar(self, cursor=0):
+        pares = self._pares
+        for i in range(2 * self._posicao(cursor), 2 * self.total, 2):
+            yield pares[i], pares[i + 1]
+
+
+    def __iter__(self):
+        return self.iterar()
+
+
+    def fechar(self):
+        if getattr(self, "_pares", None) is not None:
+            self._pares.release()
+            self._pares = None
+        self._mapa.close()
+
+
+class MmapUsuarioStore(UsuarioStore):
+    """UsuarioStore para arquivos grandes: nada de registros na memória.
+
+    O log é mapeado com mmap e o índice id -> offset fica no arquivo lateral
+    `<caminho>.idx`, também mapeado. Com o índice em dia, abrir o store não
+    lê o log; só as linhas acrescentadas depois dele são percorridas. Cada
+    consulta decodifica apenas a linha do usuário pedido. Alterações
+    posteriores ao índice ficam em um pequeno dicionário em memória, que é
+    incorporado ao arquivo lateral quando passa de `limite_sobreposicao`.
+    Os índices de e-mail e de busca são a exceção: ficam na memória e são
+    montados com uma passada pelo log na primeira consulta que os usa.
+    """
+
+
+    def __init__(self, caminho, limite_sobreposicao=10000, **opcoes):
+        self.caminho_indice = f"{caminho}.idx"
+        self.limite_sobreposicao = limite_sobreposicao
+        self._lateral = None
+        self._mapa = None
+        self._log = None
+        super().__init__(caminho, **opcoes)
+
+
+    # --- Índice ---
+
+    def _limpar_indice(self):
+        if self._lateral is not None:
+            self._lateral.fechar()
+        self._lateral = None
+        self._mapa = None
+        self._log = None
+        self._sobreposicao = {}  # id -> offset (None = excluído)
+        self._busca = None
+        self._vivos = 0
+        self._max_id = 0
+        self._obsoletas = 0
+
+
+    def _offset(self, id_usuario):
+        if id_usuario in self._sobreposicao:
+            return self._sobreposicao[id_usuario]
+        return self._lateral.buscar(id_usuario) if self._lateral is not None else None
+
+
+    def _guardar(self, usuario, offset):
+        if self._busca is not None:
+            self._busca.trocar(self._buscar(usuario.id), usuario)
+        if self._offset(usuario.id) is None:
+            self._vivos += 1
+        else:
+            self._obsoletas += 1
+        self._sobreposicao[usuario.id] = offset
+        self._max_id = max(self._max_id, usuario.id)
+
+
+    def _remover(self, id_usuario):
+        if self._offset(id_usuario) is None:
+            return False
+        if self._busca is not None:
+            self._busca.trocar(self._buscar(id_usuario), None)
+        self._sobreposicao[id_usuario] = None
+        self._vivos -= 1
+        self._obsoletas += 1
+        return True
+
+
+    def _buscar(self, id_usuario):
+        offset = self._offset(id_usuario)
+        return self._ler(offset) if offset is not None else None
+
+
+    def _pares(self, cursor=0):
+        """(id, offset) dos usuários vivos com id maior que `cursor`, em ordem de id."""
+        sobreposicao = sorted(item for item in self._sobreposicao.items() if item[0] > cursor)
+        lateral = self._lateral.iterar(cursor) if self._lateral is not None else iter(())
+        i = 0
+        for id_usuario, offset in lateral:
+            while i < len(sobreposicao) and sobreposicao[i][0] < id_usuario:
+                if sobreposicao[i][1] is not None:
+                    yield sobreposicao[i]
+                i += 1
+            if i < len(sobreposicao) and sobreposicao[i][0] == id_usuario:
+                offset = sobreposicao[i][1]
+                i += 1
+            if offset is not None:
+                yield id_usuario, offset
+        for par in sobreposicao[i:]:
+            if par[1] is not None:
+                yield par
+
+
+    def _registros(self, cursor=0):
+        for _, offset in self._pares(cursor):
+            yield self._ler(offset)
+
+
+    def _total(self):
+        return self._vivos
+
+
+    def _retrato(self):
+        # Só os offsets são copiados; as linhas saem do mapeamento atual,
+        # que continua válido mesmo depois que o arquivo for substituído.
+        offsets = array("q", (offset for _, offset in self._pares()))
+        mapa = self._mapear()
+        return (self._ler(offset, mapa) for offset in offsets)
+
+
+    def _apos_compactacao(self):
+        # Os offsets mudaram: reconstrói o índice lateral a partir do arquivo novo
+        self._carregar()
+
+
+    # --- Leitura do log ---
+
+    def _mapear(self):
+        # Mapeia pelo descritor aberto em _carregar, e não pelo caminho: se outro
+        # processo trocar o arquivo (compactação), os offsets do índice continuam
+        # valendo para o arquivo antigo até o próximo _atualizar.
+        if self._log is None:
+            # Store aberto sem o arquivo: o log passa a existir na primeira escrita
+            if self._assinatura is None:
+                return None
+            self._log = open(self.caminho, "rb")
+        tamanho = self._assinatura[2] if self._assinatura else os.fstat(self._log.fileno()).st_size
+        if tamanho == 0:
+            return None
+        if self._mapa is None or len(self._mapa) < tamanho:
+            self._mapa = mmap.mmap(self._log.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mapa
+
+
+    def _ler(self, offset, mapa=None):
+        if mapa is None:
+            mapa = self._mapa
+            if mapa is None or offset >= len(mapa):
+                mapa = self._mapear()
+        fim = mapa.find(b"\n", offset)
+        if fim == -1:
+            fim = len(mapa)
+        return parse_linha(mapa[offset:fim].decode("utf-8"))
+
+
+    def _carregar(self):
+        self._limpar_indice()
+        self._log = open(self.caminho, "rb")
+        st = os.fstat(self._log.fileno())
+        lateral = IndiceLateral.abrir(self.caminho_indice, st.st_ino, st.st_size)
+        if lateral is not None and lateral.coberto and not self._termina_linha(lateral.coberto):
+            lateral.fechar()
+            lateral = None
+        if lateral is None:
+            self._reconstruir_indice(st)
+            lateral = IndiceLateral.abrir(self.caminho_indice, st.st_ino, st.st_size)
+
+        self._lateral = lateral
+        self._vivos = lateral.total
+        self._obsoletas = lateral.obsoletas
+        self._max_id = lateral.max_id
+        if lateral.coberto < st.st_size:
+            self._aplicar_desde(lateral.coberto)
+
+
+    def _termina_linha(self, offset):
+        with open(self.caminho, "rb") as f:
+            f.seek(offset - 1)
+            return f.read(1) == b"\n"
+
+
+    def _reconstruir_indice(self, st):
+        """Percorre o log inteiro uma vez para gerar o índice lateral."""
+        offsets = {}
+        obsoletas = 0
+        max_id = 0
+        offset = 0
+        with open(self.caminho, "rb") as f:
+            for linha in f:
+                conteudo = linha.strip()
+                if conteudo.startswith(b"-"):
+                    if offsets.pop(int(conteudo[1:]), None) is not None:
+                        obsoletas += 1
+                    obsoletas += 1
+                elif conteudo.startswith(b"#"):
+                    max_id = max(max_id, parse_meta(conteudo.decode("utf-8")) or 0)
+                elif conteudo:
+                    id_usuario = int(conteudo.split(b"|", 1)[0])
+                    if id_usuario in offsets:
+                        obsoletas += 1
+                    offsets[id_usuario] = offset
+                    max_id = max(max_id, id_usuario)
+                offset += len(linha)
+        IndiceLateral.gravar(self.caminho_indice, sorted(offsets.items()), st.st_ino, offset, obsoletas, max_id)
+
+
+    def persistir_indice(self):
+        """Incorpora as alterações em memória ao índice lateral."""
+        with self._escrevendo():
+            if not self._sobreposicao or self._assinatura is None:
+                return
+            IndiceLateral.gravar(self.caminho_indice, self._pares(), self._assinatura[0],
+                                 self._assinatura[2], self._obsoletas, self._max_id)
+            # Os registros não mudam, só onde o índice deles está guardado
+            busca = self._busca
+            self._carregar()
+            self._busca = busca
+
+
+    def _concluir(self, seq):
+        super()._concluir(seq)
+        if len(self._sobreposicao) > self.limite_sobreposicao:
+            self.persistir_indice()
+
+
+def abrir_store(caminho, limite_mmap=64 * 1024 * 1024, **opcoes):
+    """Escolhe o store pelo tamanho do arquivo: em memória para arquivos pequenos, mmap para os grandes."""
+    try:
+        tamanho = os.path.getsize(caminho)
+    except OSError:
+        tamanho = 0
+    if tamanho >= limite_mmap:
+        return MmapUsuarioStore(caminho, **opcoes)
+    return UsuarioStore(caminho, **opcoes)
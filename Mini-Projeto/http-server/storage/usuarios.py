@@ -0,0 +1,492 @@
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import islice
+
+from .busca import IndiceBusca
+from .locks import LockArquivo, LockLeituraEscrita
+
+# Registro compacto (tupla) em vez de um dict por usuário.
+Usuario = namedtuple("Usuario", "id nome email telefone")
+
+
+class EmailDuplicado(ValueError):
+    """O e-mail informado já pertence a outro usuário."""
+
+
+def parse_linha(linha):
+    """Converte uma linha `id|nome|email|telefone` em Usuario."""
+    partes = [parte.strip() for parte in linha.split("|")]
+    return Usuario(int(partes[0]), partes[1], partes[2], partes[3])
+
+
+def _limpar(valor):
+    # "|" e quebras de linha quebrariam o formato do arquivo (e permitiriam forjar registros)
+    return str(valor).replace("|", " ").replace("\r", " ").replace("\n", " ")
+
+
+def formatar_linha(usuario):
+    nome, email, telefone = (_limpar(v) for v in usuario[1:])
+    return f"{usuario.id}|{nome}|{email}|{telefone}\n"
+
+
+def formatar_exclusao(id_usuario):
+    return f"-{id_usuario}\n"
+
+
+# Linhas iniciadas por "#" são metadados, ignoradas como registro. A compactação
+# grava o maior id já usado, para que ids excluídos nunca sejam reaproveitados.
+META_MAX_ID = "#max_id="
+
+
+def formatar_meta(max_id):
+    return f"{META_MAX_ID}{max_id}\n"
+
+
+def parse_meta(linha):
+    """Maior id de uma linha `#max_id=N`; None para outros metadados."""
+    if linha.startswith(META_MAX_ID):
+        return int(linha[len(META_MAX_ID):])
+    return None
+
+
+class UsuarioStore:
+    """Usuários do arquivo texto mantidos em memória, indexados por id.
+
+    O arquivo funciona como um log: inserções e alterações acrescentam a
+    versão nova do registro (`id|nome|email|telefone`) e exclusões uma
+    lápide (`-id`). Na leitura, a última linha de cada id vence. Quando há
+    linhas obsoletas demais, o arquivo é compactado: reescrito só com os
+    registros vivos em um arquivo temporário que substitui o original via
+    rename atômico.
+
+    Com `fsync=True` cada escrita só retorna depois de estar em disco; escritas
+    concorrentes compartilham o mesmo fsync (group commit). `atraso_commit`
+    (em segundos) adia cada fsync para juntar mais escritas nele.
+
+    Leituras acontecem em paralelo; escritas são exclusivas, tanto entre
+    threads (lock de leitura/escrita) quanto entre processos (flock em
+    `<caminho>.lock`), e sempre partem do arquivo atualizado. Os ids são
+    monotônicos: o maior id já usado sobrevive a exclusões e compactações.
+
+    Os e-mails são únicos (sem diferenciar maiúsculas): `inserir` e
+    `atualizar` levantam `EmailDuplicado` consultando um índice hash, e
+    `buscar` encontra usuários por prefixo do nome ou do e-mail. Esses
+    índices secundários são montados na primeira consulta e mantidos a
+    cada alteração.
+    """
+
+
+    def __init__(self, caminho, fsync=True, atraso_commit=0.0,
+                 limite_compactacao=1000, compactar_em_segundo_plano=True):
+        self.caminho = caminho
+        self.fsync = fsync
+        self.atraso_commit = atraso_commit
+        self.limite_compactacao = limite_compactacao
+        self.compactar_em_segundo_plano = compactar_em_segundo_plano
+
+        self._limpar_indice()
+        self._assinatura = None  # (inode, mtime_ns, tamanho) do que já foi aplicado
+        self._arquivo = None
+        self._inode_arquivo = None
+
+        self._lock = LockLeituraEscrita()
+        self._lock_escrita = self._lock.escrita
+        self._lock_arquivo = LockArquivo(f"{caminho}.lock")
+        self._lock_fsync = threading.Lock()
+        self._seq_escrita = 0
+        self._seq_duravel = 0
+        self._compactando = False
+
+
+    def _stat(self):
+        try:
+            st = os.stat(self.caminho)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+    # --- Índice em memória (MmapUsuarioStore troca estas operações) ---
+
+    def _limpar_indice(self):
+        self._indice = {}
+        self._ordem = []  # ids em ordem crescente, para listagem/paginação
+        self._max_id = 0
+        self._obsoletas = 0
+        self._busca = None  # IndiceBusca, montado por _indice_busca
+
+
+    def _guardar(self, usuario, offset):
+        if self._busca is not None:
+            self._busca.trocar(self._indice.get(usuario.id), usuario)
+        if usuario.id in self._indice:
+            self._obsoletas += 1
+        elif not self._ordem or usuario.id > self._ordem[-1]:
+            self._ordem.append(usuario.id)  # caso comum: ids crescentes
+        else:
+            insort(self._ordem, usuario.id)
+        self._indice[usuario.id] = usuario
+        self._max_id = max(self._max_id, usuario.id)
+
+
+    def _remover(self, id_usuario):
+        usuario = self._indice.pop(id_usuario, None)
+        if usuario is None:
+            return False
+        if self._busca is not None:
+            self._busca.trocar(usuario, None)
+        del self._ordem[bisect_left(self._ordem, id_usuario)]
+        self._obsoletas += 1
+        return True
+
+
+    def _buscar(self, id_usuario):
+        return self._indice.get(id_usuario)
+
+
+    def _registros(self, cursor=0):
+        """Usuários com id maior que `cursor`, em ordem de id."""
+        ordem = self._ordem
+        for i in range(bisect_right(ordem, cursor), len(ordem)):
+            usuario = self._indice.get(ordem[i])
+            if usuario is not None:
+                yield usuario
+
+
+    def _total(self):
+        return len(self._indice)
+
+
+    def _retrato(self):
+        """Cópia dos registros vivos usada pela compactação fora do lock."""
+        return list(self._indice.values())
+
+
+    def _apos_compactacao(self):
+        pass
+
+
+    def _indice_busca(self):
+        """Índices secundários, montados na primeira chamada com um lock do store.
+
+        Sob o lock de leitura nenhuma escrita altera os registros, então dois
+        leitores que montem o índice ao mesmo tempo chegam ao mesmo resultado.
+        """
+        busca = self._busca
+        if busca is None:
+            busca = self._busca = IndiceBusca(self._registros())
+        return busca
+
+
+    def _verificar_email(self, email, id_usuario=None):
+        dono = self._indice_busca().dono(email)
+        if dono is not None and dono != id_usuario:
+            raise EmailDuplicado(f"O e-mail {email.strip()} já está em uso.")
+
+
+    # --- Leitura do log ---
+
+    def _aplicar(self, linha, offset):
+        linha = linha.decode("utf-8").strip()
+        if not linha: # Ignora linhas em branco
+            return
+        if linha.startswith("#"):
+            self._max_id = max(self._max_id, parse_meta(linha) or 0)
+            return
+        if linha.startswith("-"):
+            self._remover(int(linha[1:]))
+            self._obsoletas += 1
+            return
+        self._guardar(parse_linha(linha), offset)
+
+
+    def _aplicar_desde(self, offset):
+        with open(self.caminho, "rb") as f:
+            f.seek(offset)
+            for linha in f:
+                self._aplicar(linha, offset)
+                offset += len(linha)
+
+
+    def _carregar(self):
+        self._limpar_indice()
+        self._aplicar_desde(0)
+
+
+    def _atualizar(self):
+        """Aplica o que mudou no arquivo desde a última leitura."""
+        assinatura = self._stat()
+        if assinatura == self._assinatura:
+            return
+
+        if assinatura is None:
+            self._limpar_indice()
+        elif self._assinatura is not None and assinatura[0] == self._assinatura[0] and assinatura[2] >= self._assinatura[2]:
+            # Mesmo arquivo, só cresceu: basta reaplicar o final do log
+            self._aplicar_desde(self._assinatura[2])
+        else:
+            self._carregar()
+        self._assinatura = assinatura
+
+
+    def _anexar_registro(self, usuario):
+        offset = self._assinatura[2] if self._assinatura else 0
+        self._guardar(usuario, offset)
+        return self._anexar([formatar_linha(usuario)])
+
+
+    def _anexar(self, linhas):
+        """Acrescenta linhas ao log (chamado com o lock de escrita); retorna o número da escrita."""
+        inode = self._assinatura[0] if self._assinatura else None
+        if self._arquivo is not None and self._inode_arquivo != inode:
+            # Outro processo compactou (trocou) o arquivo. O descritor antigo não
+            # é fechado aqui porque um commit pode estar fazendo fsync nele.
+            self._arquivo = None
+        if self._arquivo is None:
+            self._arquivo = open(self.caminho, "a", encoding="utf-8")
+            self._inode_arquivo = os.fstat(self._arquivo.fileno()).st_ino
+        self._arquivo.write("".join(linhas))
+        self._arquivo.flush()
+        self._assinatura = self._stat()
+        self._seq_escrita += 1
+        return self._seq_escrita
+
+
+    def _concluir(self, seq):
+        """Espera a escrita `seq` ficar durável e dispara a compactação se necessário."""
+        self._commit(seq)
+        if self._precisa_compactar():
+            if self.compactar_em_segundo_plano:
+                threading.Thread(target=self.compactar, name="usuarios-compactacao", daemon=True).start()
+            else:
+                self.compactar()
+
+
+    def _commit(self, seq):
+        if not self.fsync:
+            return
+        with self._lock_fsync:
+            # Outro escritor já fez um fsync que cobre esta escrita
+            if self._seq_duravel >= seq:
+                return
+            if self.atraso_commit:
+                time.sleep(self.atraso_commit)
+            # Novas escritas podem continuar enquanto o fsync roda; elas
+            # entram no próximo commit.
+            with self._lock_escrita:
+                alvo = self._seq_escrita
+                arquivo = self._arquivo
+            os.fsync(arquivo.fileno())
+            self._seq_duravel = alvo
+
+
+    def _precisa_compactar(self):
+        return (not self._compactando
+                and self._obsoletas >= self.limite_compactacao
+                and self._obsoletas > self._total())
+
+
+    def compactar(self):
+        """Reescreve o arquivo só com os registros vivos (temp + rename atômico)."""
+        with self._lock_escrita, self._lock_arquivo.compartilhado():
+            self._atualizar()
+            if self._compactando or self._assinatura is None:
+                return
+            self._compactando = True
+            retrato = self._retrato()
+            inode_retrato, _, tamanho_retrato = self._assinatura
+            max_id = self._max_id
+
+        temporario = f"{self.caminho}.compactando.{os.getpid()}"
+        try:
+            # O grosso da cópia acontece sem segurar o lock de escrita
+            with open(temporario, "w", encoding="utf-8") as f:
+                f.write(formatar_meta(max_id))
+                f.writelines(formatar_linha(u) for u in retrato)
+                # Mesma ordem de locks de _commit; com o lock de fsync nenhum
+                # commit usa o descritor antigo enquanto ele é trocado.
+                with self._lock_fsync, self._lock_escrita, self._lock_arquivo.exclusivo():
+                    atual = self._stat()
+                    if atual is None or atual[0] != inode_retrato:
+                        return  # outro processo já compactou o arquivo
+                    # Escritas feitas durante a cópia vão para o fim do novo arquivo
+                    if self._arquivo is not None:
+                        self._arquivo.flush()
+                    with open(self.caminho, "r", encoding="utf-8") as original:
+                        original.seek(tamanho_retrato)
+                        cauda = original.read()
+                    f.write(cauda)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                    os.replace(temporario, self.caminho)
+                    self._sincronizar_diretorio()
+                    if self._arquivo is not None:
+                        self._arquivo.close()
+                        self._arquivo = None
+                    self._obsoletas = cauda.count("\n")
+                    self._assinatura = self._stat()
+                    self._seq_duravel = self._seq_escrita
+                    self._apos_compactacao()
+        finally:
+            self._compactando = False
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+
+    def _sincronizar_diretorio(self):
+        # Garante que o rename também sobreviva a uma queda de energia
+        if not self.fsync or not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.caminho)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+    # --- Locks ---
+
+    def _lendo(self):
+        """Lock de leitura; antes, aplica ao índice o que mudou no arquivo."""
+        if self._stat() != self._assinatura:
+            with self._lock_escrita, self._lock_arquivo.compartilhado():
+                self._atualizar()
+        return self._lock.leitura
+
+
+    @contextmanager
+    def _escrevendo(self):
+        """Lock exclusivo (threads e processos) com o índice já em dia com o arquivo."""
+        with self._lock_escrita, self._lock_arquivo.exclusivo():
+            self._atualizar()
+            yield
+
+
+    def versao(self):
+        """Assinatura do arquivo (inode, mtime, tamanho); muda a cada escrita, de qualquer processo."""
+        return self._stat()
+
+
+    def listar(self):
+        with self._lendo():
+            return list(self._registros())
+
+
+    def iterar(self, cursor=0, lote=256):
+        """Percorre os usuários em ordem de id, a partir do id seguinte a `cursor`, sem montar uma lista.
+
+        Os usuários são lidos em lotes, cada um sob o lock de leitura, para
+        que uma listagem longa (streaming para um cliente lento) não segure
+        as escritas.
+        """
+        while True:
+            with self._lendo():
+                usuarios = list(islice(self._registros(cursor), lote))
+            yield from usuarios
+            if len(usuarios) < lote:
+                return
+            cursor = usuarios[-1].id
+
+
+    def pagina(self, cursor=0, limite=50):
+        """Retorna (usuários, próximo cursor); o cursor é None na última página."""
+        with self._lendo():
+            usuarios = list(islice(self._registros(cursor), limite + 1))
+        if len(usuarios) > limite:
+            return usuarios[:limite], usuarios[limite - 1].id
+        return usuarios, None
+
+
+    def obter(self, id_usuario):
+        with self._lendo():
+            return self._buscar(id_usuario)
+
+
+    def buscar(self, texto, limite=50):
+        """Usuários com o nome (ou uma palavra dele) ou o e-mail começando por `texto`.
+
+        A comparação ignora maiúsculas e acentos; o resultado vem em ordem
+        alfabética do termo encontrado.
+        """
+        with self._lendo():
+            ids = self._indice_busca().buscar(texto, limite)
+            return [self._buscar(id_usuario) for id_usuario in ids]
+
+
+    def por_email(self, email):
+        with self._lendo():
+            id_usuario = self._indice_busca().dono(email)
+            return self._buscar(id_usuario) if id_usuario is not None else None
+
+
+    def inserir(self, nome, email, telefone):
+        # Limpos antes de montar o registro: o índice guarda o mesmo que o arquivo
+        nome, email, telefone = (_limpar(valor) for valor in (nome, email, telefone))
+        with self._escrevendo():
+            self._verificar_email(email)
+            usuario = Usuario(self._max_id + 1, nome, email, telefone)
+            seq = self._anexar_registro(usuario)
+        self._concluir(seq)
+        return usuario
+
+
+    def inserir_lote(self, registros):
+        """Insere vários usuários (tuplas nome, email, telefone) com uma única escrita durável.
+
+        Todos os registros vão para o log em uma escrita e um fsync. Os que
+        repetem um e-mail, já existente ou de outro registro do lote, são
+        ignorados. Retorna (usuários inseridos, posições no lote dos ignorados).
+        """
+        inseridos = []
+        duplicados = []
+        with self._escrevendo():
+            busca = self._indice_busca()
+            offset = self._assinatura[2] if self._assinatura else 0
+            linhas = []
+            for posicao, registro in enumerate(registros):
+                nome, email, telefone = (_limpar(valor) for valor in registro)
+                if busca.dono(email) is not None:
+                    duplicados.append(posicao)
+                    continue
+                usuario = Usuario(self._max_id + 1, nome, email, telefone)
+                linha = formatar_linha(usuario)
+                # _guardar atualiza o índice de e-mail: repetições dentro do lote também são vistas
+                self._guardar(usuario, offset)
+                offset += len(linha.encode("utf-8"))
+                linhas.append(linha)
+                inseridos.append(usuario)
+            if not linhas:
+                return inseridos, duplicados
+            seq = self._anexar(linhas)
+        self._concluir(seq)
+        return inseridos, duplicados
+
+
+    def atualizar(self, id_usuario, **campos):
+        """Altera os campos informados; retorna o usuário atualizado ou None se não existir."""
+        campos = {campo: _limpar(valor) for campo, valor in campos.items()}
+        with self._escrevendo():
+            usuario = self._buscar(id_usuario)
+            if usuario is None:
+                return None
+            if "email" in campos:
+                self._verificar_email(campos["email"], id_usuario)
+            usuario = usuario._replace(**campos)
+            seq = self._anexar_registro(usuario)
+        self._concluir(seq)
+        return usuario
+
+
+    def excluir(self, id_usuario):
+        with self._escrevendo():
+            if not self._remover(id_usuario):
+                return False
+            self._obsoletas += 1
+            seq = self._anexar([formatar_exclusao(id_usuario)])
+        self._concluir(seq)
+        return True
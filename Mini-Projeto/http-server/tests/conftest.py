@@ -0,0 +1,103 @@
+import http.client
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import Server  # noqa: E402
+from server.plumbing import Request, SocketReader  # noqa: E402
+from storage import MmapUsuarioStore, UsuarioStore  # noqa: E402
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def esperar_porta(porta, prazo=5.0):
+    fim = time.monotonic() + prazo
+    while time.monotonic() < fim:
+        try:
+            socket.create_connection(("127.0.0.1", porta), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError(f"Servidor não abriu a porta {porta}")
+
+
+def ler(dados, **opcoes):
+    """Lê uma requisição de `dados`; devolve (requisição, reader) para continuar lendo."""
+    reader = SocketReader(None, initial=dados)
+    return Request.from_socket(None, reader, **opcoes), reader
+
+
+def esperar(condicao, prazo=2.0):
+    """Espera `condicao()` ficar verdadeira (o "after" dos middlewares roda depois do envio)."""
+    fim = time.monotonic() + prazo
+    while not condicao() and time.monotonic() < fim:
+        time.sleep(0.01)
+    return condicao()
+
+
+@pytest.fixture
+def servidor():
+    """Cria um Server em porta livre; `iniciar(server)` o põe para atender numa thread."""
+    iniciados = []
+
+    def criar(**opcoes):
+        opcoes.setdefault("host", "127.0.0.1")
+        opcoes.setdefault("port", porta_livre())
+        opcoes.setdefault("shutdown_timeout", 1)
+        return Server(**opcoes)
+
+    def iniciar(server):
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        esperar_porta(server.port)
+        iniciados.append((server, thread))
+        return server
+
+    criar.iniciar = iniciar
+    yield criar
+    for server, thread in iniciados:
+        server.stop()
+        thread.join(5)
+
+
+def cliente(server):
+    return http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+
+
+def get(server, caminho, headers=None):
+    """GET numa conexão nova; devolve (resposta, corpo decodificado)."""
+    conexao = cliente(server)
+    conexao.request("GET", caminho, headers=headers or {})
+    resposta = conexao.getresponse()
+    corpo = resposta.read().decode()
+    conexao.close()
+    return resposta, corpo
+
+
+@pytest.fixture(params=[UsuarioStore, MmapUsuarioStore], ids=["memoria", "mmap"])
+def abrir(request, tmp_path):
+    """Abre (e reabre) um store do tipo do parâmetro sobre o mesmo arquivo."""
+    caminho = tmp_path / "usuarios.txt"
+    caminho.touch()
+
+    def abrir(**opcoes):
+        opcoes.setdefault("fsync", False)
+        opcoes.setdefault("compactar_em_segundo_plano", False)
+        return request.param(str(caminho), **opcoes)
+
+    abrir.caminho = caminho
+    return abrir
+
+
+def nomes(usuarios):
+    return [usuario.nome for usuario in usuarios]
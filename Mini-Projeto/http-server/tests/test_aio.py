@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from conftest import cliente, get
+
+
+@pytest.mark.parametrize("modo", ["serial", "threads", "async"])
+def test_handler_assincrono(servidor, modo):
+    server = servidor(mode=modo)
+
+    @server.route("/eco", methods=["POST"])
+    async def eco(request, response):
+        await asyncio.sleep(0)
+        response.send(200, request.body.upper())
+
+    servidor.iniciar(server)
+    conexao = cliente(server)
+    for texto in ("um", "dois"):
+        conexao.request("POST", "/eco", texto.encode(), {"Content-Type": "text/plain"})
+        assert conexao.getresponse().read().decode() == texto.upper()
+    conexao.close()
+
+
+def test_handlers_assincronos_esperam_em_paralelo(servidor):
+    server = servidor(mode="async")
+
+    @server.route("/lento")
+    async def lento(request, response):
+        await asyncio.sleep(0.3)
+        response.send(200, "ok")
+
+    servidor.iniciar(server)
+    respostas = []
+    clientes = [threading.Thread(target=lambda: respostas.append(get(server, "/lento")[1])) for _ in range(4)]
+    inicio = time.monotonic()
+    for thread in clientes:
+        thread.start()
+    for thread in clientes:
+        thread.join(5)
+    # Quatro esperas de 0.3s no mesmo loop, sem uma thread por requisição
+    assert respostas == ["ok"] * 4
+    assert time.monotonic() - inicio < 1
+
+
+def test_handler_sincrono_nao_bloqueia_o_loop(servidor):
+    server = servidor(mode="async", workers=2)
+    entrou, liberar = threading.Event(), threading.Event()
+
+    @server.route("/bloqueia")
+    def bloqueia(request, response):
+        entrou.set()
+        liberar.wait(5)
+        response.send(200, "liberado")
+
+    @server.route("/ola")
+    async def ola(request, response):
+        response.send(200, "ola")
+
+    servidor.iniciar(server)
+    bloqueado = []
+    thread = threading.Thread(target=lambda: bloqueado.append(get(server, "/bloqueia")[1]))
+    thread.start()
+    assert entrou.wait(5)
+    # O handler síncrono roda no executor; o loop continua atendendo
+    assert get(server, "/ola")[1] == "ola"
+    liberar.set()
+    thread.join(5)
+    assert bloqueado == ["liberado"]
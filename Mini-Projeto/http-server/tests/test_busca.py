@@ -0,0 +1,78 @@
+import pytest
+
+from conftest import nomes
+from storage import EmailDuplicado, Usuario
+from storage.busca import IndiceBusca
+
+
+def test_email_unico(abrir):
+    store = abrir()
+    ana = store.inserir("Ana", "ana@x.com", "1")
+    bia = store.inserir("Bia", "bia@x.com", "2")
+    with pytest.raises(EmailDuplicado):
+        store.inserir("Outra", " ANA@x.com ", "")
+    with pytest.raises(EmailDuplicado):
+        store.atualizar(bia.id, email="Ana@X.com")
+    store.atualizar(ana.id, email="ana@x.com")  # o próprio e-mail
+    store.atualizar(ana.id, email="ana2@x.com")
+    assert store.inserir("Nova", "ana@x.com", "").id == 3
+    assert store.por_email("ANA2@x.com").id == ana.id
+
+
+def test_busca_por_prefixo(abrir):
+    store = abrir()
+    store.inserir("João Silva", "joao@x.com", "")
+    store.inserir("Maria Souza", "maria@x.com", "")
+    store.inserir("Joana", "jo@y.com", "")
+    assert sorted(nomes(store.buscar("jo"))) == ["Joana", "João Silva"]
+    assert nomes(store.buscar("SILVA")) == ["João Silva"]
+    assert nomes(store.buscar("joão s")) == ["João Silva"]
+    assert len(store.buscar("jo", limite=1)) == 1
+    assert store.buscar("") == []
+
+    store.atualizar(1, nome="Pedro")
+    store.excluir(2)
+    assert nomes(store.buscar("silva")) == []
+    assert nomes(store.buscar("maria")) == []
+    assert nomes(store.buscar("ped")) == ["Pedro"]
+    assert nomes(abrir().buscar("ped")) == ["Pedro"]
+
+
+def usuario(id_usuario, nome):
+    return Usuario(id_usuario, nome, f"{nome.lower()}{id_usuario}@x.com", "")
+
+
+def test_alteracoes_nao_refazem_a_lista_de_termos():
+    indice = IndiceBusca([usuario(i, f"Ana {i}") for i in range(1, 101)])
+    termos = indice.termos
+    indice.trocar(None, usuario(101, "Bruno"))
+    indice.trocar(usuario(2, "Ana 2"), usuario(2, "Carla"))
+    indice.trocar(usuario(3, "Ana 3"), None)
+    # Abaixo do limite, as alterações ficam de lado e a busca já as considera
+    assert indice.termos is termos
+    ids = indice.buscar("ana", 1000)
+    assert len(ids) == 98 and 2 not in ids and 3 not in ids
+    assert indice.buscar("bru", 10) == [101]
+    assert indice.buscar("carla", 10) == [2]
+    # Voltar ao nome antigo só deixa de filtrar os termos removidos
+    indice.trocar(usuario(2, "Carla"), usuario(2, "Ana 2"))
+    assert 2 in indice.buscar("ana 2", 10)
+    assert indice.buscar("carla", 10) == []
+
+
+def test_juncao_ao_passar_do_limite(monkeypatch):
+    monkeypatch.setattr(IndiceBusca, "LIMITE_PENDENTES", 4)
+    indice = IndiceBusca([usuario(1, "Ana")])
+    termos = indice.termos
+    for i in range(2, 6):
+        indice.trocar(None, usuario(i, f"Nome{i}"))
+    # Dois termos por usuário novo (nome e e-mail): o limite foi passado e a lista refeita
+    assert indice.termos is not termos
+    assert indice.termos == sorted(indice.termos)
+    assert len(indice._pendentes) <= 4
+    assert indice.buscar("nome", 10) == [2, 3, 4, 5]
+    # Remover não força a junção
+    termos = indice.termos
+    indice.trocar(usuario(1, "Ana"), None)
+    assert indice.termos is termos
+    assert indice.buscar("ana", 10) == []
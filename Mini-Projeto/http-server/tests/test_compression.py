@@ -0,0 +1,128 @@
+import gzip
+import os
+import zlib
+
+import pytest
+
+from conftest import cliente
+from server.compression import Compression, negotiate
+from server.static import StaticFiles
+
+@pytest.mark.parametrize("accept, esperado", [
+    ("gzip, deflate", "gzip"),
+    ("deflate, gzip", "gzip"),
+    ("deflate;q=1, gzip;q=0.5", "deflate"),
+    ("GZIP", "gzip"),
+    ("br", None),
+    ("*", "gzip"),
+    ("gzip;q=0, *;q=0.1", "deflate"),
+    ("gzip;q=0", None),
+    ("gzip;q=abc", None),
+    ("", None),
+    (None, None),
+])
+def test_negociacao(accept, esperado):
+    assert negotiate(accept) == esperado
+
+
+TEXTO = "linha de texto repetida\n" * 200
+
+
+@pytest.fixture
+def comprimido(servidor):
+    server = servidor(mode="threads")
+    server.compression = server.use(Compression(min_size=100))
+
+    @server.route("/texto")
+    def texto(request, response):
+        response.send(200, TEXTO)
+
+    @server.route("/curto")
+    def curto(request, response):
+        response.send(200, "curto")
+
+    @server.route("/partes")
+    def partes(request, response):
+        response.stream(200, (TEXTO for _ in range(3)))
+
+    return servidor.iniciar(server)
+
+
+def baixar(server, caminho, accept):
+    conexao = cliente(server)
+    conexao.request("GET", caminho, headers={"Accept-Encoding": accept} if accept else {})
+    resposta = conexao.getresponse()
+    corpo = resposta.read()
+    conexao.close()
+    return resposta, corpo
+
+
+@pytest.mark.parametrize("accept, descomprimir", [
+    ("gzip", gzip.decompress),
+    ("deflate", zlib.decompress),
+])
+def test_resposta_comprimida(comprimido, accept, descomprimir):
+    resposta, corpo = baixar(comprimido, "/texto", accept)
+    assert resposta.getheader("Content-Encoding") == accept
+    assert resposta.getheader("Vary") == "Accept-Encoding"
+    assert int(resposta.getheader("Content-Length")) == len(corpo) < len(TEXTO)
+    assert descomprimir(corpo).decode() == TEXTO
+
+
+def test_sem_compressao(comprimido):
+    # Cliente que não aceita nenhuma codificação e corpo abaixo do mínimo
+    resposta, corpo = baixar(comprimido, "/texto", "br")
+    assert resposta.getheader("Content-Encoding") is None
+    assert resposta.getheader("Vary") == "Accept-Encoding"
+    assert corpo.decode() == TEXTO
+    resposta, corpo = baixar(comprimido, "/curto", "gzip")
+    assert (resposta.getheader("Content-Encoding"), corpo) == (None, b"curto")
+
+
+def test_corpo_comprimido_reaproveitado(comprimido):
+    for _ in range(3):
+        assert gzip.decompress(baixar(comprimido, "/texto", "gzip")[1]).decode() == TEXTO
+    baixar(comprimido, "/texto", "deflate")
+    # Um corpo comprimido por codificação; as repetições vêm do cache
+    assert (comprimido.compression.misses, comprimido.compression.hits) == (2, 2)
+
+
+def test_stream_comprimido(comprimido):
+    resposta, corpo = baixar(comprimido, "/partes", "gzip")
+    assert resposta.getheader("Transfer-Encoding") == "chunked"
+    assert resposta.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(corpo).decode() == TEXTO * 3
+
+
+def test_static_serve_o_gz(servidor, tmp_path):
+    (tmp_path / "site.css").write_text("body {}")
+    (tmp_path / "site.css.gz").write_bytes(gzip.compress(b"body {}"))
+    server = servidor(mode="threads")
+    server.static("/static", str(tmp_path))
+    servidor.iniciar(server)
+
+    resposta, corpo = baixar(server, "/static/site.css", "gzip")
+    assert resposta.getheader("Content-Encoding") == "gzip"
+    assert resposta.getheader("Content-Type").startswith("text/css")
+    assert gzip.decompress(corpo) == b"body {}"
+    resposta, corpo = baixar(server, "/static/site.css", None)
+    assert (resposta.getheader("Content-Encoding"), corpo) == (None, b"body {}")
+
+
+def test_static_guarda_a_ausencia_do_gz(tmp_path, monkeypatch):
+    (tmp_path / "site.css").write_text("body {}")
+    static = StaticFiles(str(tmp_path), revalidate_after=60)
+    gz = str(tmp_path / "site.css.gz")
+    assert static.file_info(gz, remember_missing=True) is None
+
+    def stat(*args):
+        raise AssertionError("stat dentro da janela de revalidação")
+
+    monkeypatch.setattr(os, "stat", stat)
+    assert static.file_info(gz, remember_missing=True) is None
+    monkeypatch.undo()
+
+    # Passada a janela, um .gz criado depois é encontrado
+    (tmp_path / "site.css.gz").write_bytes(b"gz")
+    static.revalidate_after = 0
+    assert static.file_info(gz, remember_missing=True).size == 2
@@ -0,0 +1,58 @@
+import threading
+
+from conftest import nomes
+
+
+def test_escritas_de_outra_instancia(abrir):
+    store, outro = abrir(), abrir()
+    store.inserir("Ana", "ana@x.com", "1")
+    outro.inserir("Bia", "bia@x.com", "2")
+    assert nomes(store.listar()) == ["Ana", "Bia"]
+    assert store.inserir("Caio", "caio@x.com", "3").id == 3
+
+
+def test_escritas_em_paralelo(abrir):
+    # Duas instâncias (como dois processos) e várias threads em cada uma
+    stores = [abrir(), abrir()]
+
+    def inserir(store, k):
+        for i in range(50):
+            store.inserir(f"U{k}-{i}", f"u{k}-{i}@x.com", "")
+
+    threads = [threading.Thread(target=inserir, args=(stores[k % 2], k)) for k in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    usuarios = abrir().listar()
+    assert len(usuarios) == 300
+    assert sorted(u.id for u in usuarios) == list(range(1, 301))
+    assert len(set(nomes(usuarios))) == 300
+
+
+def test_leitura_durante_escrita(abrir):
+    store = abrir()
+    store.inserir("Ana", "ana@x.com", "")
+    parar = threading.Event()
+    erros = []
+
+    def ler():
+        while not parar.is_set():
+            try:
+                assert store.obter(1).nome == "Ana"
+                store.listar()
+            except Exception as e:
+                erros.append(e)
+                return
+
+    leitores = [threading.Thread(target=ler) for _ in range(3)]
+    for thread in leitores:
+        thread.start()
+    for i in range(200):
+        store.inserir(f"U{i}", f"u{i}@x.com", "")
+    parar.set()
+    for thread in leitores:
+        thread.join(5)
+    assert erros == []
+    assert len(store.listar()) == 201
@@ -0,0 +1,200 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import cliente, esperar, esperar_porta, get, porta_livre
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def iniciar(server):
+    """Põe o server para atender numa thread; devolve a thread, que termina quando start() retorna."""
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    esperar_porta(server.port)
+    return thread
+
+
+def pedir_ignorando_o_fechamento(server, caminho):
+    try:
+        get(server, caminho)
+    except OSError:
+        pass  # conexão interrompida no fim do prazo
+
+
+def recusa_conexoes(server):
+    try:
+        socket.create_connection(("127.0.0.1", server.port), timeout=0.5).close()
+    except OSError:
+        return True
+    return False
+
+
+@pytest.fixture
+def lento(servidor):
+    """Cria um Server com /lento, que só responde depois de `liberar`."""
+    criados = []
+
+    def criar(**opcoes):
+        server = servidor(**opcoes)
+        server.entrou, server.liberar = threading.Event(), threading.Event()
+
+        @server.route("/lento")
+        def lento(request, response):
+            server.entrou.set()
+            server.liberar.wait(10)
+            response.send(200, "terminou")
+
+        @server.route("/ola")
+        def ola(request, response):
+            response.send(200, "ola")
+
+        criados.append(server)
+        return server
+
+    yield criar
+    for server in criados:
+        server.liberar.set()
+        server.stop()
+
+
+@pytest.mark.parametrize("modo", ["threads", "async"])
+def test_requisicao_em_andamento_termina(lento, modo):
+    server = lento(mode=modo, shutdown_timeout=5)
+    thread = iniciar(server)
+    conexao = cliente(server)
+    respostas = []
+
+    def pedir():
+        conexao.request("GET", "/lento")
+        resposta = conexao.getresponse()
+        respostas.append((resposta, resposta.read()))
+
+    pedido = threading.Thread(target=pedir)
+    pedido.start()
+    assert server.entrou.wait(5)
+
+    server.stop()
+    # Sem aceitar conexões novas, mas esperando a requisição em andamento
+    assert esperar(lambda: recusa_conexoes(server), 5)
+    assert thread.is_alive()
+    server.liberar.set()
+    pedido.join(5)
+    resposta, corpo = respostas[0]
+    assert (resposta.status, corpo) == (200, b"terminou")
+    # Depois da resposta a conexão é fechada, mesmo em keep-alive
+    assert conexao.sock is None or conexao.sock.recv(1) == b""
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+@pytest.mark.parametrize("modo", ["threads", "async"])
+def test_conexoes_ociosas_fecham_no_encerramento(lento, modo):
+    server = lento(mode=modo, keep_alive_timeout=30, shutdown_timeout=10)
+    thread = iniciar(server)
+    conexao = cliente(server)
+    conexao.request("GET", "/ola")
+    assert conexao.getresponse().read() == b"ola"
+
+    inicio = time.monotonic()
+    server.stop()
+    thread.join(5)
+    # Não espera o keep-alive nem o prazo de encerramento: a ociosa é fechada
+    assert not thread.is_alive()
+    assert time.monotonic() - inicio < 3
+    assert conexao.sock.recv(1) == b""
+
+
+@pytest.mark.parametrize("modo", ["threads", "async"])
+def test_prazo_de_encerramento(lento, modo):
+    server = lento(mode=modo, shutdown_timeout=0.5)
+    thread = iniciar(server)
+    threading.Thread(target=pedir_ignorando_o_fechamento, args=(server, "/lento"), daemon=True).start()
+    assert server.entrou.wait(5)
+
+    inicio = time.monotonic()
+    server.stop()
+    thread.join(5)
+    # A requisição presa não segura o encerramento além do prazo
+    assert not thread.is_alive()
+    assert time.monotonic() - inicio < 3
+
+
+def test_stop_repetido(lento):
+    server = lento(mode="async")
+    thread = iniciar(server)
+    server.stop()
+    thread.join(5)
+    server.stop()
+    assert not thread.is_alive()
+
+
+PROGRAMA = """
+import os, sys
+sys.path.insert(0, {raiz!r})
+from server import Server
+
+server = Server(host="127.0.0.1", port={porta}, mode={modo!r}, shutdown_timeout=2)
+
+@server.route("/pid")
+def pid(request, response):
+    response.send(200, str(os.getpid()))
+
+server.start()
+"""
+
+
+@pytest.mark.parametrize("modo", ["threads", "async"])
+def test_restart_a_quente(tmp_path, modo):
+    porta = porta_livre()
+    programa = tmp_path / "servir.py"
+    programa.write_text(PROGRAMA.format(raiz=RAIZ, porta=porta, modo=modo))
+    antigo = subprocess.Popen([sys.executable, str(programa)], stdout=subprocess.DEVNULL)
+    novo = None
+    try:
+        esperar_porta(porta)
+
+        class Alvo:
+            port = porta
+
+        assert get(Alvo, "/pid")[1] == str(antigo.pid)
+
+        falhas, pids, parar = [], set(), threading.Event()
+
+        def martelar():
+            while not parar.is_set():
+                try:
+                    pids.add(get(Alvo, "/pid")[1])
+                except OSError as e:
+                    falhas.append(e)
+
+        clientes = [threading.Thread(target=martelar) for _ in range(2)]
+        for thread in clientes:
+            thread.start()
+        antigo.send_signal(signal.SIGHUP)
+        # O processo antigo sai sozinho quando o novo está pronto
+        assert antigo.wait(10) == 0
+        parar.set()
+        for thread in clientes:
+            thread.join(5)
+
+        novo = int(get(Alvo, "/pid")[1])
+        assert novo != antigo.pid
+        assert str(novo) in pids
+        # Nenhuma requisição recusada durante a troca
+        assert falhas == []
+    finally:
+        for pid in (antigo.pid, novo):
+            if pid is not None:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+        antigo.wait(5)
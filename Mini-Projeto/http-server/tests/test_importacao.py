@@ -0,0 +1,129 @@
+import json
+import socket
+
+import pytest
+
+from conftest import cliente, ler, nomes
+from server.plumbing import HTTPError
+from server.router import Router
+
+
+def test_limite_do_corpo_por_requisicao():
+    dados = b"POST /import HTTP/1.1\r\nContent-Length: 2048\r\n\r\n" + b"x" * 2048
+    request, _ = ler(dados, max_body_size=1024, body_limit=lambda request: 4096)
+    assert len(request.stream.read()) == 2048
+
+
+def test_corpo_linha_a_linha():
+    dados = b"POST / HTTP/1.1\r\nContent-Length: 9\r\n\r\na\nbb\n\nccc"
+    request, _ = ler(dados)
+    assert list(request.stream.lines()) == [b"a\n", b"bb\n", b"\n", b"ccc"]
+
+
+def test_linha_longa_demais():
+    dados = b"POST / HTTP/1.1\r\nContent-Length: 100\r\n\r\n" + b"x" * 100
+    request, _ = ler(dados)
+    with pytest.raises(HTTPError) as erro:
+        list(request.stream.lines(limit=10))
+    assert erro.value.status_code == 400
+
+
+def test_limite_do_corpo_por_rota():
+    router = Router()
+    router.add_route("/usuarios", ["POST"])(lambda request, response: None)
+    router.add_route("/usuarios/import", ["POST"], max_body_size=10)(lambda request, response: None)
+
+    class Requisicao:
+        method, path = "POST", "/usuarios/import"
+
+    assert router.body_limit(Requisicao) == 10
+    Requisicao.path = "/usuarios"
+    assert router.body_limit(Requisicao) == router.max_body_size
+
+
+def test_inserir_lote(abrir):
+    store = abrir()
+    store.inserir("Ana", "ana@x.com", "")
+    inseridos, duplicados = store.inserir_lote([
+        ("Bia", "bia@x.com", ""), ("Ana 2", "ANA@x.com", ""), ("Çé", "ce@x.com", ""), ("Bia 2", "bia@x.com", ""),
+    ])
+    assert [u.id for u in inseridos] == [2, 3]
+    assert duplicados == [1, 3]
+    assert abrir().obter(3).nome == "Çé"
+
+
+@pytest.fixture(params=["threads", "async"])
+def importacao(request, servidor):
+    server = servidor(mode=request.param, max_body_size=1024)
+
+    @server.route("/import", methods=["POST"], max_body_size=1024 * 1024)
+    def importar(request, response):
+        linhas = sum(1 for _ in request.stream.lines())
+        response.send(200, str(linhas))
+
+    @server.route("/eco", methods=["POST"])
+    def eco(request, response):
+        response.send(200, request.body)
+
+    return servidor.iniciar(server)
+
+
+def test_limite_da_rota_vale_em_todos_os_modos(importacao):
+    corpo = b"".join(b"linha %d\n" % i for i in range(20000))  # ~200 KB, acima do limite do Server
+    conexao = cliente(importacao)
+    conexao.request("POST", "/import", corpo)
+    resposta = conexao.getresponse()
+    assert (resposta.status, resposta.read()) == (200, b"20000")
+    # Nas outras rotas continua valendo o max_body_size do Server
+    conexao.request("POST", "/eco", b"x" * 2048)
+    assert conexao.getresponse().status == 413
+
+
+def test_corpo_chunked_lido_sob_demanda_e_pipelining(importacao):
+    corpo = b"".join(b"%x\r\n%s\r\n" % (len(parte), parte) for parte in [b"a\nb\n"] * 50000) + b"0\r\n\r\n"
+    with socket.create_connection(("127.0.0.1", importacao.port), timeout=5) as s:
+        s.sendall(b"POST /import HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n" + corpo +
+                  b"POST /eco HTTP/1.1\r\nContent-Length: 2\r\nConnection: close\r\n\r\nok")
+        respostas = b""
+        while dados := s.recv(65536):
+            respostas += dados
+    primeira, segunda = respostas.split(b"HTTP/1.1 ")[1:]
+    assert primeira.startswith(b"200") and primeira.endswith(b"\r\n\r\n100000")
+    assert segunda.startswith(b"200") and segunda.endswith(b"\r\n\r\nok")
+
+
+@pytest.fixture
+def usuarios(servidor, tmp_path, monkeypatch):
+    """Server com as rotas de importação/exportação sobre um store temporário."""
+    from routes import usuarios as rotas
+    from storage import UsuarioStore
+
+    monkeypatch.setattr(rotas, "store", UsuarioStore(str(tmp_path / "usuarios.txt"), fsync=False))
+    server = servidor(mode="threads")
+    server.route("/usuarios/import", methods=["POST"], max_body_size=rotas.IMPORTACAO_MAX_BYTES)(rotas.importar_usuarios)
+    server.route("/usuarios/export")(rotas.exportar_usuarios)
+    server.store = rotas.store
+    return servidor.iniciar(server)
+
+
+def test_importar_csv_e_exportar_ndjson(usuarios):
+    usuarios.store.inserir("Ana", "ana@x.com", "1")
+    corpo = "nome,email,telefone\nBia,bia@x.com,2\n,sem-nome@x.com,\nOutra Ana,ANA@x.com,\nÇé,ce@x.com,3\n"
+    conexao = cliente(usuarios)
+    conexao.request("POST", "/usuarios/import", corpo.encode(), {"Content-Type": "text/csv"})
+    resumo = json.loads(conexao.getresponse().read())
+    assert (resumo["importados"], resumo["duplicados"], resumo["invalidos"]) == (2, 1, 1)
+    assert [erro["linha"] for erro in resumo["erros"]] == [3, 4]
+
+    conexao.request("GET", "/usuarios/export?formato=ndjson")
+    resposta = conexao.getresponse()
+    assert resposta.getheader("Content-Type") == "application/x-ndjson"
+    linhas = [json.loads(linha) for linha in resposta.read().splitlines()]
+    assert [linha["nome"] for linha in linhas] == ["Ana", "Bia", "Çé"]
+    assert nomes(usuarios.store.listar()) == ["Ana", "Bia", "Çé"]
+
+
+def test_importar_tipo_desconhecido(usuarios):
+    conexao = cliente(usuarios)
+    conexao.request("POST", "/usuarios/import", b"{}", {"Content-Type": "application/json"})
+    assert conexao.getresponse().status == 415
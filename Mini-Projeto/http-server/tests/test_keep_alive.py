@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from conftest import cliente, esperar, get
+
+
+@pytest.mark.parametrize("modo", ["threads", "async"])
+def test_keep_alive_e_corpo(servidor, modo):
+    server = servidor(mode=modo)
+
+    @server.route("/eco", methods=["POST"])
+    def eco(request, response):
+        response.send(200, request.body.upper())
+
+    servidor.iniciar(server)
+    conexao = cliente(server)
+    sockets = set()
+    for texto in ("um", "dois", "três"):
+        conexao.request("POST", "/eco", texto.encode(), {"Content-Type": "text/plain"})
+        resposta = conexao.getresponse()
+        assert resposta.read().decode() == texto.upper()
+        sockets.add(conexao.sock)
+    # As três requisições usaram a mesma conexão
+    assert len(sockets) == 1 and None not in sockets
+    conexao.close()
+
+
+@pytest.mark.parametrize("modo", ["serial", "threads", "async"])
+def test_connection_close_encerra(servidor, modo):
+    # O modo serial fecha toda conexão depois da resposta
+    server = servidor(mode=modo)
+
+    @server.route("/ola")
+    def ola(request, response):
+        response.send(200, "ola")
+
+    servidor.iniciar(server)
+    conexao = cliente(server)
+    conexao.request("GET", "/ola", headers={} if modo == "serial" else {"Connection": "close"})
+    resposta = conexao.getresponse()
+    assert resposta.getheader("Connection") == "close"
+    assert resposta.read() == b"ola"
+    assert conexao.sock is None or conexao.sock.recv(1) == b""
+
+
+def test_conexoes_ociosas_nao_ocupam_os_workers(servidor):
+    server = servidor(mode="threads", workers=2, keep_alive_timeout=5)
+
+    @server.route("/ola")
+    def ola(request, response):
+        response.send(200, "ola")
+
+    servidor.iniciar(server)
+    # Mais clientes ociosos em keep-alive do que workers
+    ociosos = [cliente(server) for _ in range(4)]
+    for conexao in ociosos:
+        conexao.request("GET", "/ola")
+        conexao.getresponse().read()
+
+    inicio = time.monotonic()
+    resposta, corpo = get(server, "/ola")
+    assert corpo == "ola"
+    assert time.monotonic() - inicio < 1
+    # As ociosas continuam utilizáveis
+    for conexao in ociosos:
+        conexao.request("GET", "/ola")
+        assert conexao.getresponse().read() == b"ola"
+
+
+def test_keep_alive_expira_fora_dos_workers(servidor):
+    server = servidor(mode="threads", workers=2, keep_alive_timeout=0.2)
+
+    @server.route("/ola")
+    def ola(request, response):
+        response.send(200, "ola")
+
+    servidor.iniciar(server)
+    conexao = cliente(server)
+    conexao.request("GET", "/ola")
+    conexao.getresponse().read()
+    assert esperar(lambda: server.router.active_connections == 0)
+    assert conexao.sock.recv(1) == b""
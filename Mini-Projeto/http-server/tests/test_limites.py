@@ -0,0 +1,101 @@
+import socket
+import time
+
+import pytest
+
+from conftest import esperar, get
+
+
+def conectar(server):
+    return socket.create_connection(("127.0.0.1", server.port), timeout=5)
+
+
+def ler_tudo(conexao):
+    resposta = b""
+    while dados := conexao.recv(4096):
+        resposta += dados
+    return resposta
+
+
+@pytest.fixture(params=["threads", "async"])
+def limitado(request, servidor):
+    """Cria um Server com /ola e /eco no modo do parâmetro; `limitado(**opcoes)` o inicia."""
+
+    def criar(**opcoes):
+        server = servidor(mode=request.param, **opcoes)
+
+        @server.route("/ola")
+        def ola(request, response):
+            response.send(200, "ola")
+
+        @server.route("/eco", methods=["POST"])
+        def eco(request, response):
+            response.send(200, request.body)
+
+        return servidor.iniciar(server)
+
+    return criar
+
+
+def test_limite_de_conexoes(limitado):
+    server = limitado(max_connections=2)
+    # Uma requisição completa garante que a conexão de teste da porta já
+    # foi admitida; depois, que ela e esta já foram liberadas
+    assert get(server, "/ola")[1] == "ola"
+    assert esperar(lambda: server.router.active_connections == 0)
+    abertas = [conectar(server) for _ in range(2)]
+    assert esperar(lambda: server.router.active_connections == 2)
+
+    # A terceira é recusada na hora, sem ler a requisição
+    excedente = conectar(server)
+    resposta = ler_tudo(excedente)
+    assert resposta.startswith(b"HTTP/1.1 503")
+    assert b"Retry-After: 1\r\n" in resposta
+    excedente.close()
+
+    for conexao in abertas:
+        conexao.close()
+    assert esperar(lambda: server.router.active_connections == 0)
+    assert get(server, "/ola")[1] == "ola"
+
+
+def test_cabecalho_lento(limitado):
+    server = limitado(header_timeout=0.3)
+    conexao = conectar(server)
+    # O prazo conta do primeiro byte: mandar aos poucos não o renova
+    inicio = time.monotonic()
+    conexao.sendall(b"GET /ola HTTP/1.1\r\n")
+    for _ in range(3):
+        time.sleep(0.15)
+        conexao.sendall(b"X-Lento: sim\r\n")
+    resposta = ler_tudo(conexao)
+    conexao.close()
+    assert resposta.startswith(b"HTTP/1.1 408")
+    assert time.monotonic() - inicio < 2
+
+
+def test_corpo_parado(limitado):
+    server = limitado(body_timeout=0.3)
+    conexao = conectar(server)
+    conexao.sendall(b"POST /eco HTTP/1.1\r\nHost: x\r\nContent-Length: 10\r\n\r\nabc")
+    resposta = ler_tudo(conexao)
+    conexao.close()
+    assert resposta.startswith(b"HTTP/1.1 408")
+
+
+def test_cabecalho_grande_demais(limitado):
+    server = limitado(max_header_size=1024)
+    conexao = conectar(server)
+    conexao.sendall(b"GET /ola HTTP/1.1\r\nHost: x\r\nX-Grande: " + b"a" * 2048 + b"\r\n\r\n")
+    resposta = ler_tudo(conexao)
+    conexao.close()
+    assert resposta.startswith(b"HTTP/1.1 431")
+
+
+def test_corpo_grande_demais(limitado):
+    server = limitado(max_body_size=100)
+    conexao = conectar(server)
+    conexao.sendall(b"POST /eco HTTP/1.1\r\nHost: x\r\nContent-Length: 1000\r\n\r\n")
+    resposta = ler_tudo(conexao)
+    conexao.close()
+    assert resposta.startswith(b"HTTP/1.1 413")
@@ -0,0 +1,106 @@
+import os
+import socket
+import stat
+import threading
+
+import pytest
+
+from conftest import esperar, get
+from server.server import LISTEN_FDS_START, Server, inherited_fd
+
+
+def pedir_unix(caminho, alvo="/ola"):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexao:
+        conexao.settimeout(5)
+        conexao.connect(caminho)
+        conexao.sendall(f"GET {alvo} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n".encode())
+        resposta = b""
+        while dados := conexao.recv(4096):
+            resposta += dados
+    return resposta
+
+
+def atende(caminho):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexao:
+        return conexao.connect_ex(caminho) == 0
+
+
+def ola(request, response):
+    response.send(200, "ola")
+
+
+@pytest.fixture
+def unix(tmp_path):
+    """Inicia Servers em socket Unix numa thread; `unix(**opcoes)` devolve (server, caminho)."""
+    iniciados = []
+
+    def iniciar(caminho=None, **opcoes):
+        caminho = str(caminho or tmp_path / "http.sock")
+        server = Server(unix_socket=caminho, shutdown_timeout=1, **opcoes)
+        server.route("/ola")(ola)
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        iniciados.append((server, thread))
+        assert esperar(lambda: atende(caminho), 5)
+        return server, caminho
+
+    yield iniciar
+    for server, thread in iniciados:
+        server.stop()
+        thread.join(5)
+
+
+@pytest.mark.parametrize("modo", ["serial", "threads", "async"])
+def test_socket_unix(unix, modo):
+    server, caminho = unix(mode=modo, unix_socket_mode=0o600)
+    resposta = pedir_unix(caminho)
+    assert resposta.startswith(b"HTTP/1.1 200") and resposta.endswith(b"ola")
+    assert stat.S_IMODE(os.stat(caminho).st_mode) == 0o600
+    server.stop()
+    # O arquivo do socket é removido ao sair
+    assert esperar(lambda: not os.path.exists(caminho), 5)
+
+
+def test_arquivo_de_socket_abandonado(unix, tmp_path):
+    caminho = str(tmp_path / "http.sock")
+    sobra = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sobra.bind(caminho)
+    sobra.close()  # o arquivo fica, sem ninguém atendendo
+    server, caminho = unix(caminho)
+    assert pedir_unix(caminho).endswith(b"ola")
+
+
+def test_socket_unix_em_uso(unix):
+    server, caminho = unix()
+    with pytest.raises(OSError, match="Já existe um servidor"):
+        Server(unix_socket=caminho)._listen()
+    assert pedir_unix(caminho).endswith(b"ola")
+
+
+@pytest.mark.parametrize("modo", ["threads", "async"])
+def test_descritor_herdado(servidor, modo):
+    # O supervisor abre e põe o socket em escuta; o Server só o adota
+    escuta = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    escuta.bind(("127.0.0.1", 0))
+    escuta.listen(16)
+    porta = escuta.getsockname()[1]
+    server = servidor(mode=modo, port=porta, listen_fd=escuta.detach())
+    server.route("/ola")(ola)
+    servidor.iniciar(server)
+    assert get(server, "/ola")[1] == "ola"
+
+
+def test_variaveis_listen_fds(monkeypatch):
+    monkeypatch.setenv("LISTEN_PID", str(os.getpid()))
+    monkeypatch.setenv("LISTEN_FDS", "1")
+    monkeypatch.setenv("LISTEN_FDNAMES", "http")
+    assert inherited_fd() == LISTEN_FDS_START
+    # Consumidas: processos filhos não adotam o mesmo descritor
+    assert "LISTEN_PID" not in os.environ and "LISTEN_FDS" not in os.environ and "LISTEN_FDNAMES" not in os.environ
+
+
+@pytest.mark.parametrize("pid, quantidade", [("1", "1"), (None, "0"), (None, "x"), ("", "")])
+def test_variaveis_listen_fds_de_outro_processo(monkeypatch, pid, quantidade):
+    monkeypatch.setenv("LISTEN_PID", pid if pid is not None else str(os.getpid()))
+    monkeypatch.setenv("LISTEN_FDS", quantidade)
+    assert inherited_fd() is None
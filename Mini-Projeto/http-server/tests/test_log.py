@@ -0,0 +1,51 @@
+from conftest import nomes
+
+
+def test_reabrir(abrir):
+    store = abrir()
+    store.inserir("Ana", "ana@x.com", "1")
+    bia = store.inserir("Bia", "bia@x.com", "2")
+    store.inserir("Caio", "caio@x.com", "3")
+    store.atualizar(bia.id, nome="Beatriz")
+    store.excluir(1)
+
+    reaberto = abrir()
+    assert nomes(reaberto.listar()) == ["Beatriz", "Caio"]
+    assert reaberto.inserir("Davi", "davi@x.com", "4").id == 4
+
+
+def test_compactacao(abrir):
+    store = abrir(limite_compactacao=10)
+    for i in range(5):
+        store.inserir(f"U{i}", f"u{i}@x.com", "")
+    for volta in range(4):
+        for i in range(1, 6):
+            store.atualizar(i, telefone=str(volta))
+    store.excluir(5)
+    # 26 escritas; a compactação automática já descartou as obsoletas
+    assert len(abrir.caminho.read_text().splitlines()) < 26
+
+    store.compactar()
+    linhas = abrir.caminho.read_text().splitlines()
+    # Compactado: metadado com o maior id e só os registros vivos
+    assert linhas[0] == "#max_id=5"
+    assert len(linhas) == 5
+    assert [u.telefone for u in store.listar()] == ["3"] * 4
+
+    reaberto = abrir()
+    assert nomes(reaberto.listar()) == ["U0", "U1", "U2", "U3"]
+    # O id excluído não é reaproveitado nem depois da compactação
+    assert reaberto.inserir("Novo", "novo@x.com", "").id == 6
+
+
+def test_campos_limpos_antes_do_registro(abrir):
+    store = abrir()
+    ana = store.inserir("a|b", "ana@x.com", "1\r\n2")
+    assert (ana.nome, ana.telefone) == ("a b", "1  2")
+    store.atualizar(ana.id, nome="c\nd")
+    store.inserir_lote([("e|f", "e@x.com", "")])
+    # O que fica na memória é o mesmo que volta do arquivo
+    esperado = ["c d", "e f"]
+    assert nomes(store.listar()) == esperado
+    assert nomes(store.buscar("c d")) == ["c d"]
+    assert nomes(abrir().listar()) == esperado
@@ -0,0 +1,82 @@
+import socket
+
+import pytest
+
+from conftest import cliente, esperar, get
+
+
+def metrica(texto, nome):
+    """Valor da linha `nome` (com os rótulos) no texto do /metrics, ou None."""
+    for linha in texto.splitlines():
+        if linha.startswith(nome + " "):
+            return float(linha.rsplit(" ", 1)[1])
+    return None
+
+
+@pytest.fixture(params=["threads", "async"])
+def medido(request, servidor):
+    server = servidor(mode=request.param)
+    server.metrics = server.enable_metrics()
+
+    @server.route("/usuarios/<int:id_usuario>")
+    def usuario(request, response, id_usuario):
+        response.send(200 if id_usuario < 10 else 404, "x" * id_usuario)
+
+    @server.route("/falha")
+    def falha(request, response):
+        raise RuntimeError("falhou")
+
+    return servidor.iniciar(server)
+
+
+def test_contagem_por_rota_e_status(medido):
+    for caminho in ("/usuarios/1", "/usuarios/2", "/usuarios/20", "/nada"):
+        get(medido, caminho)
+    # Rótulo é o padrão da rota, não o caminho: a cardinalidade não cresce com os ids
+    rota = 'method="GET",route="/usuarios/<int:id_usuario>"'
+    # O "after" roda depois do envio
+    assert esperar(lambda: medido.metrics.requests_in_flight == 0
+                   and metrica(medido.metrics.render(), f"http_request_duration_seconds_count{{{rota}}}") == 3)
+
+    resposta, texto = get(medido, "/metrics")
+    assert resposta.getheader("Content-Type").startswith("text/plain; version=0.0.4")
+    assert metrica(texto, f"http_requests_total{{{rota},status=\"200\"}}") == 2
+    assert metrica(texto, f"http_requests_total{{{rota},status=\"404\"}}") == 1
+    assert metrica(texto, 'http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    assert metrica(texto, f"http_request_duration_seconds_count{{{rota}}}") == 3
+    assert metrica(texto, f'http_request_duration_seconds_bucket{{{rota},le="+Inf"}}') == 3
+    assert metrica(texto, f"http_response_bytes_total{{{rota}}}") > 1 + 2 + 20
+    assert metrica(texto, f"http_request_bytes_total{{{rota}}}") > 0
+    assert metrica(texto, "http_requests_in_flight") == 1  # a própria requisição do /metrics
+
+
+def test_histograma_cumulativo(medido):
+    get(medido, "/usuarios/1")
+    assert esperar(lambda: "/usuarios" in medido.metrics.render())
+    texto = medido.metrics.render()
+    baldes = [float(linha.rsplit(" ", 1)[1]) for linha in texto.splitlines()
+              if linha.startswith("http_request_duration_seconds_bucket") and "/usuarios" in linha]
+    assert baldes == sorted(baldes)
+    assert baldes[-1] == 1
+
+
+def test_erros_e_conexoes(medido):
+    for pedido in (b"GET /falha HTTP/1.1\r\nHost: x\r\n\r\n", b"lixo\r\n\r\n"):
+        with socket.create_connection(("127.0.0.1", medido.port), timeout=5) as conexao:
+            conexao.sendall(pedido)
+            conexao.recv(64)
+    conexao = cliente(medido)
+    conexao.request("GET", "/usuarios/1")
+    conexao.getresponse().read()
+
+    def contar():
+        texto = medido.metrics.render()
+        return (metrica(texto, 'http_errors_total{kind="exception",status=""}'),
+                metrica(texto, 'http_errors_total{kind="protocol",status="400"}'),
+                metrica(texto, "http_connections_in_flight"))
+
+    # Só a conexão em keep-alive continua aberta
+    assert esperar(lambda: contar() == (1, 1, 1)), contar()
+    assert metrica(medido.metrics.render(), "http_connections_total") >= 3
+    conexao.close()
+    assert esperar(lambda: contar()[2] == 0)
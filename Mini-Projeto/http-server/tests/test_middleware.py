@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from conftest import cliente, esperar, get
+from server.cache import ResponseCache
+from storage import UsuarioStore
+
+
+class Marca:
+    """Middleware que registra a ordem das chamadas e marca a resposta."""
+
+
+    def __init__(self, nome, ordem):
+        self.nome = nome
+        self.ordem = ordem
+
+
+    def before(self, request, response):
+        self.ordem.append(f"before {self.nome}")
+        response.headers[f"X-{self.nome}"] = "1"
+        return False
+
+
+    def after(self, request, response):
+        self.ordem.append(f"after {self.nome}")
+
+
+class Bloqueio:
+    """Responde sozinho às requisições para /bloqueado (o handler não roda)."""
+
+
+    def before(self, request, response):
+        if request.path == "/bloqueado":
+            response.send(403, "Bloqueado.")
+            return True
+        return False
+
+
+@pytest.fixture(params=["serial", "threads", "async"])
+def app(request, servidor):
+    server = servidor(mode=request.param, workers=4)
+    server.ordem = []
+    server.use(Marca("a", server.ordem))
+    server.use(Bloqueio())
+    server.use(Marca("b", server.ordem))
+
+    @server.route("/ola")
+    def ola(request, response):
+        server.ordem.append("handler")
+        response.send(200, "ola")
+
+    @server.route("/bloqueado")
+    def bloqueado(request, response):
+        server.ordem.append("handler")
+        response.send(200, "não deveria rodar")
+
+    @server.route("/assincrono")
+    async def assincrono(request, response):
+        await asyncio.sleep(0)
+        server.ordem.append("handler")
+        response.send(200, "assincrono")
+
+    return servidor.iniciar(server)
+
+
+def test_ordem_dos_middlewares(app):
+    resposta, corpo = get(app, "/ola")
+    assert (resposta.status, corpo) == (200, "ola")
+    assert resposta.getheader("X-a") == resposta.getheader("X-b") == "1"
+    assert esperar(lambda: app.ordem == ["before a", "before b", "handler", "after b", "after a"]), app.ordem
+
+
+def test_middleware_responde_sem_o_handler(app):
+    resposta, corpo = get(app, "/bloqueado")
+    assert (resposta.status, corpo) == (403, "Bloqueado.")
+    # Só os middlewares que rodaram o "before" rodam o "after"
+    assert esperar(lambda: app.ordem == ["before a", "after a"]), app.ordem
+
+
+def test_middlewares_em_volta_do_handler_assincrono(app):
+    resposta, corpo = get(app, "/assincrono")
+    assert (resposta.status, corpo) == (200, "assincrono")
+    assert esperar(lambda: app.ordem == ["before a", "before b", "handler", "after b", "after a"]), app.ordem
+
+
+@pytest.mark.parametrize("modo", ["threads", "async"])
+def test_handler_assincrono_atras_do_cache(servidor, modo):
+    # Um HIT do cache responde no "before", sem chamar o handler async
+    server = servidor(mode=modo)
+    cache = server.use(ResponseCache())
+    chamadas = []
+
+    @server.route("/pagina")
+    async def pagina(request, response):
+        chamadas.append(1)
+        response.send(200, "conteúdo")
+
+    servidor.iniciar(server)
+    conexao = cliente(server)
+    for esperado in ("MISS", "HIT", "HIT"):
+        conexao.request("GET", "/pagina")
+        resposta = conexao.getresponse()
+        assert (resposta.read().decode(), resposta.getheader("X-Cache")) == ("conteúdo", esperado)
+    assert len(chamadas) == 1
+    assert cache.hits == 2
+
+
+def test_cache_descarta_escritas_de_outro_processo(servidor, tmp_path):
+    # Dois stores sobre o mesmo arquivo fazem o papel de dois workers do prefork
+    caminho = str(tmp_path / "usuarios.txt")
+    store = UsuarioStore(caminho, fsync=False)
+    outro = UsuarioStore(caminho, fsync=False)
+    server = servidor(mode="threads")
+    server.use(ResponseCache(version=store.versao))
+
+    @server.route("/total")
+    def total(request, response):
+        response.send(200, str(len(store.listar())))
+
+    servidor.iniciar(server)
+    assert get(server, "/total")[1] == "0"
+    assert get(server, "/total")[0].getheader("X-Cache") == "HIT"
+    outro.inserir("Ana", "ana@x.com", "")
+    resposta, corpo = get(server, "/total")
+    assert (corpo, resposta.getheader("X-Cache")) == ("1", "MISS")
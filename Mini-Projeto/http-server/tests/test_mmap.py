@@ -0,0 +1,34 @@
+import pytest
+
+from storage import MmapUsuarioStore, UsuarioStore
+
+
+def test_indice_lateral_do_mmap(tmp_path):
+    caminho = tmp_path / "usuarios.txt"
+    caminho.write_text("".join(f"{i}|U{i}|u{i}@x.com|\n" for i in range(1, 101)))
+    store = MmapUsuarioStore(str(caminho), fsync=False, limite_sobreposicao=5)
+    assert store.obter(7).nome == "U7"
+    assert (tmp_path / "usuarios.txt.idx").exists()
+    for i in range(1, 11):
+        store.atualizar(i, telefone="t")
+    store.excluir(50)
+
+    reaberto = MmapUsuarioStore(str(caminho), fsync=False)
+    assert reaberto.obter(10).telefone == "t"
+    assert reaberto.obter(50) is None
+    assert len(reaberto.listar()) == 99
+
+
+@pytest.mark.parametrize("classe", [UsuarioStore, MmapUsuarioStore], ids=["memoria", "mmap"])
+def test_store_aberto_sem_o_arquivo(tmp_path, classe):
+    caminho = tmp_path / "usuarios.txt"
+    store = classe(str(caminho), fsync=False)
+    assert store.listar() == []
+    assert store.obter(1) is None
+    store.inserir("Ana", "ana@x.com", "1")
+    assert caminho.exists()
+    assert store.obter(1).nome == "Ana"
+    store.inserir("Bia", "bia@x.com", "2")
+    assert [u.nome for u in store.listar()] == ["Ana", "Bia"]
+    assert store.buscar("bi")[0].id == 2
+    assert classe(str(caminho), fsync=False).obter(2).email == "bia@x.com"
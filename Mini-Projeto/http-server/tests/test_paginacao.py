@@ -0,0 +1,60 @@
+import re
+
+import pytest
+
+from conftest import cliente, get
+
+
+def test_paginacao(abrir):
+    store = abrir()
+    for i in range(7):
+        store.inserir(f"U{i}", f"u{i}@x.com", "")
+    store.excluir(3)
+    pagina, cursor = store.pagina(0, 3)
+    assert [u.id for u in pagina] == [1, 2, 4]
+    assert cursor == 4
+    pagina, cursor = store.pagina(cursor, 3)
+    assert [u.id for u in pagina] == [5, 6, 7]
+    assert cursor is None
+    assert [u.id for u in store.iterar(4, lote=2)] == [5, 6, 7]
+
+
+@pytest.fixture
+def listagem(servidor, tmp_path, monkeypatch):
+    """Server com a rota da listagem sobre um store temporário com 7 usuários."""
+    from routes import usuarios as rotas
+    from storage import UsuarioStore
+
+    monkeypatch.setattr(rotas, "store", UsuarioStore(str(tmp_path / "usuarios.txt"), fsync=False))
+    for i in range(1, 8):
+        rotas.store.inserir(f"U{i}", f"u{i}@x.com", "")
+    server = servidor(mode="threads")
+    server.route("/usuarios")(rotas.listar_usuarios)
+    return servidor.iniciar(server)
+
+
+def ids(html):
+    return [int(i) for i in re.findall(r"<tr><td>(\d+)</td>", html)]
+
+
+def test_listagem_paginada(listagem):
+    resposta, html = get(listagem, "/usuarios?limit=3")
+    assert ids(html) == [1, 2, 3]
+    assert "/usuarios?cursor=3&limit=3" in html
+    resposta, html = get(listagem, "/usuarios?limit=3&cursor=6")
+    assert ids(html) == [7]
+    assert "Próxima página" not in html
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=abc", "cursor=x"])
+def test_listagem_parametros_invalidos(listagem, query):
+    assert get(listagem, f"/usuarios?{query}")[0].status == 400
+
+
+def test_listagem_em_streaming(listagem):
+    conexao = cliente(listagem)
+    conexao.request("GET", "/usuarios?stream=1&limit=2")
+    resposta = conexao.getresponse()
+    assert resposta.getheader("Transfer-Encoding") == "chunked"
+    # O limite não vale para a listagem completa
+    assert ids(resposta.read().decode()) == [1, 2, 3, 4, 5, 6, 7]
@@ -0,0 +1,115 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import esperar, esperar_porta, get, porta_livre
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROGRAMA = """
+import os, sys, time
+sys.path.insert(0, {raiz!r})
+from server import Server
+
+server = Server(host="127.0.0.1", port={porta}, mode="prefork", shutdown_timeout=2, **{opcoes!r})
+
+@server.route("/pid")
+def pid(request, response):
+    time.sleep(0.2)
+    response.send(200, str(os.getpid()))
+
+server.start()
+"""
+
+
+class Alvo:
+    """O suficiente de um Server para o `get` do conftest."""
+
+
+    def __init__(self, port):
+        self.port = port
+
+
+def vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+@pytest.fixture
+def prefork(tmp_path):
+    """Roda um Server em modo prefork num processo à parte; devolve (supervisor, alvo)."""
+    processos = []
+
+    def iniciar(**opcoes):
+        porta = porta_livre()
+        programa = tmp_path / "servir.py"
+        programa.write_text(PROGRAMA.format(raiz=RAIZ, porta=porta, opcoes=opcoes))
+        supervisor = subprocess.Popen([sys.executable, str(programa)], stdout=subprocess.DEVNULL)
+        processos.append(supervisor)
+        esperar_porta(porta)
+        return supervisor, Alvo(porta)
+
+    yield iniciar
+    for supervisor in processos:
+        if supervisor.poll() is None:
+            supervisor.send_signal(signal.SIGTERM)
+            try:
+                supervisor.wait(10)
+            except subprocess.TimeoutExpired:
+                supervisor.kill()
+
+
+def pids_em_paralelo(alvo, quantidade=12):
+    pids = []
+    clientes = [threading.Thread(target=lambda: pids.append(int(get(alvo, "/pid")[1]))) for _ in range(quantidade)]
+    for thread in clientes:
+        thread.start()
+    for thread in clientes:
+        thread.join(10)
+    assert len(pids) == quantidade
+    return set(pids)
+
+
+@pytest.mark.parametrize("opcoes", [
+    {"worker_mode": "serial"},
+    {"worker_mode": "threads", "reuse_port": True},
+    {"worker_mode": "async", "reuse_port": True},
+], ids=["socket-compartilhado", "reuse-port-threads", "reuse-port-async"])
+def test_requisicoes_divididas_entre_os_workers(prefork, opcoes):
+    supervisor, alvo = prefork(processes=3, **opcoes)
+    pids = pids_em_paralelo(alvo)
+    assert supervisor.pid not in pids
+    assert len(pids) >= 2
+
+
+def test_worker_morto_e_recriado(prefork):
+    supervisor, alvo = prefork(processes=2, worker_mode="serial")
+    pids = pids_em_paralelo(alvo)
+    # Morto depois do tempo mínimo de vida: recriado sem a espera extra
+    time.sleep(1.1)
+    morto = pids.pop()
+    os.kill(morto, signal.SIGKILL)
+
+    def recriado():
+        atuais = pids_em_paralelo(alvo, 6)
+        return morto not in atuais and len(atuais) == 2
+
+    assert esperar(recriado, 10)
+    assert supervisor.poll() is None
+
+
+def test_sigterm_encerra_os_workers(prefork):
+    supervisor, alvo = prefork(processes=2, worker_mode="threads")
+    pids = pids_em_paralelo(alvo)
+    supervisor.send_signal(signal.SIGTERM)
+    assert supervisor.wait(10) == 0
+    assert esperar(lambda: not any(vivo(pid) for pid in pids), 5)
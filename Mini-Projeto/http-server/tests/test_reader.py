@@ -0,0 +1,111 @@
+import socket
+
+import pytest
+
+from conftest import ler
+from server.plumbing import HTTPError, Request
+
+
+def test_cliente_fechou_entre_requisicoes():
+    request, _ = ler(b"")
+    assert request is None
+
+
+def test_linha_de_requisicao_malformada():
+    with pytest.raises(HTTPError) as erro:
+        ler(b"GET /\r\n\r\n")
+    assert erro.value.status_code == 400
+
+
+def test_cabecalho_acima_do_limite():
+    with pytest.raises(HTTPError) as erro:
+        ler(b"GET / HTTP/1.1\r\nX: " + b"a" * 2000 + b"\r\n\r\n", max_header_size=1024)
+    assert erro.value.status_code == 431
+
+
+def test_corpo_acima_do_limite():
+    with pytest.raises(HTTPError) as erro:
+        ler(b"POST / HTTP/1.1\r\nContent-Length: 2048\r\n\r\n", max_body_size=1024)
+    assert erro.value.status_code == 413
+
+
+def test_corpo_chunked_com_trailers():
+    dados = (b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+             b"5\r\nhello\r\n6;ext=1\r\n world\r\n0\r\nX-Trailer: 1\r\n\r\n")
+    request, reader = ler(dados)
+    assert request.body == "hello world"
+    assert not reader.buffer
+
+
+def test_chunked_acima_do_limite():
+    dados = b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n" + b"400\r\n" + b"x" * 1024 + b"\r\n0\r\n\r\n"
+    request, _ = ler(dados, max_body_size=512)
+    with pytest.raises(HTTPError) as erro:
+        request.stream.read()
+    assert erro.value.status_code == 413
+
+
+@pytest.mark.parametrize("tamanho", [b"zz", b"-5", b"+5", b"0x5", b"1_0", b"", b"5 5"])
+def test_chunk_malformado(tamanho):
+    request, _ = ler(b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n" + tamanho + b"\r\nhelloworld\r\n0\r\n\r\n")
+    with pytest.raises(HTTPError) as erro:
+        request.stream.read()
+    assert erro.value.status_code == 400
+
+
+def test_transfer_encoding_nao_suportado():
+    with pytest.raises(HTTPError) as erro:
+        ler(b"POST / HTTP/1.1\r\nTransfer-Encoding: gzip\r\n\r\n")
+    assert erro.value.status_code == 501
+
+
+def test_pipelining():
+    dados = (b"POST /a HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc"
+             b"GET /b HTTP/1.1\r\n\r\n"
+             b"POST /c HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n1\r\nz\r\n0\r\n\r\n")
+    primeira, reader = ler(dados)
+    # A requisição seguinte só pode ser lida depois de descartado o corpo da anterior
+    primeira.finish()
+    segunda = Request.from_socket(None, reader)
+    segunda.finish()
+    terceira = Request.from_socket(None, reader)
+    assert [primeira.path, segunda.path, terceira.path] == ["/a", "/b", "/c"]
+    assert terceira.body == "z"
+    assert Request.from_socket(None, reader) is None
+
+
+@pytest.mark.parametrize("cabecalhos", [
+    b"Content-Length: 3\r\nTransfer-Encoding: chunked\r\n",
+    b"Transfer-Encoding: chunked\r\nContent-Length: 3\r\n",
+    b"Content-Length: 3\r\nContent-Length: 4\r\n",
+    b"Content-Length: +3\r\n",
+    b"Content-Length: -3\r\n",
+    b"Content-Length: 1_0\r\n",
+    b"Content-Length: 0x3\r\n",
+    b"Content-Length: 3 3\r\n",
+    b"Content-Length: \r\n",
+])
+def test_enquadramento_ambiguo(cabecalhos):
+    with pytest.raises(HTTPError) as erro:
+        ler(b"POST / HTTP/1.1\r\n" + cabecalhos + b"\r\nabcd")
+    assert erro.value.status_code == 400
+
+
+def test_content_length_repetido_com_o_mesmo_valor():
+    request, _ = ler(b"POST / HTTP/1.1\r\nContent-Length: 3\r\nContent-Length: 3\r\n\r\nabc")
+    assert request.body == "abc"
+
+
+@pytest.mark.parametrize("modo", ["threads", "async"])
+def test_tamanho_de_chunk_com_sinal_no_servidor(servidor, modo):
+    # int("-5", 16) aceitaria o sinal e os bytes do enquadramento virariam corpo
+    server = servidor(mode=modo)
+
+    @server.route("/eco", methods=["POST"])
+    def eco(request, response):
+        response.send(200, request.body)
+
+    servidor.iniciar(server)
+    with socket.create_connection(("127.0.0.1", server.port), timeout=5) as s:
+        s.sendall(b"POST /eco HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n-5\r\nhelloworld\r\n0\r\n\r\n")
+        assert s.recv(65536).startswith(b"HTTP/1.1 400")
@@ -0,0 +1,69 @@
+import socket
+
+import pytest
+
+from conftest import cliente, ler
+from server.plumbing import HTTPError
+
+
+def test_linha_de_requisicao_e_query_string():
+    request, _ = ler(b"GET /usuarios?limit=10&cursor=5 HTTP/1.1\r\nHost: x\r\n\r\n")
+    assert (request.method, request.path, request.version) == ("GET", "/usuarios", "HTTP/1.1")
+    assert request.target == "/usuarios?limit=10&cursor=5"
+    assert request.args.get("limit") == "10"
+    assert request.args.get("cursor") == "5"
+
+
+def test_cabecalhos_sem_diferenciar_maiusculas_e_repetidos():
+    request, _ = ler(b"GET / HTTP/1.1\r\nX-Tag: a\r\nx-tag: b\r\nContent-Type: text/plain\r\n\r\n")
+    assert request.header("CONTENT-TYPE") == "text/plain"
+    assert request.headers.get_all("X-Tag") == ["a", "b"]
+
+
+def test_partes_interpretadas_so_no_primeiro_acesso():
+    request, reader = ler(b"POST /x?a=1 HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc")
+    # Só a linha de requisição foi interpretada; o corpo continua no reader
+    assert (request._headers, request._args, request._body) == (None, None, None)
+    assert reader.buffer == b"abc"
+    assert request.header("content-length") == "3"
+    assert request.body == "abc"
+    assert request.body is request.body
+
+
+def test_corpo_com_content_length_e_formulario():
+    corpo = "nome=Jo%C3%A3o&email=j%40x.com".encode()
+    request, _ = ler(b"POST /usuarios HTTP/1.1\r\nContent-Type: application/x-www-form-urlencoded\r\n"
+                     b"Content-Length: %d\r\n\r\n%s" % (len(corpo), corpo))
+    assert request.form.get("nome") == "João"
+    assert request.form.get("email") == "j@x.com"
+
+
+def test_cabecalho_fora_do_utf8():
+    with pytest.raises(HTTPError) as erro:
+        ler(b"GET /caf\xe9 HTTP/1.1\r\nHost: x\r\n\r\n")
+    assert erro.value.status_code == 400
+
+
+def test_formulario_fora_do_utf8():
+    request, _ = ler(b"POST / HTTP/1.1\r\nContent-Type: application/x-www-form-urlencoded\r\n"
+                     b"Content-Length: 9\r\n\r\nnome=Jo\xe3o")
+    with pytest.raises(HTTPError) as erro:
+        request.form
+    assert erro.value.status_code == 400
+
+
+@pytest.mark.parametrize("modo", ["serial", "threads", "async"])
+def test_bytes_fora_do_utf8_resultam_em_400(servidor, modo):
+    server = servidor(mode=modo)
+
+    @server.route("/eco", methods=["POST"])
+    def eco(request, response):
+        response.send(200, request.body)
+
+    servidor.iniciar(server)
+    with socket.create_connection(("127.0.0.1", server.port), timeout=5) as s:
+        s.sendall(b"GET /caf\xe9 HTTP/1.1\r\nConnection: close\r\n\r\n")
+        assert s.recv(65536).startswith(b"HTTP/1.1 400")
+    conexao = cliente(server)
+    conexao.request("POST", "/eco", b"Jo\xe3o", {"Content-Type": "text/plain"})
+    assert conexao.getresponse().status == 400
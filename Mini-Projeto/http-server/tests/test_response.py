@@ -0,0 +1,84 @@
+import pytest
+
+from conftest import cliente
+from server.plumbing import Response
+
+
+class Conexao:
+    """Socket falso que guarda o que foi enviado."""
+
+
+    def __init__(self):
+        self.enviado = b""
+
+
+    def sendall(self, dados):
+        self.enviado += bytes(dados)
+
+
+def enviar(metodo, *args, **opcoes):
+    """Chama `metodo` numa Response nova; devolve (cabeçalhos, corpo como foi enviado)."""
+    conexao = Conexao()
+    response = Response(conexao, keep_alive=True, **opcoes)
+    getattr(response, metodo)(*args)
+    cabecalho, _, corpo = conexao.enviado.partition(b"\r\n\r\n")
+    return cabecalho.decode(), corpo
+
+
+def test_stream_chunked():
+    cabecalho, corpo = enviar("stream", 200, ["ab", b"cd", "", "é"])
+    assert "Transfer-Encoding: chunked" in cabecalho
+    assert "Content-Length" not in cabecalho
+    # Pedaços pequenos são agrupados em um chunk só
+    assert corpo == b"6\r\nabcd\xc3\xa9\r\n0\r\n\r\n"
+
+
+def test_stream_envia_ao_passar_do_limite(monkeypatch):
+    monkeypatch.setattr(Response, "STREAM_FLUSH_SIZE", 2)
+    cabecalho, corpo = enviar("stream", 200, (parte for parte in ["ab", "cd", "e"]))
+    assert corpo == b"2\r\nab\r\n2\r\ncd\r\n1\r\ne\r\n0\r\n\r\n"
+
+
+def test_stream_com_content_length():
+    cabecalho, corpo = enviar("stream", 200, ["ab", "cd"], 4)
+    assert "Content-Length: 4" in cabecalho
+    assert "Transfer-Encoding" not in cabecalho
+    assert corpo == b"abcd"
+
+
+def test_stream_sem_chunked_fecha_a_conexao():
+    # Cliente HTTP/1.0: o fim do corpo é o fechamento da conexão
+    cabecalho, corpo = enviar("stream", 200, ["ab", "cd"], chunked=False)
+    assert "Connection: close" in cabecalho
+    assert "Transfer-Encoding" not in cabecalho
+    assert corpo == b"abcd"
+
+
+@pytest.mark.parametrize("parte", ["abc", b"abc", bytearray(b"abc"), memoryview(b"abc")],
+                         ids=["str", "bytes", "bytearray", "memoryview"])
+def test_stream_de_um_corpo_so(parte):
+    assert enviar("stream", 200, parte)[1] == b"3\r\nabc\r\n0\r\n\r\n"
+
+
+@pytest.mark.parametrize("metodo, corpo", [("send", 5), ("send", None), ("stream", [b"ok", 5])])
+def test_corpo_que_nao_e_str_nem_bytes(metodo, corpo):
+    with pytest.raises(TypeError):
+        enviar(metodo, 200, corpo)
+
+
+@pytest.mark.parametrize("modo", ["threads", "async"])
+def test_stream_pelo_servidor(servidor, modo):
+    server = servidor(mode=modo)
+
+    @server.route("/numeros")
+    def numeros(request, response):
+        response.stream(200, (f"{i}\n" for i in range(5000)))
+
+    servidor.iniciar(server)
+    conexao = cliente(server)
+    for _ in range(2):
+        conexao.request("GET", "/numeros")
+        resposta = conexao.getresponse()
+        assert resposta.getheader("Transfer-Encoding") == "chunked"
+        assert resposta.read().decode().split() == [str(i) for i in range(5000)]
+    conexao.close()
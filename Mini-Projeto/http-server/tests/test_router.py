@@ -0,0 +1,96 @@
+import pytest
+
+from conftest import cliente, get
+from server.router import Router
+
+
+def handler(nome):
+    def h(request, response, **params):
+        return nome, params
+    h.__name__ = nome
+    return h
+
+
+@pytest.fixture
+def router():
+    router = Router()
+    router.add_route("/usuarios", ["GET"])(handler("listar"))
+    router.add_route("/usuarios", ["POST"])(handler("criar"))
+    router.add_route("/usuarios/novo", ["GET"])(handler("novo"))
+    router.add_route("/usuarios/<int:id_usuario>", ["GET"])(handler("detalhar"))
+    router.add_route("/usuarios/<int:id_usuario>/editar", ["GET"])(handler("editar"))
+    router.add_route("/arquivos/<nome>", ["GET"])(handler("arquivo"))
+    router.add_route("/static/<path:filename>", ["GET", "HEAD"])(handler("static"))
+    router.add_route("/", ["GET"])(handler("raiz"))
+    return router
+
+
+def test_rota_fixa(router):
+    match = router.match("GET", "/usuarios")
+    assert match.handler.__name__ == "listar"
+    assert match.route == "/usuarios"
+
+
+def test_metodos_da_mesma_rota(router):
+    assert router.match("POST", "/usuarios").handler.__name__ == "criar"
+
+
+def test_barra_final_e_raiz(router):
+    assert router.match("GET", "/usuarios/").handler.__name__ == "listar"
+    assert router.match("GET", "/").handler.__name__ == "raiz"
+
+
+def test_segmento_fixo_tem_prioridade_sobre_parametro(router):
+    assert router.match("GET", "/usuarios/novo").handler.__name__ == "novo"
+
+
+def test_conversor_int(router):
+    match = router.match("GET", "/usuarios/42/editar")
+    assert match.handler.__name__ == "editar"
+    assert match.params == {"id_usuario": 42}
+    assert match.route == "/usuarios/<int:id_usuario>/editar"
+    assert router.match("GET", "/usuarios/abc").handler is None
+
+
+def test_conversor_str(router):
+    assert router.match("GET", "/arquivos/a%20b.txt").params == {"nome": "a b.txt"}
+
+
+def test_conversor_path(router):
+    match = router.match("GET", "/static/css/site.css")
+    assert match.handler.__name__ == "static"
+    assert match.params == {"filename": "css/site.css"}
+
+
+def test_metodo_nao_permitido(router):
+    match = router.match("DELETE", "/usuarios/1")
+    assert match.handler is None
+    assert match.allowed == ("GET",)
+
+
+def test_rota_inexistente(router):
+    match = router.match("GET", "/nada/aqui")
+    assert match.handler is None
+    assert match.allowed == ()
+
+
+def test_conversor_desconhecido():
+    with pytest.raises(ValueError):
+        Router().add_route("/x/<float:valor>", ["GET"])(handler("x"))
+
+
+@pytest.mark.parametrize("modo", ["serial", "threads", "async"])
+def test_404_e_405_pelo_servidor(servidor, modo):
+    server = servidor(mode=modo)
+
+    @server.route("/ola")
+    def ola(request, response):
+        response.send(200, "ola")
+
+    servidor.iniciar(server)
+    assert get(server, "/nada")[0].status == 404
+    conexao = cliente(server)
+    conexao.request("DELETE", "/ola")
+    resposta = conexao.getresponse()
+    assert resposta.status == 405
+    assert resposta.getheader("Allow") == "GET"
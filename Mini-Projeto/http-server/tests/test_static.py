@@ -0,0 +1,110 @@
+import os
+import socket
+
+import pytest
+
+from conftest import cliente
+
+
+CONTEUDO = b"0123456789"
+
+
+@pytest.fixture(params=["threads", "async"])
+def arquivos(request, servidor, tmp_path):
+    diretorio = tmp_path / "publico"
+    diretorio.mkdir()
+    (diretorio / "numeros.txt").write_bytes(CONTEUDO)
+    (diretorio / "grande.bin").write_bytes(os.urandom(3 * 1024 * 1024 + 7))
+    (tmp_path / "segredo.txt").write_text("fora do diretório")
+    server = servidor(mode=request.param)
+    server.static("/static", str(diretorio), revalidate_after=0)
+    server.diretorio = diretorio
+    return servidor.iniciar(server)
+
+
+def pedir(server, caminho, metodo="GET", **headers):
+    conexao = cliente(server)
+    conexao.request(metodo, caminho, headers={nome.replace("_", "-"): valor for nome, valor in headers.items()})
+    resposta = conexao.getresponse()
+    corpo = resposta.read()
+    conexao.close()
+    return resposta, corpo
+
+
+def test_arquivo_inteiro(arquivos):
+    resposta, corpo = pedir(arquivos, "/static/numeros.txt")
+    assert (resposta.status, corpo) == (200, CONTEUDO)
+    assert resposta.getheader("Content-Type") == "text/plain; charset=utf-8"
+    assert resposta.getheader("Content-Length") == "10"
+    assert resposta.getheader("ETag").startswith('"')
+    assert resposta.getheader("Last-Modified").endswith("GMT")
+    assert resposta.getheader("Accept-Ranges") == "bytes"
+
+
+def test_arquivo_grande_pelo_sendfile(arquivos):
+    resposta, corpo = pedir(arquivos, "/static/grande.bin")
+    assert corpo == (arquivos.diretorio / "grande.bin").read_bytes()
+
+
+def test_head_sem_corpo(arquivos):
+    resposta, corpo = pedir(arquivos, "/static/numeros.txt", "HEAD")
+    assert (resposta.status, corpo) == (200, b"")
+    assert resposta.getheader("Content-Length") == "10"
+
+
+def test_get_condicional(arquivos):
+    resposta, _ = pedir(arquivos, "/static/numeros.txt")
+    etag, modificado = resposta.getheader("ETag"), resposta.getheader("Last-Modified")
+
+    for headers in ({"If_None_Match": etag}, {"If_None_Match": f'"outro", W/{etag}'}, {"If_None_Match": "*"},
+                    {"If_Modified_Since": modificado}):
+        resposta, corpo = pedir(arquivos, "/static/numeros.txt", **headers)
+        assert (resposta.status, corpo) == (304, b""), headers
+        assert resposta.getheader("ETag") == etag
+
+    assert pedir(arquivos, "/static/numeros.txt", If_None_Match='"outro"')[0].status == 200
+    # If-None-Match tem precedência sobre If-Modified-Since
+    assert pedir(arquivos, "/static/numeros.txt", If_None_Match='"outro"', If_Modified_Since=modificado)[0].status == 200
+    assert pedir(arquivos, "/static/numeros.txt", If_Modified_Since="Thu, 01 Jan 1970 00:00:00 GMT")[0].status == 200
+
+
+def test_etag_muda_com_o_arquivo(arquivos):
+    etag = pedir(arquivos, "/static/numeros.txt")[0].getheader("ETag")
+    (arquivos.diretorio / "numeros.txt").write_bytes(b"outro conteudo")
+    resposta, corpo = pedir(arquivos, "/static/numeros.txt", If_None_Match=etag)
+    assert (resposta.status, corpo) == (200, b"outro conteudo")
+    assert resposta.getheader("ETag") != etag
+
+
+@pytest.mark.parametrize("faixa, inicio, fim", [
+    ("bytes=2-5", 2, 5),
+    ("bytes=7-", 7, 9),
+    ("bytes=-3", 7, 9),
+    ("bytes=8-100", 8, 9),
+])
+def test_range(arquivos, faixa, inicio, fim):
+    resposta, corpo = pedir(arquivos, "/static/numeros.txt", Range=faixa)
+    assert (resposta.status, corpo) == (206, CONTEUDO[inicio:fim + 1])
+    assert resposta.getheader("Content-Range") == f"bytes {inicio}-{fim}/10"
+
+
+def test_range_fora_do_arquivo(arquivos):
+    resposta, corpo = pedir(arquivos, "/static/numeros.txt", Range="bytes=10-")
+    assert resposta.status == 416
+    assert resposta.getheader("Content-Range") == "bytes */10"
+
+
+def test_if_range(arquivos):
+    etag = pedir(arquivos, "/static/numeros.txt")[0].getheader("ETag")
+    assert pedir(arquivos, "/static/numeros.txt", Range="bytes=0-1", If_Range=etag)[1] == b"01"
+    # ETag diferente: o arquivo mudou, vai inteiro
+    resposta, corpo = pedir(arquivos, "/static/numeros.txt", Range="bytes=0-1", If_Range='"velho"')
+    assert (resposta.status, corpo) == (200, CONTEUDO)
+
+
+@pytest.mark.parametrize("caminho", ["/static/nada.txt", "/static/../segredo.txt", "/static/publico/../../segredo.txt"])
+def test_fora_do_diretorio_ou_inexistente(arquivos, caminho):
+    # O caminho vai pelo socket exatamente como escrito
+    with socket.create_connection(("127.0.0.1", arquivos.port), timeout=5) as conexao:
+        conexao.sendall(f"GET {caminho} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n".encode())
+        assert conexao.recv(64).startswith(b"HTTP/1.1 404")
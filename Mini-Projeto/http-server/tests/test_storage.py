@@ -0,0 +1,32 @@
+import pytest
+
+from conftest import nomes
+
+
+def test_inserir_e_obter(abrir):
+    store = abrir()
+    ana = store.inserir("Ana", "ana@x.com", "1")
+    bia = store.inserir("Bia", "bia@x.com", "2")
+    assert (ana.id, bia.id) == (1, 2)
+    assert store.obter(2) == bia
+    assert store.obter(3) is None
+    assert nomes(store.listar()) == ["Ana", "Bia"]
+
+
+def test_atualizar(abrir):
+    store = abrir()
+    ana = store.inserir("Ana", "ana@x.com", "1")
+    atualizado = store.atualizar(ana.id, telefone="9")
+    assert atualizado == ana._replace(telefone="9")
+    assert store.obter(ana.id).telefone == "9"
+    assert store.atualizar(99, nome="X") is None
+
+
+def test_excluir(abrir):
+    store = abrir()
+    ana = store.inserir("Ana", "ana@x.com", "1")
+    store.inserir("Bia", "bia@x.com", "2")
+    assert store.excluir(ana.id)
+    assert not store.excluir(ana.id)
+    assert store.obter(ana.id) is None
+    assert nomes(store.listar()) == ["Bia"]
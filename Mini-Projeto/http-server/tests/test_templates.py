@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from server.templates import FLUSH_PARTES, Template, TemplateError, Templates
+
+
+def test_expressoes_e_escape():
+    template = Template("<p>{{ nome }} ({{ id }}) {{ html|safe }} {{ nada }} {{ 100 % 7 }}</p>")
+    resultado = template.render(nome='<b>"Ana" & Bia</b>', id=3, html="<i>ok</i>", nada=None)
+    assert resultado == "<p>&lt;b&gt;&quot;Ana&quot; &amp; Bia&lt;/b&gt; (3) <i>ok</i>  2</p>"
+
+
+def test_for_e_if():
+    template = Template(
+        "{% for u in usuarios %}{% if u > 2 %}G{% elif u == 2 %}M{% else %}P{% endif %}{{ u }};{% endfor %}"
+        "{% if not usuarios %}vazio{% endif %}"
+    )
+    assert template.render(usuarios=[1, 2, 3]) == "P1;M2;G3;"
+    assert template.render(usuarios=[]) == "vazio"
+
+
+def test_nomes_fora_do_contexto_caem_nos_builtins():
+    assert Template("{{ len(itens) }}{{ faltando }}").render(itens=[1, 2]) == "2"
+
+
+@pytest.mark.parametrize("source", [
+    "{% for x in itens %}sem fim",
+    "{% endif %}",
+    "{% if x %}{% endfor %}",
+    "{% else %}",
+    "{% bloco %}",
+    "{{ 1 + }}",
+])
+def test_template_invalido(source):
+    with pytest.raises(TemplateError):
+        Template(source)
+
+
+def test_stream_entrega_em_partes():
+    template = Template("{% for i in itens %}{{ i }}\n{% endfor %}fim")
+    partes = list(template.stream(itens=range(FLUSH_PARTES * 3)))
+    assert len(partes) > 1
+    assert "".join(partes) == template.render(itens=range(FLUSH_PARTES * 3))
+
+
+@pytest.fixture
+def diretorio(tmp_path):
+    (tmp_path / "pagina.html").write_text('<h1>{{ titulo }}</h1>{% include "rodape.html" %}')
+    (tmp_path / "rodape.html").write_text("<footer>v1</footer>")
+    return tmp_path
+
+
+def tocar(caminho, texto):
+    # Garante um mtime diferente mesmo em sistemas de arquivos com resolução baixa
+    mtime = os.stat(caminho).st_mtime_ns
+    caminho.write_text(texto)
+    os.utime(caminho, ns=(mtime + 10**9, mtime + 10**9))
+
+
+def test_compilado_uma_vez(diretorio):
+    templates = Templates(str(diretorio))
+    template = templates.get("pagina.html")
+    assert templates.render("pagina.html", titulo="Oi") == "<h1>Oi</h1><footer>v1</footer>"
+    assert templates.get("pagina.html") is template
+
+
+def test_recompila_quando_o_arquivo_muda(diretorio):
+    templates = Templates(str(diretorio))
+    template = templates.get("pagina.html")
+    tocar(diretorio / "pagina.html", '<h2>{{ titulo }}</h2>{% include "rodape.html" %}')
+    assert templates.get("pagina.html") is not template
+    assert templates.render("pagina.html", titulo="Oi") == "<h2>Oi</h2><footer>v1</footer>"
+
+
+def test_recompila_quando_o_include_muda(diretorio):
+    templates = Templates(str(diretorio))
+    templates.get("pagina.html")
+    tocar(diretorio / "rodape.html", "<footer>v2</footer>")
+    assert templates.render("pagina.html", titulo="Oi") == "<h1>Oi</h1><footer>v2</footer>"
+
+
+def test_include_recursivo(diretorio):
+    (diretorio / "laco.html").write_text('{% include "laco.html" %}')
+    with pytest.raises(TemplateError):
+        Templates(str(diretorio)).get("laco.html")
@@ -0,0 +1,97 @@
+import threading
+import time
+
+from conftest import cliente, esperar, get
+
+
+def test_requisicoes_em_paralelo(servidor):
+    server = servidor(mode="threads", workers=4)
+
+    @server.route("/lento")
+    def lento(request, response):
+        time.sleep(0.3)
+        response.send(200, threading.current_thread().name)
+
+    servidor.iniciar(server)
+    nomes = []
+    clientes = [threading.Thread(target=lambda: nomes.append(get(server, "/lento")[1])) for _ in range(4)]
+    inicio = time.monotonic()
+    for thread in clientes:
+        thread.start()
+    for thread in clientes:
+        thread.join(5)
+    # Quatro workers: as quatro esperas acontecem ao mesmo tempo
+    assert time.monotonic() - inicio < 0.9
+    assert len(set(nomes)) == 4
+    assert all(nome.startswith("http-worker-") for nome in nomes)
+
+
+def test_fila_cheia_recusa_com_503(servidor):
+    server = servidor(mode="threads", workers=1, queue_size=1)
+    ocupado, liberar = threading.Event(), threading.Event()
+
+    @server.route("/ocupa")
+    def ocupa(request, response):
+        ocupado.set()
+        liberar.wait(5)
+        response.send(200, "ok")
+
+    @server.route("/ola")
+    def ola(request, response):
+        response.send(200, "ola")
+
+    servidor.iniciar(server)
+    # A conexão de teste da porta (esperar_porta) também passa pela fila e
+    # pode ainda estar lá: até o worker pegá-la, a próxima é recusada. Sem
+    # keep-alive, nenhuma conexão fechada pelo cliente volta para a fila.
+    fechar = {"Connection": "close"}
+    assert esperar(lambda: get(server, "/ola", fechar)[1] == "ola")
+    assert esperar(lambda: server.router.active_connections == 0)
+    respostas = []
+
+    def pedir():
+        resposta, corpo = get(server, "/ocupa", fechar)
+        respostas.append(resposta.status)
+
+    primeiro = threading.Thread(target=pedir)
+    primeiro.start()
+    assert ocupado.wait(5)
+    # O único worker está ocupado: a segunda conexão espera na fila...
+    segundo = threading.Thread(target=pedir)
+    segundo.start()
+    assert esperar(lambda: server.router.active_connections == 2)
+
+    # ...e a terceira, com a fila cheia, é recusada na hora
+    inicio = time.monotonic()
+    resposta, corpo = get(server, "/ocupa", fechar)
+    assert (resposta.status, resposta.getheader("Retry-After")) == (503, "1")
+    assert time.monotonic() - inicio < 1
+
+    liberar.set()
+    primeiro.join(5)
+    segundo.join(5)
+    assert respostas == [200, 200]
+    assert esperar(lambda: server.router.active_connections == 0)
+
+
+def test_excecao_no_handler_nao_derruba_o_worker(servidor):
+    server = servidor(mode="threads", workers=1)
+
+    @server.route("/falha")
+    def falha(request, response):
+        raise RuntimeError("falhou")
+
+    @server.route("/ola")
+    def ola(request, response):
+        response.send(200, "ola")
+
+    servidor.iniciar(server)
+    for _ in range(3):
+        conexao = cliente(server)
+        conexao.request("GET", "/falha")
+        try:
+            conexao.getresponse().read()
+        except OSError:
+            pass  # a conexão é fechada sem resposta
+        conexao.close()
+    assert get(server, "/ola")[1] == "ola"
@@ -0,0 +1,132 @@
+import json
+import sys
+
+import pytest
+
+from conftest import cliente, esperar, get
+
+
+def eco(environ, start_response):
+    """App que devolve em JSON o que recebeu no environ."""
+    chaves = ("REQUEST_METHOD", "SCRIPT_NAME", "PATH_INFO", "QUERY_STRING", "CONTENT_TYPE", "CONTENT_LENGTH",
+              "SERVER_PROTOCOL", "REMOTE_ADDR", "HTTP_X_TESTE", "HTTP_COOKIE", "wsgi.url_scheme")
+    dados = {chave: environ.get(chave) for chave in chaves}
+    dados["linhas"] = [linha.decode() for linha in environ["wsgi.input"]]
+    dados["wsgi.version"] = list(environ["wsgi.version"])
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [json.dumps(dados).encode()]
+
+
+class Resultado:
+    """Iterável com close(), como os que os frameworks devolvem."""
+
+    fechados = 0
+
+
+    def __init__(self, partes):
+        self.partes = partes
+
+
+    def __iter__(self):
+        return iter(self.partes)
+
+
+    def close(self):
+        Resultado.fechados += 1
+
+
+def app(environ, start_response):
+    caminho = environ["PATH_INFO"]
+    if caminho == "/criado":
+        start_response("201 Criado", [("Content-Type", "text/plain"), ("Set-Cookie", "a=1"),
+                                      ("Set-Cookie", "b=2"), ("Connection", "close")])
+        return Resultado([b"criado"])
+    if caminho == "/partes":
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return Resultado([b"um ", b"dois ", b"tres"])
+    if caminho == "/tamanho":
+        start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", "7")])
+        return (parte for parte in [b"um ", b"dois"])
+    if caminho == "/write":
+        write = start_response("200 OK", [("Content-Type", "text/plain")])
+        write(b"legado ")
+        return [b"e iteravel"]
+    if caminho == "/erro":
+        try:
+            raise ValueError("falhou")
+        except ValueError:
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            start_response("500 Erro", [("Content-Type", "text/plain")], sys.exc_info())
+        return [b"erro tratado"]
+    return eco(environ, start_response)
+
+
+@pytest.fixture(params=["threads", "async"])
+def wsgi(request, servidor):
+    server = servidor(mode=request.param)
+    server.wsgi(app, "/app")
+
+    @server.route("/app/nativa")
+    def nativa(request, response):
+        response.send(200, "rota do Server")
+
+    return servidor.iniciar(server)
+
+
+def test_environ(wsgi):
+    conexao = cliente(wsgi)
+    conexao.putrequest("POST", "/app/caminho%20x?a=1&b=2")
+    for nome, valor in (("Content-Type", "text/plain"), ("Content-Length", "13"), ("X-Teste", "sim"),
+                        ("Cookie", "a=1"), ("Cookie", "b=2")):
+        conexao.putheader(nome, valor)
+    conexao.endheaders(b"linha1\nlinha2")
+    dados = json.loads(conexao.getresponse().read())
+    assert dados == {
+        "REQUEST_METHOD": "POST",
+        "SCRIPT_NAME": "/app",
+        "PATH_INFO": "/caminho x",
+        "QUERY_STRING": "a=1&b=2",
+        "CONTENT_TYPE": "text/plain",
+        "CONTENT_LENGTH": "13",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": "127.0.0.1",
+        "HTTP_X_TESTE": "sim",
+        "HTTP_COOKIE": "a=1; b=2",
+        "wsgi.url_scheme": "http",
+        "wsgi.version": [1, 0],
+        "linhas": ["linha1\n", "linha2"],
+    }
+
+
+def test_status_e_cabecalhos(wsgi):
+    fechados = Resultado.fechados
+    resposta, corpo = get(wsgi, "/app/criado")
+    assert (resposta.status, resposta.reason, corpo) == (201, "Criado", "criado")
+    assert resposta.getheader("Content-Type") == "text/plain"
+    assert resposta.headers.get_all("Set-Cookie") == ["a=1", "b=2"]
+    # Uma parte só: sai com Content-Length; cabeçalhos da conexão são do servidor
+    assert resposta.getheader("Content-Length") == "6"
+    assert resposta.getheader("Connection") == "keep-alive"
+    assert esperar(lambda: Resultado.fechados == fechados + 1)
+
+
+def test_varias_partes(wsgi):
+    fechados = Resultado.fechados
+    resposta, corpo = get(wsgi, "/app/partes")
+    assert (resposta.getheader("Transfer-Encoding"), corpo) == ("chunked", "um dois tres")
+    assert esperar(lambda: Resultado.fechados == fechados + 1)
+    resposta, corpo = get(wsgi, "/app/tamanho")
+    assert (resposta.getheader("Content-Length"), resposta.getheader("Transfer-Encoding")) == ("7", None)
+    assert corpo == "um dois"
+
+
+def test_write_e_exc_info(wsgi):
+    assert get(wsgi, "/app/write")[1] == "legado e iteravel"
+    resposta, corpo = get(wsgi, "/app/erro")
+    # Antes do envio, start_response com exc_info troca o status
+    assert (resposta.status, corpo) == (500, "erro tratado")
+
+
+def test_rotas_do_server_tem_prioridade(wsgi):
+    assert get(wsgi, "/app/nativa")[1] == "rota do Server"
+    assert json.loads(get(wsgi, "/app")[1])["PATH_INFO"] == ""